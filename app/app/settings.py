@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 from pathlib import Path
+from urllib.parse import urlsplit
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -47,11 +49,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.RequestProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,20 +81,149 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Log line with the database, serializer and view time of a request, for
+# REQUEST_TIMING_SAMPLE_RATE of the requests, also sent to staff users in
+# a Server-Timing header. Requests not sampled, and all requests when it
+# is off, are not timed.
+REQUEST_TIMING = bool(int(os.environ.get('REQUEST_TIMING', 0)))
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 1)
+)
+
+# Staff users can profile a request with ?profile or an X-Profile header.
+# The slowest REQUEST_PROFILE_FUNCTIONS functions and the SQL are kept for
+# REQUEST_PROFILE_TTL seconds in the REQUEST_PROFILE_CACHE cache, and read
+# from /api/profiles/<id>/ with the id in the X-Request-ID response header.
+# Any worker may serve that read, so the cache must be shared by all of
+# them: profiling refuses to start with a locmem cache.
+REQUEST_PROFILING = bool(int(os.environ.get('REQUEST_PROFILING', 0)))
+REQUEST_PROFILE_CACHE = os.environ.get('REQUEST_PROFILE_CACHE', 'default')
+REQUEST_PROFILE_TTL = int(os.environ.get('REQUEST_PROFILE_TTL', 3600))
+REQUEST_PROFILE_FUNCTIONS = int(
+    os.environ.get('REQUEST_PROFILE_FUNCTIONS', 50)
+)
+
+# What a view that runs more queries than its query_budget does: "warn"
+# logs the SQL, "raise" fails the request (the test runner's choice) and
+# "off" does not count them.
+QUERY_BUDGETS = os.environ.get('QUERY_BUDGETS', 'warn')
+
+# Under ASGI (app/asgi.py turns this on) the wishlist and user endpoints
+# run as async views, with their blocking work on a bounded thread pool.
+# Each thread may hold a database connection.
+ASYNC_VIEWS = bool(int(os.environ.get('ASYNC_VIEWS', 0)))
+ASYNC_VIEW_THREADS = int(os.environ.get('ASYNC_VIEW_THREADS', 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked with
+# a query before a request reuses them. With DB_POOL they are shared by
+# the threads of a process instead, and returned after each request.
+DB_POOL = bool(int(os.environ.get('DB_POOL', 0)))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+        ),
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        'OPTIONS': {},
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+
+# DB_SQLITE names an SQLite file to run on instead of PostgreSQL, which
+# checks the fallbacks for other databases: the migrations leave out
+# what needs PostgreSQL and search uses icontains.
+if os.environ.get('DB_SQLITE'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DB_SQLITE'],
+    }
+
+# Read replicas, as comma separated HOST[:PORT][/NAME] entries that share
+# the primary's other settings. Safe requests read from a random replica
+# unless the user wrote in the last DB_REPLICA_PIN_SECONDS. The pins are
+# kept in the DB_REPLICA_PIN_CACHE cache, which must be shared by every
+# process: replicas refuse to start with a locmem cache.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1
+):
+    replica = urlsplit(f'//{replica.strip()}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica.hostname,
+        'PORT': replica.port or DATABASES['default'].get('PORT', ''),
+        'NAME': replica.path.lstrip('/') or DATABASES['default']['NAME'],
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+DB_REPLICA_PIN_CACHE = os.environ.get('DB_REPLICA_PIN_CACHE', 'default')
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Seconds wishlist read responses stay cached, per endpoint; 0 disables.
+WISHLIST_CACHE_TTL = {
+    'list': int(os.environ.get('WISHLIST_CACHE_LIST_TTL', 60)),
+    'wishlist': int(os.environ.get('WISHLIST_CACHE_DETAIL_TTL', 300)),
+    'products': int(os.environ.get('WISHLIST_CACHE_PRODUCTS_TTL', 300)),
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+
+# The first hasher hashes new passwords; the others only verify older
+# hashes, which are rehashed with the first one on the next login. The
+# work factors below set the cost of each login; measure them with
+# `manage.py bench_hashers` before changing them.
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'core.hashers.Argon2PasswordHasher,'
+    'core.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,'
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+).split(',')
+
+# Argon2id with 19 MiB of memory and two passes, the minimum OWASP
+# recommends
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 260000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -136,6 +270,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Cache of token key to user used by CachedTokenAuthentication, off with
+# the default TTL of 0. The TOKEN_AUTH_CACHE cache decides which entries
+# are still valid, so that invalidations reach every process; it must be
+# shared by all of them, and the app refuses to start with a locmem one.
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 0))
+TOKEN_AUTH_CACHE_MAX_SIZE = int(
+    os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)
+)
+TOKEN_AUTH_CACHE = os.environ.get('TOKEN_AUTH_CACHE', 'default')
+
+# Timing lines of sampled requests are logged at INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'wishlist.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
 }
@@ -22,6 +22,8 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView, RequestProfileView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
@@ -32,4 +34,10 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/wishlist/', include('wishlist.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='api-metrics'),
+    path(
+        'api/profiles/<str:request_id>/',
+        RequestProfileView.as_view(),
+        name='api-profile',
+    ),
 ]
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from core import signals  # noqa: F401
+        from core.middleware import shared_cache
+
+        if settings.TOKEN_AUTH_CACHE_TTL:
+            # a process keeping tokens to itself would accept them after
+            # another one revoked them
+            shared_cache('TOKEN_AUTH_CACHE')
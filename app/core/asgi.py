@@ -0,0 +1,157 @@
+"""
+Serving the APIs over ASGI.
+"""
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+from core import metrics, profiling, timing
+
+
+counters = metrics.Counters("started", "finished")
+
+
+@functools.lru_cache(maxsize=None)
+def get_executor():
+    """Return the thread pool async views run their blocking work on."""
+    return ThreadPoolExecutor(
+        max_workers=settings.ASYNC_VIEW_THREADS,
+        thread_name_prefix="async-view",
+    )
+
+
+def pool_metrics():
+    """Return the size of the view thread pool and the views running."""
+    values = counters.snapshot()
+    return {
+        "threads": settings.ASYNC_VIEW_THREADS,
+        "in_flight": values["started"] - values["finished"],
+        **values,
+    }
+
+
+metrics.register("async_views", pool_metrics)
+
+
+def call_view(view, request, *args, **kwargs):
+    """Call a sync view and return its rendered response."""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render") and callable(response.render):
+        response.render()
+    return response
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Call a sync view and render its response, on a pool thread.
+
+    Connections are checked before and closed after as the request
+    signals do for the handler's own thread, as the pool threads never
+    see those signals.
+    """
+    counters.incr("started")
+    close_old_connections()
+    request_profile = profiling.current()
+    try:
+        with contextlib.ExitStack() as stack:
+            # a profile and the query timings only see the thread they
+            # are enabled on
+            if request_profile is not None:
+                stack.enter_context(request_profile.thread())
+            if timing.current() is not None:
+                stack.enter_context(timing.record_queries())
+            return call_view(view, request, *args, **kwargs)
+    finally:
+        close_old_connections()
+        counters.incr("finished")
+
+
+def async_view(view):
+    """
+    Return an async view running the sync ``view`` on the thread pool.
+
+    The event loop stays free while the ORM blocks, and no more views
+    run at once than ``ASYNC_VIEW_THREADS``; the rest wait their turn
+    without holding a thread.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(
+            run_view, thread_sensitive=False, executor=get_executor()
+        )(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_urlpatterns(urlpatterns):
+    """Return ``urlpatterns`` with every sync view made an async view."""
+    patterns = []
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                async_urlpatterns(pattern.url_patterns),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif not asyncio.iscoroutinefunction(pattern.callback):
+            pattern = URLPattern(
+                pattern.pattern,
+                async_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        patterns.append(pattern)
+    return patterns
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    ASGI handler that reads streaming responses on a thread.
+
+    Django's handler iterates streaming responses in the event loop,
+    where generators using the ORM, like the export, are not allowed.
+    Here every part is read on the sync thread, so a generator and its
+    database cursor stay on one thread from start to close.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        # the base class sends the headers, then nothing but the end
+        response.streaming_content = ()
+
+        async def send_parts(message):
+            await send(message)
+            if message["type"] != "http.response.start":
+                return
+            while True:
+                part = await next_part(parts, None)
+                if part is None:
+                    break
+                await send({
+                    "type": "http.response.body",
+                    "body": part,
+                    "more_body": True,
+                })
+
+        await super().send_response(response, send_parts)
+
+
+def get_asgi_application():
+    """Set up Django and return the ASGI application."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
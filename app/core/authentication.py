@@ -0,0 +1,220 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core import metrics
+
+
+def _copy_token(token):
+    """Return a copy of a cached token and its user for one request."""
+    user = copy.copy(token.user)
+    token = copy.copy(token)
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token keys to tokens, with a time to live.
+
+    Entries are kept in this process and, when ``shared`` is set, in the
+    Django cache ``alias`` too so other processes can reuse them. The
+    shared cache is then the source of truth: each token key has a
+    generation there, which invalidating the token replaces, and an
+    entry of either layer is only used while its generation is current.
+    Without ``shared``, invalidation only reaches this process.
+    """
+
+    key_prefix = "auth-token:"
+    generation_prefix = "auth-token-generation:"
+
+    def __init__(self, max_size, ttl, shared=False,
+                 alias=DEFAULT_CACHE_ALIAS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.alias = alias
+        self.counters = metrics.Counters("hits", "shared_hits", "misses")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._user_keys = {}
+
+    @property
+    def cache(self):
+        """Return the shared Django cache."""
+        return caches[self.alias]
+
+    def generation(self, key):
+        """
+        Return the current generation of ``key``, None when not shared.
+
+        Read it before loading a token from the database and cache the
+        token under it: an invalidation that commits in between then
+        leaves the entry stale, not valid.
+        """
+        if not self.ttl or not self.shared:
+            return None
+
+        generation_key = self._generation_key(key)
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            # lost or never set; a new one invalidates older entries
+            self.cache.add(generation_key, uuid.uuid4().hex, None)
+            generation = self.cache.get(generation_key)
+        return generation
+
+    def get(self, key, generation=None):
+        """Return a copy of the cached token for ``key``, or None."""
+        if not self.ttl:
+            return None
+        if generation is None:
+            generation = self.generation(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token, entry_generation, expires = entry
+                if (
+                    expires > time.monotonic()
+                    and entry_generation == generation
+                ):
+                    self._entries.move_to_end(key)
+                    self.counters.incr("hits")
+                    return _copy_token(token)
+                self._discard(key)
+
+        if self.shared:
+            entry = self.cache.get(self._shared_key(key))
+            if entry is not None and entry[1] == generation:
+                token = entry[0]
+                self.counters.incr("shared_hits")
+                self._store(key, token, generation)
+                return _copy_token(token)
+
+        self.counters.incr("misses")
+        return None
+
+    def set(self, key, token, generation=None):
+        """Cache ``token`` under ``key`` for its ``generation``."""
+        if not self.ttl:
+            return
+        if generation is None:
+            generation = self.generation(key)
+
+        self._store(key, _copy_token(token), generation)
+        if self.shared:
+            self.cache.set(
+                self._shared_key(key), (token, generation), self.ttl
+            )
+
+    def delete(self, *keys):
+        """Drop the given token keys, in every process when shared."""
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+        if self.shared and keys:
+            self.cache.set_many(
+                {
+                    self._generation_key(key): uuid.uuid4().hex
+                    for key in keys
+                },
+                None,
+            )
+
+    def delete_user(self, user_id, keys=()):
+        """Drop every token of a user, plus any other given keys."""
+        with self._lock:
+            user_keys = set(self._user_keys.get(user_id, ()))
+        self.delete(*user_keys.union(keys))
+
+    def clear(self):
+        """Drop every entry held by this process."""
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def metrics(self):
+        """Return the hit and miss counters and the current size."""
+        values = self.counters.snapshot()
+        values["size"] = len(self._entries)
+        return values
+
+    def _store(self, key, token, generation):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (
+                token,
+                generation,
+                time.monotonic() + self.ttl,
+            )
+            self._user_keys.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[0].user_id
+        user_keys = self._user_keys.get(user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._user_keys[user_id]
+
+    def _shared_key(self, key):
+        # hash the key so raw tokens never reach the cache backend
+        return self.key_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def _generation_key(self, key):
+        return (
+            self.generation_prefix
+            + hashlib.sha256(key.encode()).hexdigest()
+        )
+
+
+# always shared, so that invalidations reach every process; the core
+# app checks on startup that the cache is
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_AUTH_CACHE_TTL,
+    shared=True,
+    alias=settings.TOKEN_AUTH_CACHE,
+)
+metrics.register("token_auth_cache", token_cache.metrics)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches the token and user lookup.
+
+    A drop in replacement for ``TokenAuthentication``. Cached tokens are
+    dropped when the token is deleted or its user is saved, and the user
+    is checked to be active on every request.
+    """
+
+    def authenticate_credentials(self, key):
+        generation = token_cache.generation(key)
+        token = token_cache.get(key, generation)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, generation)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+
+        return (token.user, token)
@@ -0,0 +1,123 @@
+"""
+PostgreSQL backend with connection health checks and optional pooling.
+
+``CONN_HEALTH_CHECKS`` tests a persistent connection with a query the
+first time it is used by a request and reconnects when it fails, as
+Django 4.1 does. ``OPTIONS['pool']``, a dict of ``ConnectionPool``
+arguments, shares connections between the threads of the process.
+"""
+import functools
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+from core import metrics
+from core.backends.postgresql.pool import ConnectionPool
+
+
+# pools by database alias and connection parameters
+pools = {}
+pools_lock = threading.Lock()
+
+
+def pool_metrics():
+    """Return the metrics of every pool, by database alias."""
+    with pools_lock:
+        items = list(pools.items())
+    return {alias: pool.metrics() for (alias, params), pool in items}
+
+
+metrics.register("database_pools", pool_metrics)
+
+
+def close_pools():
+    """Close the idle connections of every pool."""
+    with pools_lock:
+        items = list(pools.values())
+    for pool in items:
+        pool.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection with health checks and pooling."""
+
+    health_check_done = False
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        self.health_checks = settings_dict.get("CONN_HEALTH_CHECKS", False)
+        self.pool_options = settings_dict["OPTIONS"].get("pool")
+        if self.pool_options is not None and settings_dict["CONN_MAX_AGE"]:
+            raise ImproperlyConfigured(
+                "Pooled connections are returned to the pool after each "
+                "request; set CONN_MAX_AGE to 0 when OPTIONS['pool'] is set."
+            )
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_pool(self, conn_params):
+        """Return the pool for this database, created on first use."""
+        key = (self.alias, repr(sorted(conn_params.items())))
+        with pools_lock:
+            if key not in pools:
+                pools[key] = ConnectionPool(
+                    functools.partial(
+                        super().get_new_connection, conn_params
+                    ),
+                    **self.pool_options,
+                )
+            return pools[key]
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        if self.pool_options is None:
+            return super().get_new_connection(conn_params)
+
+        connection = self.get_pool(conn_params).acquire(
+            check=self.health_checks
+        )
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.pool_options is None or self.connection is None:
+            return super()._close()
+
+        pool = self.get_pool(self.get_connection_params())
+        with self.wrap_database_errors:
+            pool.release(self.connection)
+
+    @async_unsafe
+    def connect(self):
+        super().connect()
+        # a new connection, or one the pool has checked
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # called as each request starts and finishes
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Close the connection if it does not answer a query."""
+        if (
+            self.connection is None
+            or not self.health_checks
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,165 @@
+"""
+In-process pool of PostgreSQL connections.
+"""
+import threading
+import time
+
+from psycopg2 import OperationalError, extensions
+
+from core import metrics
+
+
+class PoolTimeout(OperationalError):
+    """No connection became free before the timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections made by ``connect``.
+
+    Up to ``max_size`` connections are kept open and reused. Under load
+    up to ``max_overflow`` more are opened and closed again when they
+    are released. Past that, ``acquire`` waits up to ``timeout`` seconds
+    for a connection to be released.
+    """
+
+    def __init__(self, connect, max_size=10, max_overflow=10, timeout=30):
+        self.connect = connect
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._peak = 0
+        self._condition = threading.Condition()
+        self.counters = metrics.Counters(
+            "acquired", "connected", "waits", "timeouts", "discarded"
+        )
+
+    def acquire(self, check=False):
+        """
+        Return a connection from the pool, opening one if there is room.
+
+        With ``check`` an idle connection is tested with a query before
+        it is returned and replaced when it fails.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection = self._idle.pop()
+                    break
+                if self._open < self.max_size + self.max_overflow:
+                    connection = None
+                    self._open += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters.incr("timeouts")
+                    raise PoolTimeout(
+                        "No database connection was free within %ss."
+                        % self.timeout
+                    )
+                self.counters.incr("waits")
+                self._condition.wait(remaining)
+
+            self._peak = max(self._peak, self.in_use)
+
+        if connection is not None and check and not self.is_usable(connection):
+            # replaced in the same place in the pool
+            self.close_quietly(connection)
+            self.counters.incr("discarded")
+            connection = None
+
+        if connection is None:
+            try:
+                connection = self.connect()
+            except BaseException:
+                with self._condition:
+                    self._open -= 1
+                    self._condition.notify()
+                raise
+            self.counters.incr("connected")
+
+        self.counters.incr("acquired")
+        return connection
+
+    def release(self, connection):
+        """
+        Return a connection to the pool.
+
+        The session is reset first. Broken connections and those over
+        ``max_size`` are closed instead.
+        """
+        if not connection.closed:
+            try:
+                # rolls back and resets session settings
+                connection.reset()
+            except Exception:
+                pass
+
+        with self._condition:
+            usable = (
+                not connection.closed
+                and connection.get_transaction_status()
+                == extensions.TRANSACTION_STATUS_IDLE
+            )
+            if usable and self._open <= self.max_size:
+                self._idle.append(connection)
+                self._condition.notify()
+                return
+
+        self.discard(connection)
+
+    def discard(self, connection):
+        """Close a connection taken from the pool and free its place."""
+        self.close_quietly(connection)
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+        self.counters.incr("discarded")
+
+    def close(self):
+        """Close every idle connection."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self.discard(connection)
+
+    @staticmethod
+    def close_quietly(connection):
+        """Close a connection, ignoring errors of broken ones."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_usable(connection):
+        """Return True when the connection answers a query."""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    @property
+    def in_use(self):
+        return self._open - len(self._idle)
+
+    def metrics(self):
+        """Return the size and use of the pool."""
+        with self._condition:
+            values = {
+                "max_size": self.max_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "peak_in_use": self._peak,
+            }
+        values.update(self.counters.snapshot())
+        return values
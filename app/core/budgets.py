@@ -0,0 +1,79 @@
+"""
+Query budgets for API views.
+
+A view sets ``query_budget`` to the most queries each action may run;
+actions left out are not checked. Generic views name actions after the
+HTTP method. A budget is a number, or a function of the result size:
+the number of items in a list or page of results, else 1.
+
+Going over the budget logs a warning with the SQL, or raises
+``QueryBudgetExceeded`` when ``QUERY_BUDGETS`` is "raise", as it is
+under the test runner.
+"""
+import contextlib
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its budget allows."""
+
+
+def result_size(response):
+    """Return the number of items a response holds."""
+    data = getattr(response, "data", None)
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+    if isinstance(data, list):
+        return len(data)
+    return 1
+
+
+class QueryBudgetMixin:
+    """View mixin checking the queries of each request against a budget."""
+
+    # most queries by action, a number or a function of the result size
+    query_budget = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        if settings.QUERY_BUDGETS == "off" or not self.query_budget:
+            return super().dispatch(request, *args, **kwargs)
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            response = super().dispatch(request, *args, **kwargs)
+
+        self.check_query_budget(response, queries)
+        return response
+
+    def check_query_budget(self, response, queries):
+        """Report the request when it ran more queries than allowed."""
+        action = getattr(self, "action", None) or self.request.method.lower()
+        budget = self.query_budget.get(action)
+        if callable(budget):
+            budget = budget(result_size(response))
+        if budget is None or len(queries) <= budget:
+            return
+
+        message = "%s.%s ran %d queries, over its budget of %d:\n%s" % (
+            type(self).__name__,
+            action,
+            len(queries),
+            budget,
+            "\n".join(queries),
+        )
+        if settings.QUERY_BUDGETS == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,33 @@
+"""
+Password hashers with work factors from the settings.
+
+Hashes made with other work factors, or by another hasher in
+``PASSWORD_HASHERS``, still verify and are rehashed with the preferred
+hasher when the user next logs in.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Memory-hard Argon2id, tuned by ``ARGON2_*`` settings."""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with SHA256, tuned by ``PBKDF2_ITERATIONS``."""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
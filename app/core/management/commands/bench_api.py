@@ -0,0 +1,367 @@
+"""
+Django command to load test the API with concurrent users.
+"""
+import contextlib
+import datetime
+import http.client
+import json
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref import simple_server
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+
+PASSWORD = 'bench-api-password'
+
+# set by the in-process server to the queries run for each response
+QUERIES_HEADER = 'X-Bench-Queries'
+
+# endpoints in the order each scenario requests them
+ENDPOINTS = [
+    'token',
+    'wishlists',
+    'wishlist',
+    'product_create',
+    'product_read',
+    'product_update',
+    'product_delete',
+]
+
+# products in the wishlist of each user
+PRODUCTS = 10
+
+
+def count_queries(application):
+    """Wrap a WSGI application to report the queries of each response."""
+    def wrapper(environ, start_response):
+        queries = 0
+
+        def execute(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        def counted_start_response(status, headers, exc_info=None):
+            headers.append((QUERIES_HEADER, str(queries)))
+            return start_response(status, headers, exc_info)
+
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(execute))
+            return application(environ, counted_start_response)
+
+    return wrapper
+
+
+class PooledWSGIServer(simple_server.WSGIServer):
+    """WSGI server handling requests on a fixed pool of threads."""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(threads, 'bench-api-server')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request,
+                             client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+
+
+class QuietWSGIRequestHandler(simple_server.WSGIRequestHandler):
+    """Request handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(percentiles, latencies, n):
+    """Return the n-th percentile in milliseconds."""
+    if not latencies:
+        return None
+    if len(latencies) == 1:
+        return round(latencies[0] * 1000, 2)
+    return round(percentiles[n - 1] * 1000, 2)
+
+
+class Command(BaseCommand):
+    """Django command to measure the API under concurrent users."""
+
+    help = (
+        'Drive concurrent workers through login, reading wishlists and '
+        'managing products, and print the latency percentiles, requests '
+        'per second and database queries per request of each endpoint '
+        'as JSON. The app is served in this process unless --url is '
+        'given; queries are only counted in process. A user per worker '
+        'is created through the API and deleted after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server sharing this database, '
+                 'e.g. http://localhost:8000.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of concurrent workers, each with its own user.',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds of load.',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            help='Scenarios each worker runs, instead of --duration.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        run = uuid.uuid4().hex[:8]
+        with self.serve(options) as url:
+            target = urlsplit(url)
+            if target.scheme != 'http' or not target.hostname:
+                raise CommandError(f'Expected an http:// URL, got {url}.')
+            try:
+                users = [
+                    self.create_user(target, f'bench-api-{run}-{i}')
+                    for i in range(options['workers'])
+                ]
+                results, elapsed = self.load(target, users, options)
+            finally:
+                get_user_model().objects.filter(
+                    email__startswith=f'bench-api-{run}-'
+                ).delete()
+
+        total = sum(len(result['latencies']) for result in results.values())
+        self.stdout.write(json.dumps({
+            'commit': self.commit(),
+            'url': options['url'],
+            'workers': options['workers'],
+            'seconds': round(elapsed, 3),
+            'requests': total,
+            'requests_per_second': round(total / elapsed, 1),
+            'errors': sum(result['errors'] for result in results.values()),
+            'endpoints': {
+                name: self.summary(result, elapsed)
+                for name, result in results.items()
+            },
+        }, indent=2))
+
+    @contextlib.contextmanager
+    def serve(self, options):
+        """Yield the base URL, serving the app here unless --url is set."""
+        if options['url']:
+            yield options['url'].rstrip('/')
+            return
+
+        server = simple_server.make_server(
+            '127.0.0.1',
+            0,
+            count_queries(get_wsgi_application()),
+            server_class=lambda *args: PooledWSGIServer(
+                *args, threads=options['workers']
+            ),
+            handler_class=QuietWSGIRequestHandler,
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f'http://127.0.0.1:{server.server_port}'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def request(self, target, method, path, token=None, data=None):
+        """
+        Send one request to the API.
+
+        Returns the status, the decoded body, the seconds taken and the
+        queries run, or None when the server does not count them.
+        """
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection(
+            target.hostname, target.port, timeout=30
+        )
+        try:
+            conn.request(method, target.path + path, body, headers)
+            response = conn.getresponse()
+            content = response.read()
+        finally:
+            conn.close()
+        seconds = time.perf_counter() - start
+
+        queries = response.getheader(QUERIES_HEADER)
+        return (
+            response.status,
+            json.loads(content) if content else None,
+            seconds,
+            None if queries is None else int(queries),
+        )
+
+    def create_user(self, target, name):
+        """Sign up a user with a wishlist and return its details."""
+        email = f'{name}@example.com'
+        status, body, seconds, queries = self.request(
+            target, 'POST', '/api/user/create/',
+            data={'email': email, 'password': PASSWORD, 'first_name': name},
+        )
+        if status != 201:
+            raise CommandError(f'Could not create a user: {status} {body}')
+        status, body, seconds, queries = self.request(
+            target, 'POST', '/api/user/token/',
+            data={'email': email, 'password': PASSWORD},
+        )
+        if status != 200:
+            raise CommandError(f'Could not log in: {status} {body}')
+        token = body['token']
+        status, body, seconds, queries = self.request(
+            target, 'POST', '/api/wishlist/wishlists/', token,
+            data={
+                'title': 'Birthday',
+                'occasion_date': str(datetime.date.today()),
+                'products': [
+                    {'name': f'Product {i}', 'price': f'{i}.99'}
+                    for i in range(PRODUCTS)
+                ],
+            },
+        )
+        if status != 201:
+            raise CommandError(f'Could not create a wishlist: {status} {body}')
+        return {'email': email, 'wishlist': body['id']}
+
+    def load(self, target, users, options):
+        """
+        Run a worker per user until the duration or iterations are over.
+
+        Returns the results by endpoint and the seconds taken.
+        """
+        results = {
+            name: {'latencies': [], 'queries': [], 'errors': 0}
+            for name in ENDPOINTS
+        }
+        lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + options['duration']
+
+        def worker(user):
+            iteration = 0
+            while (
+                iteration < options['iterations']
+                if options['iterations'] is not None
+                else time.perf_counter() < deadline
+            ):
+                iteration += 1
+                for name, response in self.scenario(target, user):
+                    status, body, seconds, queries = response
+                    with lock:
+                        result = results[name]
+                        if status is None or status >= 400:
+                            result['errors'] += 1
+                            break
+                        result['latencies'].append(seconds)
+                        if queries is not None:
+                            result['queries'].append(queries)
+
+        with ThreadPoolExecutor(len(users)) as executor:
+            for future in [executor.submit(worker, user) for user in users]:
+                future.result()
+
+        return results, time.perf_counter() - start
+
+    def scenario(self, target, user):
+        """Yield the endpoint and response of each step of a visit."""
+        def send(*args, **kwargs):
+            try:
+                return self.request(target, *args, **kwargs)
+            except (OSError, http.client.HTTPException, ValueError):
+                return None, None, 0, None
+
+        response = send('POST', '/api/user/token/', data={
+            'email': user['email'], 'password': PASSWORD,
+        })
+        yield 'token', response
+        token = response[1]['token']
+
+        wishlist = f'/api/wishlist/wishlists/{user["wishlist"]}/'
+        yield 'wishlists', send('GET', '/api/wishlist/wishlists/', token)
+        yield 'wishlist', send('GET', wishlist, token)
+
+        response = send('POST', f'{wishlist}products/', token, data={
+            'name': 'Kettle', 'price': '24.99',
+        })
+        yield 'product_create', response
+        product = f'{wishlist}products/{response[1]["id"]}/'
+        yield 'product_read', send('GET', product, token)
+        yield 'product_update', send('PATCH', product, token, data={
+            'price': '19.99',
+        })
+        yield 'product_delete', send('DELETE', product, token)
+
+    def summary(self, result, elapsed):
+        """Return the statistics of one endpoint."""
+        latencies = sorted(result['latencies'])
+        percentiles = (
+            statistics.quantiles(latencies, n=100)
+            if len(latencies) > 1 else []
+        )
+        queries = result['queries']
+        return {
+            'requests': len(latencies),
+            'errors': result['errors'],
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': percentile(percentiles, latencies, 50),
+            'p95_ms': percentile(percentiles, latencies, 95),
+            'p99_ms': percentile(percentiles, latencies, 99),
+            'queries_per_request': (
+                round(statistics.mean(queries), 2) if queries else None
+            ),
+        }
+
+    def commit(self):
+        """Return the git commit of the code under test, if known."""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
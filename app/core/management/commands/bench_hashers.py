@@ -0,0 +1,130 @@
+"""
+Django command to benchmark password hashing work factors.
+"""
+import argparse
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+# Argon2id settings OWASP considers equally strong, as
+# (time cost, memory cost in KiB, parallelism)
+ARGON2_OPTIONS = [
+    (1, 47104, 1),
+    (2, 19456, 1),
+    (3, 12288, 1),
+    (4, 9216, 1),
+    (5, 7168, 1),
+]
+PBKDF2_OPTIONS = [260000, 600000]
+
+
+def argon2_params(value):
+    """Parse ``time,memory,parallelism`` from the command line."""
+    try:
+        time_cost, memory_cost, parallelism = map(int, value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'Expected time,memory,parallelism for --argon2, got {value}.'
+        )
+    return time_cost, memory_cost, parallelism
+
+
+class Command(BaseCommand):
+    """Django command to time password hashers on this machine."""
+
+    help = (
+        'Time hashing and verifying a password with Argon2 and PBKDF2 '
+        'work factors, to choose the ARGON2_* and PBKDF2_ITERATIONS '
+        'settings. Each verify is one login.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--argon2',
+            type=argon2_params,
+            action='append',
+            help='Argon2 time,memory,parallelism to time; repeatable.',
+        )
+        parser.add_argument(
+            '--pbkdf2',
+            type=int,
+            action='append',
+            help='PBKDF2 iterations to time; repeatable.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Runs per setting; the median is reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        current_argon2 = (
+            settings.ARGON2_TIME_COST,
+            settings.ARGON2_MEMORY_COST,
+            settings.ARGON2_PARALLELISM,
+        )
+        argon2_options = options['argon2']
+        pbkdf2_options = options['pbkdf2']
+        if argon2_options is None and pbkdf2_options is None:
+            argon2_options = sorted(
+                {current_argon2, *ARGON2_OPTIONS}, key=lambda x: x[0]
+            )
+            pbkdf2_options = sorted(
+                {settings.PBKDF2_ITERATIONS, *PBKDF2_OPTIONS}
+            )
+
+        for time_cost, memory_cost, parallelism in argon2_options or []:
+            hasher = type('Hasher', (Argon2PasswordHasher,), {
+                'time_cost': time_cost,
+                'memory_cost': memory_cost,
+                'parallelism': parallelism,
+            })()
+            current = (time_cost, memory_cost, parallelism) == current_argon2
+            self.bench(
+                f'argon2 time={time_cost} memory={memory_cost} '
+                f'parallelism={parallelism}',
+                hasher,
+                current,
+                options['repeat'],
+            )
+
+        for iterations in pbkdf2_options or []:
+            hasher = type('Hasher', (PBKDF2PasswordHasher,), {
+                'iterations': iterations,
+            })()
+            self.bench(
+                f'pbkdf2_sha256 iterations={iterations}',
+                hasher,
+                iterations == settings.PBKDF2_ITERATIONS,
+                options['repeat'],
+            )
+
+    def bench(self, label, hasher, current, repeat):
+        """Report the hash and verify times of one setting."""
+        password = 'correct horse battery staple'
+        hash_times = []
+        verify_times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            encoded = hasher.encode(password, hasher.salt())
+            hash_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            if not hasher.verify(password, encoded):
+                raise CommandError(f'{label} did not verify its own hash.')
+            verify_times.append(time.perf_counter() - start)
+
+        verify_time = statistics.median(verify_times)
+        self.stdout.write(
+            f'{label}{" (current)" if current else ""}: '
+            f'hash {statistics.median(hash_times) * 1000:.1f} ms, '
+            f'verify {verify_time * 1000:.1f} ms, '
+            f'{1 / verify_time:.0f} logins/s per core'
+        )
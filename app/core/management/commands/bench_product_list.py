@@ -0,0 +1,101 @@
+"""
+Django command to benchmark rendering of product lists.
+"""
+import datetime
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Product, Wishlist
+from wishlist.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    """Django command to compare product list rendering paths."""
+
+    help = (
+        "Time ProductSerializer(many=True) against the row based "
+        "rendering for wishlists of the given sizes. Sample data is "
+        "created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Number of products in each benchmarked wishlist.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per path; the fastest one is reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='bench-product-list@example.com',
+            )
+            for size in options['sizes']:
+                self.bench(user, size, options['repeat'])
+            transaction.set_rollback(True)
+
+    def bench(self, user, size, repeat):
+        """Report the timings for a wishlist of ``size`` products."""
+        wishlist = Wishlist.objects.create(
+            user=user,
+            title=f'Benchmark {size}',
+            occasion_date=datetime.date.today(),
+        )
+        Product.objects.bulk_create(
+            Product(
+                wishlist=wishlist,
+                name=f'Product {i}',
+                price=Decimal(i % 1000) / 10,
+                priority=Product.PRIORITY_CHOICES[i % 3][0],
+                link=f'https://example.com/{i}' if i % 2 else None,
+                notes='Sample notes',
+            )
+            for i in range(size)
+        )
+        # bulk inserts leave the product counts to be set
+        Wishlist.objects.filter(pk=wishlist.pk).recount_products()
+        queryset = Product.objects.filter(wishlist=wishlist).order_by('-id')
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            return ProductSerializer(queryset.all(), many=True).data
+
+        def rows_path():
+            return ProductSerializer(many=True).represent_rows(queryset)
+
+        serializer_time, serializer_data = self.time(serializer_path, repeat)
+        rows_time, rows_data = self.time(rows_path, repeat)
+        if renderer.render(serializer_data) != renderer.render(rows_data):
+            raise CommandError(f'Rendered output differs at {size} products.')
+
+        self.stdout.write(
+            f'{size} products: serializer {serializer_time * 1000:.1f} ms, '
+            f'rows {rows_time * 1000:.1f} ms, '
+            f'{serializer_time / rows_time:.1f}x faster'
+        )
+
+    def time(self, func, repeat):
+        """Return the fastest of ``repeat`` runs and the last result."""
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, result
@@ -0,0 +1,164 @@
+"""
+Django command to benchmark the product search.
+"""
+import datetime
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Product, Wishlist
+from wishlist.search import search, trigram_installed
+
+
+ADJECTIVES = [
+    'soft', 'warm', 'light', 'vintage', 'classic', 'leather', 'wool',
+    'cotton', 'silk', 'wooden', 'ceramic', 'steel', 'portable', 'compact',
+    'wireless', 'handmade', 'organic', 'waterproof', 'striped', 'knitted',
+]
+COLOURS = [
+    'red', 'blue', 'green', 'black', 'white', 'grey', 'pink', 'yellow',
+    'navy', 'olive', 'cream', 'brown', 'silver', 'gold', 'purple',
+]
+NOUNS = [
+    'scarf', 'jacket', 'sweater', 'boots', 'trainers', 'backpack', 'wallet',
+    'watch', 'headphones', 'speaker', 'lamp', 'mug', 'teapot', 'kettle',
+    'blanket', 'cushion', 'notebook', 'pen', 'camera', 'tripod', 'guitar',
+    'keyboard', 'mouse', 'monitor', 'chair', 'desk', 'plant', 'vase',
+    'candle', 'puzzle', 'novel', 'cookbook', 'bicycle', 'helmet', 'tent',
+    'hammock', 'umbrella', 'sunglasses', 'perfume', 'necklace',
+]
+
+# searches timed for one user, by kind
+QUERIES = [
+    ('one word', 'kettle'),
+    ('stemmed word', 'kettles'),
+    ('two words', 'wool scarf'),
+    ('phrase', '"red wool"'),
+    ('notes', 'anniversary'),
+    ('misspelled', 'kettel'),
+]
+
+
+class Command(BaseCommand):
+    """Django command to time product searches on a large table."""
+
+    help = (
+        'Fill the product table with generated products and time '
+        'searches of one user. The data is created in a transaction '
+        'that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=1000000,
+            help='Number of products to generate.',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Number of users the products are spread over.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per search; the median and slowest are reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('The search benchmark needs PostgreSQL.')
+
+        with transaction.atomic():
+            user = self.create_data(options['products'], options['users'])
+            for label, text in QUERIES:
+                self.bench(user, label, text, options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_data(self, products, users):
+        """Generate the products and return the user to search as."""
+        start = time.perf_counter()
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                email=f'bench-search-{i}@example.com', password='!'
+            )
+            for i in range(users)
+        )
+        wishlists = Wishlist.objects.bulk_create(
+            Wishlist(
+                user=user,
+                title=f'Wishlist {i}',
+                occasion_date=datetime.date.today(),
+            )
+            for user in users
+            for i in range(10)
+        )
+
+        with connection.cursor() as cursor:
+            # random names like "soft red scarf", one in fifty with a
+            # note, the products of each wishlist added together
+            cursor.execute(
+                f'''
+                INSERT INTO {Product._meta.db_table}
+                    (name, link, priority, price, notes, wishlist_id)
+                SELECT
+                    a[1 + floor(random() * cardinality(a))::int] || ' '
+                        || c[1 + floor(random() * cardinality(c))::int]
+                        || ' ' || n[1 + floor(random() * cardinality(n))::int],
+                    NULL,
+                    'LOW',
+                    round((random() * 100)::numeric, 2),
+                    CASE WHEN random() < 0.02
+                        THEN 'for our anniversary' ELSE '' END,
+                    w[1 + (i - 1)::bigint * cardinality(w) / %s]
+                FROM generate_series(1, %s) AS i,
+                    (SELECT %s::text[], %s::text[], %s::text[],
+                        %s::int[]) AS words(a, c, n, w)
+                ''',
+                [
+                    products,
+                    products,
+                    ADJECTIVES,
+                    COLOURS,
+                    NOUNS,
+                    [wishlist.id for wishlist in wishlists],
+                ],
+            )
+            # the insert leaves the product counts to be set
+            Wishlist.objects.filter(user__in=users).recount_products()
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+            cursor.execute(f'ANALYZE {Wishlist._meta.db_table}')
+
+        self.stdout.write(
+            f'Created {products} products for {len(users)} users in '
+            f'{time.perf_counter() - start:.1f}s.'
+        )
+        if not trigram_installed(connection.alias):
+            self.stdout.write('pg_trgm is not installed, no typo matching.')
+        return users[0]
+
+    def bench(self, user, label, text, repeat):
+        """Report the timings of one search."""
+        queryset = Product.objects.filter(wishlist__user=user).only(
+            'id', 'name', 'price'
+        )
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            results = list(
+                search(queryset, text, ['name', 'notes'], 'name')[:20]
+            )
+            timings.append(time.perf_counter() - start)
+
+        self.stdout.write(
+            f'{label} ({text}): {len(results)} results, '
+            f'median {statistics.median(timings) * 1000:.1f} ms, '
+            f'slowest {max(timings) * 1000:.1f} ms'
+        )
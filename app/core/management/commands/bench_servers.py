@@ -0,0 +1,251 @@
+"""
+Django command to benchmark the API under WSGI and ASGI servers.
+"""
+import asyncio
+import datetime
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Product, Wishlist
+
+
+EMAIL = 'bench-servers@example.com'
+
+# server commands by name, each with one worker process
+SERVERS = {
+    'wsgi': [
+        '-m', 'gunicorn', 'app.wsgi:application',
+        '--workers', '1', '--worker-class', 'sync',
+        '--bind', '127.0.0.1:{port}',
+    ],
+    'wsgi-threads': [
+        '-m', 'gunicorn', 'app.wsgi:application',
+        '--workers', '1', '--worker-class', 'gthread',
+        '--threads', '{threads}', '--bind', '127.0.0.1:{port}',
+    ],
+    'asgi': [
+        '-m', 'uvicorn', 'app.asgi:application',
+        '--workers', '1', '--no-access-log', '--log-level', 'warning',
+        '--host', '127.0.0.1', '--port', '{port}',
+    ],
+}
+
+# seconds to wait for a server to answer its first request
+START_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    """Django command to compare WSGI and ASGI servers under load."""
+
+    help = (
+        'Start each server with one worker and time concurrent clients '
+        'while other clients take --slow seconds to send each request. '
+        'A user with sample wishlists is created for the run and '
+        'deleted after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers',
+            nargs='+',
+            choices=list(SERVERS),
+            default=list(SERVERS),
+            help='Servers to benchmark.',
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=10,
+            help='Number of concurrent clients that are timed.',
+        )
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=50,
+            help='Number of concurrent slow clients.',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds of load per server.',
+        )
+        parser.add_argument(
+            '--slow',
+            type=float,
+            default=1,
+            help='Seconds each slow client takes to send its request.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.ASYNC_VIEW_THREADS,
+            help='Threads of the threaded WSGI worker and the ASGI pool.',
+        )
+        parser.add_argument(
+            '--path',
+            default='/api/wishlist/wishlists/',
+            help='Path requested by every client.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for module in ['gunicorn', 'uvicorn']:
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(
+                    f'{module} is needed for the benchmark, install it '
+                    f'with pip.'
+                )
+
+        token = self.create_data()
+        try:
+            request = (
+                f'GET {options["path"]} HTTP/1.1\r\n'
+                f'Host: localhost\r\n'
+                f'Authorization: Token {token}\r\n'
+                f'Connection: close\r\n\r\n'
+            ).encode()
+            for name in options['servers']:
+                self.bench(name, request, options)
+        finally:
+            get_user_model().objects.filter(email=EMAIL).delete()
+
+    def create_data(self):
+        """Create the user the clients act as and return its token."""
+        get_user_model().objects.filter(email=EMAIL).delete()
+        user = get_user_model().objects.create_user(email=EMAIL)
+        for i in range(10):
+            wishlist = Wishlist.objects.create(
+                user=user,
+                title=f'Wishlist {i}',
+                occasion_date=datetime.date.today(),
+            )
+            Product.objects.bulk_create(
+                Product(wishlist=wishlist, name=f'Product {j}', price=j)
+                for j in range(10)
+            )
+        # bulk inserts leave the product counts to be set
+        Wishlist.objects.filter(user=user).recount_products()
+        return Token.objects.create(user=user).key
+
+    def bench(self, name, request, options):
+        """Start one server, put it under load and report the results."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        command = [sys.executable] + [
+            arg.format(port=port, threads=options['threads'])
+            for arg in SERVERS[name]
+        ]
+        env = dict(os.environ, ASYNC_VIEW_THREADS=str(options['threads']))
+        server = subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_server(server, port, request)
+            results, slow_done, elapsed = asyncio.run(
+                self.load(port, request, options)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        errors = len(results) - len(latencies)
+        if len(latencies) < 2:
+            self.stdout.write(f'{name}: {errors} errors, no successes')
+            return
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{name}: {len(latencies)} requests, '
+            f'{len(latencies) / elapsed:.1f} req/s, '
+            f'p50 {percentiles[49] * 1000:.1f} ms, '
+            f'p99 {percentiles[98] * 1000:.1f} ms, '
+            f'{errors} errors, {slow_done} slow requests'
+        )
+
+    def wait_for_server(self, server, port, request):
+        """Wait until the server answers a request."""
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{server.args[2]} exited on start.')
+            try:
+                ok, latency = asyncio.run(self.send(port, request, 0))
+            except OSError:
+                ok = False
+            if ok:
+                return
+            time.sleep(0.2)
+
+        raise CommandError(f'{server.args[2]} did not start in time.')
+
+    async def load(self, port, request, options):
+        """
+        Run the clients until the duration is over.
+
+        Returns the results of the timed clients, the number of requests
+        the slow clients completed and the time taken.
+        """
+        results = []
+        slow_results = []
+        start = time.perf_counter()
+        deadline = start + options['duration']
+
+        async def client(results, slow):
+            while time.perf_counter() < deadline:
+                try:
+                    results.append(await self.send(port, request, slow))
+                except OSError:
+                    results.append((False, 0))
+
+        await asyncio.gather(
+            *(client(results, 0) for i in range(options['clients'])),
+            *(
+                client(slow_results, options['slow'])
+                for i in range(options['slow_clients'])
+            ),
+        )
+        slow_done = sum(ok for ok, latency in slow_results)
+        return results, slow_done, time.perf_counter() - start
+
+    async def send(self, port, request, slow):
+        """
+        Send one request, ``slow`` seconds between its two halves.
+
+        Returns whether it succeeded and the seconds it took.
+        """
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            half = len(request) // 2
+            writer.write(request[:half])
+            await writer.drain()
+            if slow:
+                await asyncio.sleep(slow)
+            writer.write(request[half:])
+            await writer.drain()
+            status = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+
+        ok = status.split(b' ')[1:2] == [b'200']
+        return ok, time.perf_counter() - start
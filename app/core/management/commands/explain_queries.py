@@ -0,0 +1,152 @@
+"""
+Django command to print the query plan of each API endpoint.
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Product, Wishlist
+from wishlist import views
+
+
+# query strings each list endpoint is explained with, paginated as the
+# clients page, and with each ordering backed by an index
+LIST_PARAMS = {
+    'wishlist list': [{}, {'page_size': 20}],
+    'product list': [
+        {},
+        {'page_size': 20},
+        {'ordering': 'price', 'page_size': 20},
+        {'ordering': '-name', 'page_size': 20},
+        {'ordering': '-priority', 'page_size': 20},
+        {'has_link': 'true', 'page_size': 20},
+    ],
+}
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN the queries of each endpoint."""
+
+    help = (
+        "Print EXPLAIN output for the queries of each wishlist endpoint, "
+        "as the views run them with their filters and pagination."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User to run the queries as. Defaults to the user with '
+                 'the most wishlists.',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries with EXPLAIN ANALYZE.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = self.get_user(options['email'])
+        wishlist = (
+            Wishlist.objects.filter(user=user)
+            .order_by('-product_count')
+            .first()
+        )
+        if wishlist is None:
+            raise CommandError(f'{user} has no wishlists to explain.')
+        product = Product.objects.filter(wishlist=wishlist).first()
+
+        endpoints = [
+            (
+                'wishlist list',
+                views.WishlistViewSet.as_view({'get': 'list'}),
+                {},
+            ),
+            (
+                'wishlist detail',
+                views.WishlistViewSet.as_view({'get': 'retrieve'}),
+                {'pk': wishlist.id},
+            ),
+            (
+                'product list',
+                views.ProductViewSet.as_view(),
+                {'wishlist_id': wishlist.id},
+            ),
+        ]
+        if product is not None:
+            endpoints.append((
+                'product detail',
+                views.ProductDetailViewSet.as_view(),
+                {'wishlist_id': wishlist.id, 'product_id': product.id},
+            ))
+
+        # every request reaches the database
+        no_cache = {kind: 0 for kind in settings.WISHLIST_CACHE_TTL}
+        with override_settings(WISHLIST_CACHE_TTL=no_cache):
+            for name, view, kwargs in endpoints:
+                for params in LIST_PARAMS.get(name, [{}]):
+                    heading = ' '.join([name, urlencode(params)]).strip()
+                    self.stdout.write(self.style.MIGRATE_HEADING(
+                        f'{heading}:'
+                    ))
+                    for sql, query_params in self.run(
+                        view, user, kwargs, params
+                    ):
+                        self.explain(sql, query_params, options['analyze'])
+
+    def run(self, view, user, kwargs, params):
+        """Request ``view`` and return the SELECTs it ran, with params."""
+        queries = []
+
+        def record(execute, sql, query_params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, query_params))
+            return execute(sql, query_params, many, context)
+
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user)
+        with connection.execute_wrapper(record):
+            response = view(request, **kwargs)
+        if response.status_code != 200:
+            raise CommandError(
+                f'The request answered {response.status_code}: '
+                f'{response.data}'
+            )
+        return queries
+
+    def explain(self, sql, params, analyze):
+        """Print a query and its plan."""
+        # only PostgreSQL takes the option, even when false
+        explain_options = {'analyze': True} if analyze else {}
+        prefix = connection.ops.explain_query_prefix(**explain_options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            plan = [' '.join(str(column) for column in row) for row in cursor]
+
+        # interpolated like str(queryset.query), for reading only
+        self.stdout.write(sql % tuple(params or ()))
+        self.stdout.write('\n'.join(plan))
+        self.stdout.write('')
+
+    def get_user(self, email):
+        """Return the user to run the queries as."""
+        users = get_user_model().objects.all()
+        if email:
+            user = users.filter(email=email).first()
+        else:
+            user = (
+                users.annotate(wishlist_count=Count('wishlist'))
+                .order_by('-wishlist_count')
+                .first()
+            )
+        if user is None:
+            raise CommandError('No user found to run the queries as.')
+
+        return user
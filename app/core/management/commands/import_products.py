@@ -0,0 +1,67 @@
+"""
+Django command to import products into a wishlist.
+"""
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Wishlist
+from wishlist.imports import FORMATS, guess_format, import_products
+
+
+class Command(BaseCommand):
+    """Django command to import products from CSV or NDJSON."""
+
+    help = (
+        "Import products into a wishlist from a CSV or NDJSON file. "
+        "Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('wishlist_id', type=int)
+        parser.add_argument('path', help='File to import, or - for stdin.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Format of the file; defaults to its extension.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            wishlist = Wishlist.objects.get(pk=options['wishlist_id'])
+        except Wishlist.DoesNotExist:
+            raise CommandError(
+                f'Wishlist {options["wishlist_id"]} does not exist.'
+            )
+
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if fmt is None:
+            raise CommandError(
+                f'Could not tell the format of {path}, use --format.'
+            )
+
+        start = time.perf_counter()
+        if path == '-':
+            report = import_products(wishlist, sys.stdin.buffer, fmt)
+        else:
+            try:
+                with open(path, 'rb') as stream:
+                    report = import_products(wishlist, stream, fmt)
+            except OSError as error:
+                raise CommandError(error)
+        elapsed = time.perf_counter() - start
+
+        for error in report['errors']:
+            self.stderr.write(
+                f'line {error["line"]}: {json.dumps(error["errors"])}'
+            )
+        rows = report['imported'] + report['failed']
+        self.stdout.write(
+            f'Imported {report["imported"]} products, '
+            f'{report["failed"]} rows failed, in {elapsed:.2f}s '
+            f'({rows / elapsed:.0f} rows/s).'
+        )
@@ -0,0 +1,67 @@
+"""
+Django command to recount the products of wishlists.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from core.models import Wishlist
+from wishlist import cache
+
+
+class Command(BaseCommand):
+    """Django command to repair the product counts of wishlists."""
+
+    help = (
+        "Recount the product count and total price of every wishlist "
+        "in batches, fixing the ones that are off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Wishlists checked at a time.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Wishlist.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            repaired += self.repair(ids)
+
+        self.stdout.write(
+            f'Checked {checked} wishlists, repaired {repaired}.'
+        )
+
+    def repair(self, ids):
+        """Recount the wishlists of ``ids`` that are off."""
+        # only these get a new version and lose their cached responses
+        wrong = list(
+            Wishlist.objects.filter(pk__in=ids)
+            .with_product_totals()
+            .filter(
+                ~Q(product_count=F('counted_products'))
+                | ~Q(total_price=F('counted_price'))
+            )
+            .values_list('pk', 'user_id')
+        )
+        if not wrong:
+            return 0
+
+        Wishlist.objects.filter(
+            pk__in=[pk for pk, user_id in wrong]
+        ).recount_products()
+        for pk, user_id in wrong:
+            cache.evict(user_id, pk)
+        return len(wrong)
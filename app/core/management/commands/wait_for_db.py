@@ -1,27 +1,138 @@
 """
 Django command to wait for the database to be available.
 """
+import json
+import random
+import threading
 import time
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    help = (
+        'Wait until every configured database accepts connections, '
+        'probing each in parallel with exponential backoff.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for; repeatable. Default: all.',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            help='Seconds to wait before failing. Default: wait forever.',
+        )
+        parser.add_argument(
+            '--initial-delay',
+            type=float,
+            default=0.1,
+            help='Seconds before the second probe; doubled after each.',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Longest wait between two probes, in seconds.',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Only print the time each database took, as JSON.',
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
-        self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+        self.quiet = options['json']
+        aliases = options['databases'] or list(connections)
+        start = time.monotonic()
+        deadline = start + options['timeout'] if options['timeout'] else None
+        self.log('Waiting for database...')
+
+        results = {
+            alias: {'ready': False, 'attempts': 0, 'seconds': None}
+            for alias in aliases
+        }
+        threads = [
+            threading.Thread(
+                target=self.wait,
+                args=(alias, results[alias], deadline, options),
+                # a probe stuck connecting must not keep the process alive
+                daemon=True,
+            )
+            for alias in aliases
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(
+                None if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+
+        ready = all(result['ready'] for result in results.values())
+        if self.quiet:
+            self.stdout.write(json.dumps({
+                'ready': ready,
+                'seconds': round(time.monotonic() - start, 3),
+                'databases': results,
+            }))
+
+        if not ready:
+            missing = [
+                alias for alias, result in results.items()
+                if not result['ready']
+            ]
+            raise CommandError(
+                'Database unavailable after %ss: %s.'
+                % (options['timeout'], ', '.join(missing))
+            )
+        self.log(self.style.SUCCESS('Database available!'))
+
+    def wait(self, alias, result, deadline, options):
+        """Probe one database until it is up or the deadline passes."""
+        start = time.monotonic()
+        delay = options['initial_delay']
+        try:
+            while True:
+                result['attempts'] += 1
+                try:
+                    self.check(databases=[alias])
+                except (Psycopg2OpError, OperationalError):
+                    pass
+                else:
+                    result['ready'] = True
+                    result['seconds'] = round(time.monotonic() - start, 3)
+                    return
+
+                # up to half the delay is random, so instances started
+                # together do not probe together
+                sleep = delay * random.uniform(0.5, 1)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    sleep = min(sleep, remaining)
+                self.log(
+                    'Database %s unavailable, waiting %.2f seconds...'
+                    % (alias, sleep)
+                )
+                time.sleep(sleep)
+                delay = min(delay * 2, options['max_delay'])
+        finally:
+            connections[alias].close()
+
+    def log(self, message):
+        """Write a progress message unless the output is JSON."""
+        if not self.quiet:
+            self.stdout.write(message)
@@ -0,0 +1,41 @@
+"""
+In-process counters exposed for tuning.
+"""
+import threading
+
+
+_sources = {}
+
+
+def register(name, source):
+    """Register a callable returning a dict of metrics under ``name``."""
+    _sources[name] = source
+
+
+def collect():
+    """Return the current metrics of every registered source."""
+    return {name: source() for name, source in _sources.items()}
+
+
+class Counters:
+    """Thread-safe named counters."""
+
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._names = names
+        self._values = dict.fromkeys(names, 0)
+
+    def incr(self, name, amount=1):
+        """Add ``amount`` to the counter ``name``."""
+        with self._lock:
+            self._values[name] += amount
+
+    def snapshot(self):
+        """Return a copy of the current counter values."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        """Set every counter back to zero."""
+        with self._lock:
+            self._values = dict.fromkeys(self._names, 0)
@@ -0,0 +1,261 @@
+"""
+Middleware for the API.
+"""
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.utils import timezone
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+from core import profiling, routers, timing
+from core.authentication import CachedTokenAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+
+def shared_cache(setting):
+    """
+    Return the cache named by ``setting``, which must be shared.
+
+    Values kept in a per-process cache, like locmem, are missing on the
+    other workers, so it is refused.
+    """
+    backend = caches[getattr(settings, setting)]
+    if isinstance(backend, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"{setting} must name a cache shared by all the processes, "
+            f"not a {type(backend).__name__}."
+        )
+    return backend
+
+
+def authenticated_user(request):
+    """
+    Return the user of a request, before the view authenticates it.
+
+    That is the session user, or else the user of the token, which
+    ``CachedTokenAuthentication`` keeps cached for the view. Returns
+    None for anonymous requests and bad tokens.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def pin_to_primary(user_id):
+    """
+    Send the reads of ``user_id`` to the primary for a while.
+
+    For ``DB_REPLICA_PIN_SECONDS``, so their next requests read what
+    they wrote. Does nothing without replicas.
+    """
+    if settings.DATABASE_REPLICAS:
+        shared_cache("DB_REPLICA_PIN_CACHE").set(
+            replica_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS
+        )
+
+
+def replica_pin_key(user_id):
+    """Return the cache key pinning a user to the primary."""
+    return f"replica-pin:{user_id}"
+
+
+def profile_cache_key(request_id):
+    """Return the cache key of the profile of a request."""
+    return f"request-profile:{request_id}"
+
+
+class ServerTimingMiddleware:
+    """
+    Report where the time of a request went.
+
+    Sampled requests are logged at INFO with the total, database,
+    serializer, view and render times, whose fields are also passed as
+    ``extra`` for structured formatters. Responses to staff users also
+    get them in a ``Server-Timing`` header; others, including requests
+    that failed to authenticate, do not. Listed first in ``MIDDLEWARE``
+    so the total covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = timing.Timings()
+        token = timing.activate(timings)
+        try:
+            with timing.record_queries():
+                response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+        timings.stop()
+
+        durations = timings.milliseconds()
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            response["Server-Timing"] = ", ".join(
+                f'db;dur={duration};desc="{timings.queries} queries"'
+                if name == "db" else f"{name};dur={duration}"
+                for name, duration in durations.items()
+            )
+        if logger.isEnabledFor(logging.INFO):
+            fields = {
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": timings.queries,
+                **{f"{name}_ms": value for name, value in durations.items()},
+            }
+            logger.info(
+                " ".join(f"{name}={value}" for name, value in fields.items()),
+                extra=fields,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = timing.current()
+        if timings is not None:
+            timings.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = timing.current()
+        if timings is not None:
+            timings.view_end = time.perf_counter()
+        return response
+
+
+class RequestProfileMiddleware:
+    """
+    Profile a request when a staff user asks with ``?profile`` or an
+    ``X-Profile`` header.
+
+    The functions with the most cumulative time and the SQL of the
+    request are kept for ``REQUEST_PROFILE_TTL`` seconds in the shared
+    ``REQUEST_PROFILE_CACHE``, under a request id the server generates,
+    returned in ``X-Request-ID`` and served by the profiles API. Anyone
+    else asking gets the response without a profile.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.cache = shared_cache("REQUEST_PROFILE_CACHE")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if "HTTP_X_PROFILE" not in request.META and (
+            "profile" not in request.GET
+        ):
+            return self.get_response(request)
+
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        # never the client's, so a request cannot replace another profile
+        request_id = uuid.uuid4().hex
+
+        request_profile = profiling.RequestProfile()
+        token = profiling.activate(request_profile)
+        start = time.perf_counter()
+        try:
+            with request_profile.thread():
+                response = self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+
+        self.cache.set(
+            profile_cache_key(request_id),
+            {
+                "id": request_id,
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "user": user.email,
+                "created": timezone.now().isoformat(),
+                "total_ms": round((time.perf_counter() - start) * 1000, 3),
+                "functions": request_profile.functions(
+                    settings.REQUEST_PROFILE_FUNCTIONS
+                ),
+                "sql": request_profile.sql,
+            },
+            settings.REQUEST_PROFILE_TTL,
+        )
+        response["X-Request-ID"] = request_id
+        return response
+
+    def get_staff_user(self, request):
+        """Return the user of the request if they are staff, else None."""
+        user = authenticated_user(request)
+        if user is not None and user.is_active and user.is_staff:
+            return user
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Read from a random replica for safe requests.
+
+    A user who writes is pinned to the primary for
+    ``DB_REPLICA_PIN_SECONDS``, whatever token or session they send
+    next, so their next requests read what they wrote. Anonymous writes
+    pin nobody, but the user of a new token is pinned when it is issued,
+    see ``pin_to_primary``. Pins are kept in the shared
+    ``DB_REPLICA_PIN_CACHE``. Listed after the authentication
+    middleware, for the session user.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.cache = shared_cache("DB_REPLICA_PIN_CACHE")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin_key = self.get_pin_key(request)
+        if request.method not in SAFE_METHODS or (
+            pin_key is not None and self.cache.get(pin_key)
+        ):
+            response = self.get_response(request)
+            wrote = request.method not in SAFE_METHODS
+        else:
+            reads = routers.ReplicaReads(
+                random.choice(settings.DATABASE_REPLICAS)
+            )
+            token = routers.activate(reads)
+            try:
+                response = self.get_response(request)
+            finally:
+                routers.deactivate(token)
+            wrote = reads.wrote
+
+        if wrote and pin_key is not None:
+            self.cache.set(pin_key, True, settings.DB_REPLICA_PIN_SECONDS)
+        return response
+
+    def get_pin_key(self, request):
+        """Return the cache key pinning the user, None if anonymous."""
+        user = authenticated_user(request)
+        if user is None:
+            return None
+        return replica_pin_key(user.pk)
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not lock the tables against writes,
+    # but cannot run inside a transaction. Other databases than
+    # PostgreSQL get a plain CREATE INDEX.
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_alter_product_wishlist'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['wishlist', 'id'], name='product_wishlist_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='wishlist',
+            index=models.Index(fields=['user', 'id'], name='wishlist_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:49
+
+from django.db import migrations, models
+import uuid
+
+
+def set_versions(apps, schema_editor):
+    """Give each existing wishlist a version stamp of its own."""
+    Wishlist = apps.get_model('core', 'Wishlist')
+    wishlists = Wishlist.objects.filter(version__isnull=True).only('id')
+    batch = []
+    for wishlist in wishlists.iterator(chunk_size=1000):
+        wishlist.version = uuid.uuid4()
+        batch.append(wishlist)
+        if len(batch) == 1000:
+            Wishlist.objects.bulk_update(batch, ['version'])
+            batch = []
+    Wishlist.objects.bulk_update(batch, ['version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_wishlist_product_indexes'),
+    ]
+
+    # a default on AddField is evaluated once, which would give every
+    # existing wishlist the same version, so fill the column row by row
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='version',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_versions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='wishlist',
+            name='version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
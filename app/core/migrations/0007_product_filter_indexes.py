@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:05
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+from core.operations import AddIndexConcurrently
+
+
+def fix_default_priority(apps, schema_editor):
+    """Store the old default priority, the label "low", as LOW."""
+    Product = apps.get_model('core', 'Product')
+    Product.objects.filter(priority='low').update(priority='LOW')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not lock the tables against writes,
+    # but cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_wishlist_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='priority',
+            field=models.CharField(blank=True, choices=[('HIGH', 'high'), ('MEDIUM', 'medium'), ('LOW', 'low')], default='LOW', max_length=6),
+        ),
+        migrations.RunPython(
+            fix_default_priority, migrations.RunPython.noop
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['wishlist', 'price', 'id'], name='product_wishlist_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['wishlist', 'name', 'id'], name='product_wishlist_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(django.db.models.expressions.F('wishlist'), django.db.models.expressions.Case(django.db.models.expressions.When(priority='LOW', then=django.db.models.expressions.Value(1)), django.db.models.expressions.When(priority='MEDIUM', then=django.db.models.expressions.Value(2)), django.db.models.expressions.When(priority='HIGH', then=django.db.models.expressions.Value(3)), default=django.db.models.expressions.Value(0), output_field=models.IntegerField()), django.db.models.expressions.F('id'), name='product_wishlist_priority_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('link__gt', '')), fields=['wishlist', 'id'], name='product_wishlist_link_idx'),
+        ),
+    ]
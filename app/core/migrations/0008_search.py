@@ -0,0 +1,150 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.operations import AddIndexConcurrently, PostgreSQLOnly
+
+
+# Keep the search vectors up to date on every insert and on updates of
+# the searched columns, including bulk inserts and COPY.
+TRIGGER_SQL = """
+CREATE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.{a}, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.{b}, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {table}_search_vector
+    BEFORE INSERT OR UPDATE OF {a}, {b} ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_search_vector();
+"""
+
+# fill in the rows already there, a batch of ids at a time
+BACKFILL_SQL = """
+UPDATE {table} SET search_vector =
+    setweight(to_tsvector('english', coalesce({a}, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({b}, '')), 'B')
+WHERE id > %s AND id <= %s
+"""
+
+BACKFILL_BATCH_SIZE = 1000
+
+SEARCHED_COLUMNS = [
+    ('core_product', 'name', 'notes'),
+    ('core_wishlist', 'title', 'description'),
+]
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER {table}_search_vector ON {table};
+DROP FUNCTION {table}_search_vector();
+"""
+
+
+def search_trigger(table, a, b):
+    """Return the operation adding the search trigger of a table."""
+    names = {'table': table, 'a': a, 'b': b}
+    return PostgreSQLOnly(
+        migrations.RunSQL(
+            TRIGGER_SQL.format(**names), DROP_TRIGGER_SQL.format(**names)
+        )
+    )
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """
+    Compute the search vectors of the rows already there.
+
+    The migration is not atomic, so each batch commits on its own and
+    holds its row locks briefly, where one UPDATE of the whole table
+    would lock every row until it finished.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for table, a, b in SEARCHED_COLUMNS:
+            cursor.execute(f'SELECT max(id) FROM {table}')
+            last_id = cursor.fetchone()[0] or 0
+            sql = BACKFILL_SQL.format(table=table, a=a, b=b)
+            for start in range(0, last_id, BACKFILL_BATCH_SIZE):
+                cursor.execute(sql, [start, start + BACKFILL_BATCH_SIZE])
+
+
+# trigram indexes for typo tolerant matching of short text
+TRIGRAM_INDEXES = [
+    ('core_product_name_trgm_idx', 'core_product', 'name'),
+    ('core_wishlist_title_trgm_idx', 'core_wishlist', 'title'),
+]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """Add the trigram indexes where the pg_trgm extension is available."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not lock the tables against writes,
+    # but cannot run inside a transaction. The triggers and the search
+    # indexes are only created on PostgreSQL, other databases search
+    # with icontains.
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        *[search_trigger(*columns) for columns in SEARCHED_COLUMNS],
+        migrations.RunPython(
+            backfill_search_vectors, migrations.RunPython.noop, atomic=False
+        ),
+        PostgreSQLOnly(AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+        )),
+        PostgreSQLOnly(AddIndexConcurrently(
+            model_name='wishlist',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='wishlist_search_idx'),
+        )),
+        migrations.RunPython(
+            add_trigram_indexes, remove_trigram_indexes, atomic=False
+        ),
+    ]
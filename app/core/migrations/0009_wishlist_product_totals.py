@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+# count the products already there, later writes keep the counts
+COUNT_SQL = """
+UPDATE core_wishlist SET
+    product_count = (
+        SELECT count(*) FROM core_product
+        WHERE core_product.wishlist_id = core_wishlist.id
+    ),
+    total_price = (
+        SELECT coalesce(sum(price), 0) FROM core_product
+        WHERE core_product.wishlist_id = core_wishlist.id
+    );
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunSQL(COUNT_SQL, migrations.RunSQL.noop),
+    ]
@@ -2,8 +2,14 @@
 Database models.
 """
 
+import contextvars
+from contextlib import contextmanager
+
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, router, transaction
+from django.db.models.functions import Coalesce
 import uuid
 
 from django.contrib.auth.models import (
@@ -13,7 +19,42 @@ from django.contrib.auth.models import (
 )
 
 
-class UserManager(BaseUserManager):
+_product_signals_muted = contextvars.ContextVar(
+    "product_signals_muted", default=False
+)
+
+
+@contextmanager
+def mute_product_signals():
+    """
+    Skip the per product wishlist updates while writing many products.
+
+    Code that writes products in bulk updates the wishlist once itself,
+    for example by saving it, instead of once per product. Deleting
+    wishlists or users mutes them for the products deleted with them.
+    """
+    reset_token = _product_signals_muted.set(True)
+    try:
+        yield
+    finally:
+        _product_signals_muted.reset(reset_token)
+
+
+def product_signals_muted():
+    """Return True inside ``mute_product_signals``."""
+    return _product_signals_muted.get()
+
+
+class ProductOwnerQuerySet(models.QuerySet):
+    """Queries for models whose deletes cascade to products."""
+
+    def delete(self):
+        """Delete, without counting each cascaded product out."""
+        with mute_product_signals():
+            return super().delete()
+
+
+class UserManager(BaseUserManager.from_queryset(ProductOwnerQuerySet)):
     """Manager for users."""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -61,6 +102,77 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    def delete(self, *args, **kwargs):
+        """Delete the user, the wishlists go with their products."""
+        with mute_product_signals():
+            return super().delete(*args, **kwargs)
+
+
+class WishlistQuerySet(ProductOwnerQuerySet):
+    """Queries for wishlists."""
+
+    def touch(self):
+        """Give the wishlists a new version stamp."""
+        return self.update(version=uuid.uuid4())
+
+    def add_products(self, count, total):
+        """
+        Count ``count`` products worth ``total`` into the wishlists.
+
+        Negative numbers count products out. The columns are changed
+        in the database, so concurrent writes are not lost. The
+        wishlists get a new version stamp.
+        """
+        return self.update(
+            product_count=models.F("product_count") + count,
+            total_price=models.F("total_price") + total,
+            version=uuid.uuid4(),
+        )
+
+    def with_product_totals(self):
+        """Annotate the count and total price of the products."""
+        return self.annotate(
+            counted_products=product_count_subquery(),
+            counted_price=product_total_subquery(),
+        )
+
+    def recount_products(self):
+        """Set the product count and total price from the products."""
+        return self.update(
+            product_count=product_count_subquery(),
+            total_price=product_total_subquery(),
+            version=uuid.uuid4(),
+        )
+
+
+def product_subquery(aggregate, output_field):
+    """Return ``aggregate`` over the products of the outer wishlist."""
+    products = (
+        Product.objects.filter(wishlist=models.OuterRef("pk"))
+        .order_by()
+        .values("wishlist")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+    return Coalesce(
+        models.Subquery(products), 0, output_field=output_field
+    )
+
+
+def product_count_subquery():
+    """Return the number of products of the outer wishlist."""
+    return product_subquery(
+        models.Count("pk"), models.PositiveIntegerField()
+    )
+
+
+def product_total_subquery():
+    """Return the total price of the products of the outer wishlist."""
+    return product_subquery(
+        models.Sum("price"),
+        models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
 
 class Wishlist(models.Model):
     """Wishlist object."""
@@ -73,10 +185,120 @@ class Wishlist(models.Model):
     description = models.TextField(blank=True)
     occasion_date = models.DateField(blank=True)
     address = models.CharField(max_length=255, blank=True)
+    # replaced whenever the wishlist or one of its products changes
+    version = models.UUIDField(default=uuid.uuid4, editable=False)
+    # title and description, kept up to date by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+    # kept up to date as products are written, and by save for the
+    # changes counted with add_products
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+
+    objects = WishlistQuerySet.as_manager()
+
+    # products counted in but not saved yet, see add_products
+    _pending_products = (0, 0)
+
+    class Meta:
+        indexes = [
+            # serves the per user list ordered by id
+            models.Index(fields=["user", "id"], name="wishlist_user_id_idx"),
+            # serves the search, a trigram index on the title is added
+            # by migration 0008 where pg_trgm is available
+            GinIndex(fields=["search_vector"], name="wishlist_search_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def delete(self, *args, **kwargs):
+        """Delete the wishlist, its products are not counted out."""
+        with mute_product_signals():
+            return super().delete(*args, **kwargs)
+
+    def add_products(self, count, total):
+        """
+        Count ``count`` products worth ``total`` in on the next save.
+
+        Negative numbers count products out. Saving adds them to the
+        columns in the database, which a save never overwrites.
+        """
+        pending_count, pending_total = self._pending_products
+        self._pending_products = (pending_count + count, pending_total + total)
+
+    def save(self, *args, **kwargs):
+        """Save the wishlist with a new version stamp."""
+        self.version = uuid.uuid4()
+        count, total = self._pending_products
+        self._pending_products = Wishlist._pending_products
+        if self._state.adding:
+            self.product_count += count
+            self.total_price += total
+            super().save(*args, **kwargs)
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            # everything loaded, but the counts are only written as
+            # increments, so concurrent product writes are not lost
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in COUNTED_FIELDS
+            ]
+        kwargs["update_fields"] = {*update_fields, "version"}
+        if not (count or total):
+            super().save(*args, **kwargs)
+            return
+
+        kwargs["update_fields"].update(COUNTED_FIELDS)
+        loaded = [self.__dict__.get(name) for name in COUNTED_FIELDS]
+        self.product_count = models.F("product_count") + count
+        self.total_price = models.F("total_price") + total
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            # count on from the loaded values rather than leaving the
+            # expressions, a deferred count stays deferred
+            for name, value, delta in zip(
+                COUNTED_FIELDS, loaded, [count, total]
+            ):
+                if value is None:
+                    del self.__dict__[name]
+                else:
+                    setattr(self, name, value + delta)
+
+
+# written as increments by Wishlist.save
+COUNTED_FIELDS = ("product_count", "total_price")
+
+
+# priorities from lowest to highest
+PRIORITY_ORDER = ["LOW", "MEDIUM", "HIGH"]
+
+
+def priority_rank():
+    """
+    Return an expression ranking priorities by importance.
+
+    Sorting on it puts HIGH above MEDIUM above LOW, where sorting on the
+    column would be alphabetical. It matches the product index on the
+    same expression, so the database can use that index.
+    """
+    return models.Case(
+        *[
+            models.When(priority=priority, then=models.Value(rank))
+            for rank, priority in enumerate(PRIORITY_ORDER, start=1)
+        ],
+        default=models.Value(0),
+        output_field=models.IntegerField(),
+    )
+
 
 class Product(models.Model):
     """Products for wishlist."""
@@ -92,7 +314,7 @@ class Product(models.Model):
         max_length=6,
         choices=PRIORITY_CHOICES,
         blank=True,
-        default=PRIORITY_CHOICES[2][1],
+        default=LOW,
     )
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.URLField(max_length=255, blank=True, null=True)
@@ -103,6 +325,80 @@ class Product(models.Model):
         related_name="products",
         on_delete=models.CASCADE,
     )
+    # name and notes, kept up to date by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # serves the per wishlist list ordered by id
+            models.Index(
+                fields=["wishlist", "id"], name="product_wishlist_id_idx"
+            ),
+            # serve the filters and orderings of the product list
+            models.Index(
+                fields=["wishlist", "price", "id"],
+                name="product_wishlist_price_idx",
+            ),
+            models.Index(
+                fields=["wishlist", "name", "id"],
+                name="product_wishlist_name_idx",
+            ),
+            models.Index(
+                models.F("wishlist"),
+                priority_rank(),
+                models.F("id"),
+                name="product_wishlist_priority_idx",
+            ),
+            models.Index(
+                fields=["wishlist", "id"],
+                condition=models.Q(link__gt=""),
+                name="product_wishlist_link_idx",
+            ),
+            # serves the search, a trigram index on the name is added by
+            # migration 0008 where pg_trgm is available
+            GinIndex(fields=["search_vector"], name="product_search_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        """
+        Save the product, reading what it was counted as under a lock.
+
+        The wishlist and price its row holds are read with SELECT FOR
+        UPDATE in the transaction of the save, so the wishlist counts
+        the difference from what is stored even when a concurrent
+        request changed the product since it was loaded here.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get("using") or router.db_for_write(
+            Product, instance=self
+        )
+        with transaction.atomic(using=using, savepoint=False):
+            self.counted_as = self.stored_count(using)
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Delete the product, reading what it was counted as under a lock.
+
+        Like ``save``, so the wishlist counts out the price that is
+        stored rather than the one loaded here.
+        """
+        using = using or router.db_for_write(Product, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            self.counted_as = self.stored_count(using)
+            return super().delete(using=using, keep_parents=keep_parents)
+
+    def stored_count(self, using):
+        """Return the wishlist and price of the row, locking it."""
+        return (
+            Product._base_manager.using(using)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values_list("wishlist_id", "price")
+            .first()
+        ) or (None, None)
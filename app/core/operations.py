@@ -0,0 +1,80 @@
+"""
+Migration operations that also run on databases other than PostgreSQL.
+
+The project runs on PostgreSQL, but its migrations also apply to other
+databases, such as SQLite for local tests. PostgreSQL only features are
+left out there, while the migration state stays the same everywhere.
+"""
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations
+from django.db.migrations.operations.base import Operation
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """Add an index without locking writes, where the database can."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class PostgreSQLOnly(Operation):
+    """
+    Run ``operation`` on PostgreSQL only.
+
+    Its state changes apply on every database, so a GIN index, say,
+    stays part of the models even where it is not created.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    @property
+    def reversible(self):
+        return self.operation.reversible
+
+    @property
+    def reduces_to_sql(self):
+        return self.operation.reduces_to_sql
+
+    @property
+    def atomic(self):
+        return self.operation.atomic
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            self.operation.database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            self.operation.database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def describe(self):
+        return "%s, on PostgreSQL only" % self.operation.describe()
@@ -0,0 +1,96 @@
+"""
+Profiles of single requests, taken on demand for staff users.
+
+Nothing is recorded outside a request being profiled; the hooks then
+only read a context variable.
+"""
+import contextlib
+import contextvars
+import cProfile
+import pstats
+import threading
+import time
+
+from django.db import connections
+
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Function calls and SQL of one request."""
+
+    def __init__(self):
+        # a profile per thread the request ran on
+        self.profiles = []
+        self.sql = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def thread(self):
+        """Profile the calls and queries of the current thread in the block."""
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(record_query)
+                )
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+
+    def add_query(self, sql, seconds):
+        """List a query that took ``seconds``."""
+        with self._lock:
+            self.sql.append({"sql": sql, "ms": round(seconds * 1000, 3)})
+
+    def functions(self, limit):
+        """Return the ``limit`` functions with the most cumulative time."""
+        stats = pstats.Stats(*self.profiles)
+        rows = sorted(
+            stats.stats.items(),
+            key=lambda item: item[1][3],
+            reverse=True,
+        )
+        return [
+            {
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "own_ms": round(own_time * 1000, 3),
+                "cumulative_ms": round(cumulative_time * 1000, 3),
+            }
+            for function, (primitive_calls, calls, own_time,
+                           cumulative_time, callers) in rows[:limit]
+        ]
+
+
+def activate(request_profile):
+    """Record into ``request_profile`` until ``deactivate``."""
+    return _current.set(request_profile)
+
+
+def deactivate(token):
+    """Stop recording the profile started by ``activate``."""
+    _current.reset(token)
+
+
+def current():
+    """Return the profile being recorded, or None."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper listing the queries of a profile."""
+    request_profile = _current.get()
+    if request_profile is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_profile.add_query(sql, time.perf_counter() - start)
@@ -0,0 +1,57 @@
+"""
+Database router sending the reads of safe requests to a replica.
+
+``ReplicaMiddleware`` picks the replica for each request it allows to
+read from one. Everything else, including management commands and any
+read after the request has written, uses the primary.
+"""
+import contextvars
+
+from django.db import DEFAULT_DB_ALIAS
+
+
+_current = contextvars.ContextVar("replica_reads", default=None)
+
+
+class ReplicaReads:
+    """The replica a request reads from, until it writes."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.wrote = False
+
+
+def activate(reads):
+    """Route reads as ``reads`` says until ``deactivate``."""
+    return _current.set(reads)
+
+
+def deactivate(token):
+    """Stop routing the reads started by ``activate``."""
+    _current.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads to the replica of the request, writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        reads = _current.get()
+        if reads is None or reads.wrote:
+            return None
+        return reads.alias
+
+    def db_for_write(self, model, **hints):
+        reads = _current.get()
+        if reads is not None:
+            # the request reads its own writes from here on
+            reads.wrote = True
+        # explicit, or objects read from a replica would be saved there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema by replicating the primary
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,110 @@
+"""
+Signal handlers for core models.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.middleware import pin_to_primary
+from core.models import Product, Wishlist, product_signals_muted
+
+
+@receiver(post_delete, sender=Token)
+def drop_cached_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache."""
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.delete(key))
+
+
+@receiver(post_save, sender=Token)
+def pin_token_user(sender, instance, created, **kwargs):
+    """
+    Pin the user of a new token to the primary.
+
+    Logins are anonymous requests, so nothing else pins them, and the
+    first requests with the token could look it up on a replica that
+    has not seen it yet.
+    """
+    if created:
+        pin_to_primary(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def drop_cached_user_tokens(sender, instance, created, **kwargs):
+    """Reload the user of cached tokens after the user changes."""
+    if created:
+        return
+
+    # the shared cache has no per user index, so look the keys up
+    keys = []
+    if token_cache.ttl and token_cache.shared:
+        keys = list(
+            Token.objects.filter(user=instance).values_list("key", flat=True)
+        )
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.delete_user(user_id, keys))
+
+
+def counted_price(value):
+    """Return a product price as the Decimal it is stored as."""
+    return Product._meta.get_field("price").to_python(value)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    """
+    Count a saved product into its wishlist, with a new version.
+
+    Updates count the change from the price and wishlist that
+    ``Product.save`` read under a lock, or move the product between
+    wishlists. A product saved without knowing what it was counted as
+    has its wishlists recounted.
+    """
+    if product_signals_muted():
+        return
+
+    wishlist_id = instance.wishlist_id
+    price = counted_price(instance.price)
+    old_wishlist_id, old_price = (
+        (None, None) if created
+        else getattr(instance, "counted_as", (None, None))
+    )
+    instance.counted_as = (wishlist_id, price)
+
+    wishlists = Wishlist.objects.filter(pk=wishlist_id)
+    if created:
+        wishlists.add_products(1, price)
+    elif old_wishlist_id is None or old_price is None:
+        Wishlist.objects.filter(
+            pk__in={wishlist_id, old_wishlist_id} - {None}
+        ).recount_products()
+    elif old_wishlist_id != wishlist_id:
+        Wishlist.objects.filter(pk=old_wishlist_id).add_products(
+            -1, -old_price
+        )
+        wishlists.add_products(1, price)
+    else:
+        wishlists.add_products(0, price - old_price)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    """
+    Count a deleted product out of its wishlist, with a new version.
+
+    The price is the one ``Product.delete`` read under a lock. Products
+    deleted without it have their wishlist recounted, and the ones
+    deleted with their wishlist or user are not counted at all.
+    """
+    if product_signals_muted():
+        return
+
+    wishlist_id, price = getattr(instance, "counted_as", (None, None))
+    if wishlist_id is None or price is None:
+        Wishlist.objects.filter(pk=instance.wishlist_id).recount_products()
+    else:
+        Wishlist.objects.filter(pk=wishlist_id).add_products(-1, -price)
@@ -0,0 +1,35 @@
+"""
+Test runner for the project.
+"""
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner failing requests that go over their query budget.
+
+    Requests read from the primary, unless a test sets
+    ``DATABASE_REPLICAS`` and uses those databases.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.saved_settings = {
+            "QUERY_BUDGETS": settings.QUERY_BUDGETS,
+            "DATABASE_REPLICAS": settings.DATABASE_REPLICAS,
+        }
+        settings.QUERY_BUDGETS = "raise"
+        settings.DATABASE_REPLICAS = []
+
+    def setup_databases(self, **kwargs):
+        # the replicas under test are separate databases, migrated here
+        # as nothing replicates the primary's tables to them
+        with override_settings(DATABASE_ROUTERS=[]):
+            return super().setup_databases(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        for name, value in self.saved_settings.items():
+            setattr(settings, name, value)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,114 @@
+"""
+Tests for serving the APIs over ASGI.
+"""
+import asyncio
+import datetime
+import json
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import include, path, resolve
+
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler, async_urlpatterns, async_view, counters
+from core.models import Product, Wishlist
+
+
+urlpatterns = async_urlpatterns([
+    path('api/user/', include('user.urls')),
+    path('api/wishlist/', include('wishlist.urls')),
+])
+
+
+class AsyncViewTests(SimpleTestCase):
+    """Test wrapping sync views as async views."""
+
+    def test_async_view_runs_on_pool(self):
+        """Test the sync view runs on a thread of the view pool."""
+        def view(request):
+            return threading.current_thread().name
+
+        view.csrf_exempt = True
+        wrapped = async_view(view)
+
+        self.assertTrue(asyncio.iscoroutinefunction(wrapped))
+        self.assertTrue(wrapped.csrf_exempt)
+        self.assertTrue(async_to_sync(wrapped)(None).startswith('async-view'))
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_async_urlpatterns(self):
+        """Test included views are wrapped and keep their names."""
+        match = resolve('/api/wishlist/wishlists/')
+
+        self.assertEqual(match.view_name, 'wishlist:wishlist-list')
+        self.assertTrue(asyncio.iscoroutinefunction(match.func))
+        self.assertEqual(match.func.cls.__name__, 'WishlistViewSet')
+
+
+# connections of the view threads closed after each request, so the
+# test database can be dropped
+@patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+@override_settings(ROOT_URLCONF=__name__)
+class ASGIHandlerTests(TransactionTestCase):
+    """Test requests through the ASGI handler."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        wishlist = Wishlist.objects.create(
+            user=self.user,
+            title='Birthday',
+            occasion_date=datetime.date(2030, 1, 1),
+        )
+        Product.objects.create(wishlist=wishlist, name='Hat', price=5)
+
+    def get(self, path):
+        """Return the status and body of a GET request."""
+        async def request():
+            communicator = ApplicationCommunicator(ASGIHandler(), {
+                'type': 'http',
+                'method': 'GET',
+                'path': path,
+                'query_string': b'',
+                'headers': [
+                    (b'host', b'testserver'),
+                    (b'authorization', f'Token {self.token.key}'.encode()),
+                ],
+            })
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = b''
+            while True:
+                message = await communicator.receive_output(5)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body
+
+        return async_to_sync(request)()
+
+    def test_list_wishlists(self):
+        """Test the wishlist list is served by an async view."""
+        finished = counters.snapshot()['finished']
+
+        status, body = self.get('/api/wishlist/wishlists/')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)[0]['title'], 'Birthday')
+        self.assertEqual(counters.snapshot()['finished'], finished + 1)
+
+    def test_streamed_export(self):
+        """Test the export streams its rows through the handler."""
+        status, body = self.get('/api/wishlist/export/')
+
+        self.assertEqual(status, 200)
+        wishlists = json.loads(body)
+        self.assertEqual(wishlists[0]['products'][0]['name'], 'Hat')
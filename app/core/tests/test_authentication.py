@@ -0,0 +1,230 @@
+"""
+Tests for the cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache
+
+
+ME_URL = reverse('user:me')
+METRICS_URL = reverse('api-metrics')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+@patch.object(token_cache, 'ttl', 60)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        token_cache.counters.reset()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test the token is only looked up on the first request."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(
+            token_cache.counters.snapshot(),
+            {'hits': 1, 'shared_hits': 0, 'misses': 1},
+        )
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are rejected and not cached."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(token_cache.metrics()['size'], 0)
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token stops working straight away."""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test a deactivated user can no longer authenticate."""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test the cached user is dropped when the password changes."""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ME_URL, {'password': 'newpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.metrics()['size'], 0)
+
+    def test_cached_user_not_shared_between_requests(self):
+        """Test changes to a request's user do not reach the cache."""
+        self.client.get(ME_URL)
+
+        user = token_cache.get(self.token.key).user
+        user.first_name = 'Changed'
+
+        self.assertEqual(token_cache.get(self.token.key).user.first_name, '')
+
+    def test_cached_inactive_user_rejected(self):
+        """Test a cached token of an inactive user is not accepted."""
+        self.user.is_active = False
+        token_cache.set(self.token.key, self.token)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_writes_current_user(self):
+        """Test updates do not write back the cached copy of the user."""
+        self.client.get(ME_URL)
+        # changed by another process, whose invalidation did not arrive
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password='changed', first_name='Other'
+        )
+
+        res = self.client.patch(ME_URL, {'last_name': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, 'changed')
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=60, TOKEN_AUTH_CACHE='default')
+    def test_process_local_cache_refused(self):
+        """Test the token cache is not turned on with a locmem cache."""
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('core').ready()
+
+    def test_invalidated_in_other_processes(self):
+        """Test invalidating a token reaches other processes' entries."""
+        other = TokenCache(max_size=10, ttl=60, shared=True)
+        other.set(self.token.key, self.token)
+        other.get(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertIsNone(other.get(self.token.key))
+        self.assertEqual(other.counters.snapshot()['hits'], 1)
+
+
+class TokenCacheTests(TestCase):
+    """Test the token cache itself."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = create_user()
+
+    def test_size_bounded(self):
+        """Test the least recently used token is evicted first."""
+        cache = TokenCache(max_size=2, ttl=60)
+        tokens = [Token(key=f'key{i}', user=self.user) for i in range(3)]
+        cache.set('key0', tokens[0])
+        cache.set('key1', tokens[1])
+        cache.get('key0')
+        cache.set('key2', tokens[2])
+
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key2'))
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped once their TTL has passed."""
+        patched_monotonic.return_value = 100
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.set('key', Token(key='key', user=self.user))
+
+        patched_monotonic.return_value = 159
+        self.assertIsNotNone(cache.get('key'))
+        patched_monotonic.return_value = 161
+        self.assertIsNone(cache.get('key'))
+
+    def test_shared_cache_used(self):
+        """Test tokens are found in the shared cache by other processes."""
+        writer = TokenCache(max_size=10, ttl=60, shared=True)
+        reader = TokenCache(max_size=10, ttl=60, shared=True)
+        writer.set('key', Token(key='key', user=self.user))
+
+        token = reader.get('key')
+
+        self.assertEqual(token.user.email, self.user.email)
+        self.assertEqual(reader.counters.snapshot()['shared_hits'], 1)
+        writer.delete_user(self.user.id)
+        self.assertIsNone(reader.get('key'))
+        self.assertIsNone(TokenCache(10, 60, shared=True).get('key'))
+
+    def test_shared_entry_stale_after_invalidation(self):
+        """Test a token loaded before an invalidation is not reused."""
+        writer = TokenCache(max_size=10, ttl=60, shared=True)
+        reader = TokenCache(max_size=10, ttl=60, shared=True)
+        # read before the database, invalidated before the set
+        generation = writer.generation('key')
+        reader.delete('key')
+        writer.set('key', Token(key='key', user=self.user), generation)
+
+        self.assertIsNone(reader.get('key'))
+        self.assertIsNone(writer.get('key'))
+
+
+class MetricsApiTests(TestCase):
+    """Test the metrics API."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_metrics_staff_only(self):
+        """Test only staff users can read metrics."""
+        self.client.force_authenticate(create_user())
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_include_token_cache(self):
+        """Test the token cache counters are exposed."""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123'
+        )
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', res.data['token_auth_cache'])
@@ -0,0 +1,135 @@
+"""
+Tests for view query budgets.
+"""
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from core.budgets import QueryBudgetExceeded, QueryBudgetMixin
+from core.models import Product, Wishlist
+
+
+class UsersView(QueryBudgetMixin, APIView):
+    """List users, running one query per user."""
+    authentication_classes = []
+    permission_classes = []
+    query_budget = {'get': 1}
+
+    def get(self, request):
+        emails = []
+        for user in get_user_model().objects.all():
+            emails.append(get_user_model().objects.get(pk=user.pk).email)
+        return Response(emails)
+
+
+class QueryBudgetTests(TestCase):
+    """Test views are held to their query budget."""
+
+    def setUp(self):
+        for i in range(2):
+            get_user_model().objects.create_user(
+                email=f'user{i}@example.com', password='testpass123'
+            )
+        self.request = APIRequestFactory().get('/users/')
+
+    def test_within_budget(self):
+        """Test a view within its budget responds."""
+        view = UsersView.as_view(query_budget={'get': 3})
+
+        res = view(self.request)
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_over_budget_raises(self):
+        """Test going over the budget fails the request under tests."""
+        with self.assertRaisesMessage(
+            QueryBudgetExceeded, 'UsersView.get ran 3 queries'
+        ):
+            UsersView.as_view()(self.request)
+
+    @override_settings(QUERY_BUDGETS='warn')
+    def test_over_budget_logged(self):
+        """Test going over the budget logs the SQL in production."""
+        with self.assertLogs('core.budgets', 'WARNING') as logs:
+            res = UsersView.as_view()(self.request)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('over its budget of 1', logs.output[0])
+        self.assertIn('FROM "core_user"', logs.output[0])
+
+    def test_budget_by_result_size(self):
+        """Test a budget can grow with the number of results."""
+        view = UsersView.as_view(query_budget={'get': lambda size: 1 + size})
+
+        res = view(self.request)
+
+        self.assertEqual(len(res.data), 2)
+
+    @override_settings(QUERY_BUDGETS='off')
+    def test_budgets_off(self):
+        """Test queries are not checked when budgets are off."""
+        res = UsersView.as_view()(self.request)
+
+        self.assertEqual(res.status_code, 200)
+
+
+class ApiQueryBudgetTests(TestCase):
+    """
+    Test the fixed budgets of the list actions hold for many results.
+
+    The test runner raises when a view goes over its budget, so a query
+    run per item fails these requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'
+        )
+        self.wishlists = [
+            Wishlist.objects.create(
+                user=user,
+                title=f'Wishlist {i}',
+                occasion_date=datetime.date(2030, 1, 1),
+            )
+            for i in range(30)
+        ]
+        Product.objects.bulk_create(
+            Product(wishlist=wishlist, name=f'Product {i}', price=i % 3)
+            for wishlist in self.wishlists
+            for i in range(5)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_wishlist_list(self):
+        """Test listing many wishlists and their products."""
+        url = reverse('wishlist:wishlist-list')
+
+        res = self.client.get(url)
+        page = self.client.get(url, {'page_size': 20})
+
+        self.assertEqual(len(res.data), 30)
+        self.assertEqual(len(page.data['results']), 20)
+
+    def test_product_list(self):
+        """Test listing many products of a wishlist."""
+        wishlist = self.wishlists[0]
+        Product.objects.bulk_create(
+            Product(wishlist=wishlist, name=f'Hat {i}', price=i % 3)
+            for i in range(95)
+        )
+        url = reverse('wishlist:products', args=[wishlist.id])
+
+        res = self.client.get(url)
+        page = self.client.get(url, {'page_size': 50, 'ordering': 'price'})
+
+        self.assertEqual(len(res.data), 100)
+        self.assertEqual(len(page.data['results']), 50)
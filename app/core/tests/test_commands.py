@@ -1,13 +1,30 @@
 """
 Test custom Django management commands.
 """
+import datetime
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from core.models import Product, Wishlist
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -18,7 +35,7 @@ class CommandTests(SimpleTestCase):
         """Test waiting for database if database ready."""
         patched_check.return_value = True
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', databases=['default'])
 
         patched_check.assert_called_once_with(databases=['default'])
 
@@ -28,7 +45,334 @@ class CommandTests(SimpleTestCase):
         patched_check.side_effect = [Psycopg2OpError] * 2 + \
             [OperationalError] * 3 + [True]
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', databases=['default'])
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the waits between probes double, with jitter."""
+        patched_check.side_effect = [OperationalError] * 4 + [True]
+
+        call_command(
+            'wait_for_db',
+            databases=['default'],
+            initial_delay=0.1,
+            stdout=StringIO(),
+        )
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(len(delays), 4)
+        for delay, expected in zip(delays, [0.1, 0.2, 0.4, 0.8]):
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
+
+    @patch('time.sleep')
+    @patch('time.monotonic', side_effect=itertools.count(0, 600))
+    def test_wait_for_db_waits_forever(
+        self, patched_monotonic, patched_sleep, patched_check
+    ):
+        """Test there is no timeout unless one is given."""
+        patched_check.side_effect = [OperationalError] * 3 + [True]
+
+        call_command('wait_for_db', databases=['default'], stdout=StringIO())
+
+        self.assertEqual(patched_check.call_count, 4)
+
+    def test_wait_for_db_timeout(self, patched_check):
+        """Test an error is raised when the database stays down."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'wait_for_db',
+                timeout=0.2,
+                initial_delay=0.05,
+                stdout=StringIO(),
+            )
+
+    @patch('core.management.commands.wait_for_db.connections')
+    def test_wait_for_db_all_databases(
+        self, patched_connections, patched_check
+    ):
+        """Test every configured database is checked."""
+        patched_connections.__iter__.return_value = iter(
+            ['default', 'replica']
+        )
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        patched_check.assert_any_call(databases=['default'])
+        patched_check.assert_any_call(databases=['replica'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_json(self, patched_sleep, patched_check):
+        """Test the time to ready is reported as JSON."""
+        patched_check.side_effect = [OperationalError, True]
+        out = StringIO()
+
+        call_command(
+            'wait_for_db', databases=['default'], json=True, stdout=out
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertTrue(report['ready'])
+        self.assertEqual(report['databases']['default']['attempts'], 2)
+        self.assertIsInstance(report['databases']['default']['seconds'], float)
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """Test the explain_queries command."""
+
+    def create_wishlist(self):
+        """Create a wishlist with a product to explain the queries of."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        wishlist = Wishlist.objects.create(
+            user=user,
+            title='Sample wishlist',
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        Product.objects.create(wishlist=wishlist, name='Top', price=1)
+
+    def test_explain_queries(self):
+        """Test a query plan is printed for each endpoint."""
+        self.create_wishlist()
+        out = StringIO()
+
+        call_command('explain_queries', stdout=out)
+
+        output = out.getvalue()
+        for endpoint in ['wishlist list', 'wishlist detail',
+                         'product list', 'product detail',
+                         'product list ordering=price&page_size=20']:
+            self.assertIn(f'{endpoint}:', output)
+        # the queries are the ones the views run, filtered and paginated
+        self.assertIn(
+            '"core_product"."price" ASC, "core_product"."id" ASC LIMIT 21',
+            output,
+        )
+        # SQLite searches and scans, PostgreSQL only scans
+        self.assertRegex(output, '(?i)scan|search')
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', 'EXPLAIN ANALYZE needs PostgreSQL'
+    )
+    def test_explain_queries_analyze(self):
+        """Test the queries can be run to time them."""
+        self.create_wishlist()
+        out = StringIO()
+
+        call_command('explain_queries', analyze=True, stdout=out)
+
+        self.assertIn('actual time', out.getvalue())
+
+    def test_explain_queries_without_wishlists(self):
+        """Test an error is raised when there is nothing to explain."""
+        get_user_model().objects.create_user('user@example.com', 'test123')
+
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class BenchProductListCommandTests(TestCase):
+    """Test the bench_product_list command."""
+
+    def test_bench_product_list(self):
+        """Test both paths are timed and the sample data is rolled back."""
+        out = StringIO()
+
+        call_command(
+            'bench_product_list', sizes=[5], repeat=1, stdout=out
+        )
+
+        self.assertIn('5 products: serializer', out.getvalue())
+        self.assertFalse(Product.objects.exists())
+
+
+class ImportProductsCommandTests(TestCase):
+    """Test the import_products command."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.wishlist = Wishlist.objects.create(
+            user=user,
+            title='Sample wishlist',
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+
+    def write_file(self, suffix, content):
+        """Write a temporary file and return its path."""
+        descriptor, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_products(self):
+        """Test rows are imported and failed rows are reported."""
+        path = self.write_file(
+            '.csv', 'name,price\nHat,5.00\nScarf,x\nTop,7.5\n'
+        )
+        out = StringIO()
+        err = StringIO()
+
+        call_command(
+            'import_products', self.wishlist.id, path, stdout=out, stderr=err
+        )
+
+        self.assertIn('Imported 2 products, 1 rows failed', out.getvalue())
+        self.assertIn('line 3: {"price"', err.getvalue())
+        self.assertEqual(
+            sorted(self.wishlist.products.values_list('name', flat=True)),
+            ['Hat', 'Top'],
+        )
+
+    def test_import_products_unknown_format(self):
+        """Test an error is raised when the format is unknown."""
+        path = self.write_file('.txt', '{"name": "Hat", "price": 5}\n')
+
+        with self.assertRaises(CommandError):
+            call_command('import_products', self.wishlist.id, path)
+
+        call_command(
+            'import_products',
+            self.wishlist.id,
+            path,
+            format='ndjson',
+            stdout=StringIO(),
+        )
+        self.assertEqual(self.wishlist.products.count(), 1)
+
+
+class RepairWishlistTotalsCommandTests(TestCase):
+    """Test the repair_wishlist_totals command."""
+
+    def test_repair_wishlist_totals(self):
+        """Test wishlists with wrong counts are recounted in batches."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        wishlists = [
+            Wishlist.objects.create(
+                user=user,
+                title='Sample wishlist',
+                occasion_date=datetime.date(year=2020, month=1, day=1),
+            )
+            for i in range(3)
+        ]
+        for wishlist in wishlists:
+            Product.objects.create(wishlist=wishlist, name='Hat', price=5)
+        Wishlist.objects.filter(id=wishlists[1].id).update(product_count=7)
+        Wishlist.objects.filter(id=wishlists[2].id).update(total_price=0)
+        out = StringIO()
+
+        call_command('repair_wishlist_totals', batch_size=2, stdout=out)
+
+        self.assertEqual(
+            out.getvalue(), 'Checked 3 wishlists, repaired 2.\n'
+        )
+        self.assertEqual(
+            list(
+                Wishlist.objects.order_by('id')
+                .values_list('product_count', 'total_price')
+            ),
+            [(1, 5), (1, 5), (1, 5)],
+        )
+
+
+class BenchSearchCommandTests(TestCase):
+    """Test the bench_search command."""
+
+    def test_bench_search(self):
+        """Test the searches are timed and the data is rolled back."""
+        out = StringIO()
+
+        call_command(
+            'bench_search', products=200, users=2, repeat=1, stdout=out
+        )
+
+        self.assertIn('Created 200 products for 2 users', out.getvalue())
+        self.assertIn('one word (kettle):', out.getvalue())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchServersCommandTests(SimpleTestCase):
+    """Test the bench_servers command."""
+
+    @patch('importlib.util.find_spec', return_value=None)
+    def test_bench_servers_needs_servers(self, patched_find_spec):
+        """Test an error is raised when a server is not installed."""
+        with self.assertRaises(CommandError):
+            call_command('bench_servers', stdout=StringIO())
+
+
+@patch('importlib.util.find_spec')
+class BenchServersDataTests(TestCase):
+    """Test the data of the bench_servers command."""
+
+    def test_bench_servers_data(self, patched_find_spec):
+        """Test the products are counted and the user is deleted after."""
+        def bench(name, request, options):
+            totals = Wishlist.objects.values_list(
+                'product_count', 'total_price'
+            )
+            self.assertEqual(set(totals), {(10, 45)})
+
+        with patch(
+            'core.management.commands.bench_servers.Command.bench',
+            side_effect=bench,
+        ) as patched_bench:
+            call_command('bench_servers', stdout=StringIO())
+
+        self.assertTrue(patched_bench.called)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Product.objects.exists())
+
+
+class BenchHashersCommandTests(SimpleTestCase):
+    """Test the bench_hashers command."""
+
+    def test_bench_hashers(self):
+        """Test the given work factors are timed."""
+        out = StringIO()
+
+        call_command(
+            'bench_hashers',
+            argon2=[(1, 1024, 1)],
+            pbkdf2=[1000],
+            repeat=1,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('argon2 time=1 memory=1024 parallelism=1:', output)
+        self.assertIn('pbkdf2_sha256 iterations=1000:', output)
+
+
+# connections of the server threads closed after each request, so the
+# test database can be dropped
+@patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+@override_settings(ALLOWED_HOSTS=['127.0.0.1'])
+class BenchAPICommandTests(TransactionTestCase):
+    """Test the bench_api command."""
+
+    def test_bench_api(self):
+        """Test every endpoint is timed and the users are deleted."""
+        out = StringIO()
+
+        call_command('bench_api', workers=2, iterations=2, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['requests'], 28)
+        self.assertEqual(report['errors'], 0)
+        for name, endpoint in report['endpoints'].items():
+            self.assertEqual(endpoint['requests'], 4, name)
+            self.assertGreater(endpoint['queries_per_request'], 0, name)
+            self.assertIsNotNone(endpoint['p99_ms'], name)
+        self.assertFalse(get_user_model().objects.exists())
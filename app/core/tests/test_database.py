@@ -0,0 +1,133 @@
+"""
+Tests for the PostgreSQL backend with health checks and pooling.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+
+from core.backends.postgresql import base
+from core.backends.postgresql.base import DatabaseWrapper
+
+
+# contrib.postgres looks connections up by alias; the default connection
+# of the tests has no pool of its own
+ALIAS = 'default'
+
+
+class DatabaseBackendTests(TransactionTestCase):
+    """Test persistent and pooled connections to the test database."""
+
+    def setUp(self):
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        for key in [key for key in base.pools if key[0] == ALIAS]:
+            base.pools.pop(key).close()
+
+    def make_wrapper(self, pool=None, **settings):
+        """Return a new connection to the test database."""
+        settings_dict = {
+            **connection.settings_dict,
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {} if pool is None else {'pool': pool},
+            **settings,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias=ALIAS)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        """Return the id of the server process of a connection."""
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def terminate(self, pid):
+        """End a connection from the server side."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+    def pool_metrics(self):
+        """Return the metrics of the test pool."""
+        return base.pool_metrics()[ALIAS]
+
+    def test_persistent_connection_health_checked(self):
+        """Test a broken persistent connection is replaced."""
+        wrapper = self.make_wrapper(CONN_MAX_AGE=60)
+        pid = self.backend_pid(wrapper)
+        self.terminate(pid)
+
+        # the next request starts
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+
+    def test_pooled_connection_reused(self):
+        """Test a released connection is reused by the next request."""
+        wrapper = self.make_wrapper(pool={'max_size': 2})
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+
+        self.assertEqual(self.backend_pid(wrapper), pid)
+        metrics = self.pool_metrics()
+        self.assertEqual(metrics['acquired'], 2)
+        self.assertEqual(metrics['connected'], 1)
+        self.assertEqual(metrics['in_use'], 1)
+
+    def test_pooled_session_reset(self):
+        """Test session settings do not leak to the next request."""
+        wrapper = self.make_wrapper(pool={'max_size': 1})
+        with wrapper.cursor() as cursor:
+            cursor.execute("SET statement_timeout = '5s'")
+        wrapper.close()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '0')
+
+    def test_pool_overflow_closed(self):
+        """Test connections over the pool size are closed on release."""
+        pool = {'max_size': 1, 'max_overflow': 1}
+        first = self.make_wrapper(pool=pool)
+        second = self.make_wrapper(pool=pool)
+        first.ensure_connection()
+        second.ensure_connection()
+        self.assertEqual(self.pool_metrics()['peak_in_use'], 2)
+
+        first.close()
+        second.close()
+
+        metrics = self.pool_metrics()
+        self.assertEqual(metrics['open'], 1)
+        self.assertEqual(metrics['idle'], 1)
+        self.assertEqual(metrics['discarded'], 1)
+
+    def test_pool_timeout(self):
+        """Test an error is raised when no connection becomes free."""
+        pool = {'max_size': 1, 'max_overflow': 0, 'timeout': 0.1}
+        self.make_wrapper(pool=pool).ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            self.make_wrapper(pool=pool).ensure_connection()
+
+        metrics = self.pool_metrics()
+        self.assertEqual(metrics['waits'], 1)
+        self.assertEqual(metrics['timeouts'], 1)
+
+    def test_pooled_connection_health_checked(self):
+        """Test a broken idle connection is replaced on checkout."""
+        wrapper = self.make_wrapper(pool={'max_size': 1})
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+        self.terminate(pid)
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(self.pool_metrics()['connected'], 2)
+
+    def test_pool_needs_conn_max_age_zero(self):
+        """Test pooling is refused with persistent connections."""
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_wrapper(pool={}, CONN_MAX_AGE=60)
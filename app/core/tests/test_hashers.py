@@ -0,0 +1,48 @@
+"""
+Tests for the password hashers.
+"""
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from django.test import SimpleTestCase, override_settings
+
+from core.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class HasherTests(SimpleTestCase):
+    """Test the hashers tuned by the settings."""
+
+    def test_argon2_preferred(self):
+        """Test new passwords are hashed with Argon2id."""
+        encoded = make_password('testpass123')
+
+        self.assertIsInstance(identify_hasher(encoded), Argon2PasswordHasher)
+        self.assertTrue(encoded.startswith('argon2$argon2id$'))
+        self.assertTrue(check_password('testpass123', encoded))
+
+    @override_settings(
+        ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=2
+    )
+    def test_argon2_work_factors_from_settings(self):
+        """Test the Argon2 parameters come from the settings."""
+        encoded = make_password('testpass123')
+
+        self.assertIn('m=1024,t=1,p=2', encoded)
+        self.assertFalse(get_hasher().must_update(encoded))
+        with override_settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(get_hasher().must_update(encoded))
+
+    def test_pbkdf2_iterations_from_settings(self):
+        """Test the PBKDF2 iterations come from the settings."""
+        with override_settings(PBKDF2_ITERATIONS=1000):
+            encoded = make_password('testpass123', hasher='pbkdf2_sha256')
+            hasher = identify_hasher(encoded)
+
+            self.assertIsInstance(hasher, PBKDF2PasswordHasher)
+            self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+            self.assertFalse(hasher.must_update(encoded))
+
+        self.assertTrue(hasher.must_update(encoded))
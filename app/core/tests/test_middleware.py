@@ -0,0 +1,261 @@
+"""
+Tests for the API middleware.
+"""
+import datetime
+import os
+import re
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import timing
+from core.middleware import (
+    RequestProfileMiddleware,
+    ServerTimingMiddleware,
+    profile_cache_key,
+)
+from core.models import Product, Wishlist
+
+
+WISHLISTS_URL = reverse('wishlist:wishlist-list')
+
+
+def profile_url(request_id):
+    """Create and return a request profile URL."""
+    return reverse('api-profile', args=[request_id])
+
+
+def server_timing(response):
+    """Return the durations and descriptions of a Server-Timing header."""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc'))
+    return metrics
+
+
+@override_settings(REQUEST_TIMING=True)
+class ServerTimingMiddlewareTests(TestCase):
+    """Test the Server-Timing middleware."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123', is_staff=True
+        )
+        wishlist = Wishlist.objects.create(
+            user=user,
+            title='Birthday',
+            occasion_date=datetime.date(2030, 1, 1),
+        )
+        Product.objects.create(wishlist=wishlist, name='Hat', price=5)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_server_timing_header(self):
+        """Test the request is broken down in the header."""
+        res = self.client.get(WISHLISTS_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(
+            list(metrics),
+            ['total', 'db', 'serializer', 'view', 'render'],
+        )
+        queries = int(re.match(r'"(\d+) queries"', metrics['db'][1])[1])
+        self.assertGreater(queries, 0)
+        self.assertGreater(metrics['serializer'][0], 0)
+        self.assertLessEqual(metrics['view'][0], metrics['total'][0])
+
+    def test_server_timing_logged(self):
+        """Test the timings are logged with structured fields."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(WISHLISTS_URL)
+
+        record = logs.records[0]
+        self.assertEqual(record.path, WISHLISTS_URL)
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.queries, 0)
+        self.assertIn('total_ms=', record.getMessage())
+
+    def test_queries_timed_during_request(self):
+        """Test the middleware times queries with any database backend."""
+        self.assertNotIn(
+            timing.record_query, connections['default'].execute_wrappers
+        )
+
+        res = self.client.get(WISHLISTS_URL)
+
+        self.assertGreater(server_timing(res)['db'][0], 0)
+        self.assertNotIn(
+            timing.record_query, connections['default'].execute_wrappers
+        )
+
+    def test_server_timing_staff_only(self):
+        """Test other users are logged but get no header."""
+        user = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user)
+
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            res = self.client.get(WISHLISTS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertGreater(logs.records[0].queries, 0)
+
+        self.client.force_authenticate(None)
+        res = self.client.get(WISHLISTS_URL)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_request_not_sampled(self):
+        """Test requests left out of the sample are not timed."""
+        res = self.client.get(WISHLISTS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_middleware_disabled(self):
+        """Test the middleware is removed when timing is off."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: None)
+
+    def test_nested_calls_timed_once(self):
+        """Test time in nested timed calls is only counted once."""
+        @timing.timed('work')
+        def work(depth):
+            if depth:
+                work(depth - 1)
+
+        timings = timing.Timings()
+        token = timing.activate(timings)
+        try:
+            work(3)
+        finally:
+            timing.deactivate(token)
+
+        self.assertEqual(list(timings.durations), ['work'])
+        self.assertEqual(timings.running, set())
+
+
+# profiles need a cache shared by the processes
+PROFILE_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'profiles': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'test-profiles'),
+    },
+}
+
+
+@override_settings(
+    REQUEST_PROFILING=True,
+    REQUEST_PROFILE_CACHE='profiles',
+    CACHES=PROFILE_CACHES,
+)
+class RequestProfileMiddlewareTests(TestCase):
+    """Test profiling requests on demand."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123'
+        )
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'
+        )
+        Wishlist.objects.create(
+            user=self.staff,
+            title='Birthday',
+            occasion_date=datetime.date(2030, 1, 1),
+        )
+        self.client = APIClient()
+
+    def tearDown(self):
+        cache.clear()
+        caches['profiles'].clear()
+
+    def authenticate(self, user):
+        """Send the token of ``user`` with the requests."""
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_staff_request_profiled(self):
+        """Test a staff user gets a profile of the request."""
+        self.authenticate(self.staff)
+
+        res = self.client.get(WISHLISTS_URL, {'profile': '1'})
+
+        self.assertEqual(res.status_code, 200)
+        profile = self.client.get(profile_url(res['X-Request-ID'])).data
+        self.assertEqual(profile['path'], f'{WISHLISTS_URL}?profile=1')
+        self.assertEqual(profile['user'], self.staff.email)
+        self.assertTrue(any(
+            'list' in function['function']
+            for function in profile['functions']
+        ))
+        self.assertTrue(any(
+            'core_wishlist' in query['sql'] for query in profile['sql']
+        ))
+
+    def test_request_id_generated(self):
+        """Test a request id sent by the client is not used."""
+        self.authenticate(self.staff)
+
+        res = self.client.get(
+            WISHLISTS_URL, HTTP_X_PROFILE='1', HTTP_X_REQUEST_ID='abc-123'
+        )
+
+        self.assertNotEqual(res['X-Request-ID'], 'abc-123')
+        self.assertIsNone(caches['profiles'].get(profile_cache_key('abc-123')))
+        self.assertIsNotNone(
+            caches['profiles'].get(profile_cache_key(res['X-Request-ID']))
+        )
+
+    def test_non_staff_not_profiled(self):
+        """Test other users asking for a profile do not get one."""
+        self.authenticate(self.user)
+
+        res = self.client.get(
+            WISHLISTS_URL, {'profile': '1'}, HTTP_X_REQUEST_ID='abc-123'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Request-ID', res)
+
+    def test_profiles_staff_only(self):
+        """Test only staff users can read profiles."""
+        self.authenticate(self.user)
+
+        res = self.client.get(profile_url('abc-123'))
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_profile_not_found(self):
+        """Test reading a profile that does not exist."""
+        self.authenticate(self.staff)
+
+        res = self.client.get(profile_url('abc-123'))
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(REQUEST_PROFILE_CACHE='default')
+    def test_process_local_cache_refused(self):
+        """Test profiling does not start with a locmem cache."""
+        with self.assertRaises(ImproperlyConfigured):
+            RequestProfileMiddleware(lambda request: None)
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_middleware_disabled(self):
+        """Test the middleware is removed when profiling is off."""
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfileMiddleware(lambda request: None)
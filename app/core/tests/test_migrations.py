@@ -0,0 +1,80 @@
+"""
+Tests for data migrations.
+"""
+import datetime
+import unittest
+from importlib import import_module
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTests(TransactionTestCase):
+    """Test migrations that fill in existing rows."""
+
+    def migrate(self, *targets):
+        """Migrate to ``targets`` and return the models of that state."""
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets))
+        return executor.loader.project_state(list(targets)).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_wishlist_versions_unique(self):
+        """Test existing wishlists each get a version of their own."""
+        apps = self.migrate(('core', '0005_wishlist_product_indexes'))
+        User = apps.get_model('core', 'User')
+        Wishlist = apps.get_model('core', 'Wishlist')
+        user = User.objects.create(email='user@example.com')
+        for i in range(3):
+            Wishlist.objects.create(
+                user=user,
+                title='Sample wishlist',
+                occasion_date=datetime.date(year=2020, month=1, day=1),
+            )
+
+        apps = self.migrate(('core', '0006_wishlist_version'))
+
+        versions = apps.get_model('core', 'Wishlist').objects.values_list(
+            'version', flat=True
+        )
+        self.assertEqual(len(set(versions)), 3)
+        self.assertNotIn(None, versions)
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', 'search vectors need PostgreSQL'
+    )
+    def test_search_vectors_backfilled(self):
+        """Test existing rows get search vectors, a batch at a time."""
+        apps = self.migrate(('core', '0007_product_filter_indexes'))
+        User = apps.get_model('core', 'User')
+        Wishlist = apps.get_model('core', 'Wishlist')
+        Product = apps.get_model('core', 'Product')
+        user = User.objects.create(email='user@example.com')
+        wishlist = Wishlist.objects.create(
+            user=user,
+            title='Birthday',
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        for name in ['Running shoes', 'Rain jacket', 'Coffee grinder']:
+            Product.objects.create(wishlist=wishlist, name=name, price=1)
+
+        search_migration = import_module('core.migrations.0008_search')
+        with patch.object(search_migration, 'BACKFILL_BATCH_SIZE', 2):
+            apps = self.migrate(('core', '0008_search'))
+
+        Product = apps.get_model('core', 'Product')
+        self.assertFalse(Product.objects.filter(search_vector=None).exists())
+        self.assertEqual(
+            Product.objects.filter(search_vector='shoe').count(), 1
+        )
+        self.assertTrue(
+            apps.get_model('core', 'Wishlist').objects.filter(
+                search_vector='birthday'
+            ).exists()
+        )
@@ -88,3 +88,187 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(product), product.name)
+
+    def test_wishlist_version_changes(self):
+        """Test the wishlist version changes with it and its products."""
+        user = create_user()
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        versions = [wishlist.version]
+
+        wishlist.title = "New title"
+        wishlist.save(update_fields=["title"])
+        versions.append(wishlist.version)
+        product = models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=Decimal("5.50")
+        )
+        wishlist.refresh_from_db()
+        versions.append(wishlist.version)
+        product.delete()
+        wishlist.refresh_from_db()
+        versions.append(wishlist.version)
+
+        self.assertEqual(len(set(versions)), 4)
+
+    def test_wishlist_counts_products(self):
+        """Test product writes keep the wishlist's count and total."""
+        user = create_user()
+        wishlist, other = [
+            models.Wishlist.objects.create(
+                user=user,
+                title="Sample wishlist",
+                occasion_date=datetime.date(year=2020, month=1, day=1),
+            )
+            for i in range(2)
+        ]
+
+        def totals(wishlist):
+            wishlist.refresh_from_db()
+            return wishlist.product_count, wishlist.total_price
+
+        product = models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=Decimal("5.50")
+        )
+        models.Product.objects.create(wishlist=wishlist, name="P2", price=2)
+        self.assertEqual(totals(wishlist), (2, Decimal("7.50")))
+
+        product = models.Product.objects.get(id=product.id)
+        product.price = Decimal("8.25")
+        product.save()
+        self.assertEqual(totals(wishlist), (2, Decimal("10.25")))
+
+        product.wishlist = other
+        product.save()
+        self.assertEqual(totals(wishlist), (1, Decimal("2.00")))
+        self.assertEqual(totals(other), (1, Decimal("8.25")))
+
+        product.delete()
+        self.assertEqual(totals(other), (0, Decimal("0.00")))
+
+    def test_product_saves_count_stored_price(self):
+        """Test saves count from the stored price, not the loaded one."""
+        user = create_user()
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        product = models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=5
+        )
+        # two requests load the product before either saves it
+        first, second = [
+            models.Product.objects.get(id=product.id) for i in range(2)
+        ]
+
+        first.price = 6
+        first.save()
+        second.price = 7
+        second.save()
+
+        wishlist.refresh_from_db()
+        self.assertEqual(wishlist.product_count, 1)
+        self.assertEqual(wishlist.total_price, Decimal("7.00"))
+
+    def test_product_deletes_count_stored_price(self):
+        """Test deletes count out the stored price, not the loaded one."""
+        user = create_user()
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        product = models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=5
+        )
+        models.Product.objects.create(wishlist=wishlist, name="P2", price=2)
+        loaded = models.Product.objects.get(id=product.id)
+        models.Product.objects.filter(id=product.id).update(price=9)
+        models.Wishlist.objects.filter(id=wishlist.id).recount_products()
+
+        loaded.delete()
+
+        wishlist.refresh_from_db()
+        self.assertEqual(wishlist.product_count, 1)
+        self.assertEqual(wishlist.total_price, Decimal("2.00"))
+
+    def test_cascaded_products_not_counted_out(self):
+        """Test deleting a user does not count out each product."""
+        user = create_user()
+        wishlists = [
+            models.Wishlist.objects.create(
+                user=user,
+                title="Sample wishlist",
+                occasion_date=datetime.date(year=2020, month=1, day=1),
+            )
+            for i in range(2)
+        ]
+        # bulk inserts leave the counts at zero
+        models.Product.objects.bulk_create(
+            models.Product(wishlist=wishlist, name="Product", price=5)
+            for wishlist in wishlists
+            for i in range(50)
+        )
+
+        # the tokens, wishlists and products are loaded once, and each
+        # table is deleted from once
+        with self.assertNumQueries(9):
+            user.delete()
+        self.assertFalse(models.Product.objects.exists())
+
+        user = create_user(email="other@test.com")
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        models.Product.objects.bulk_create(
+            models.Product(wishlist=wishlist, name="Product", price=5)
+            for i in range(50)
+        )
+        models.Wishlist.objects.filter(user=user).delete()
+        self.assertFalse(models.Product.objects.exists())
+
+    def test_wishlist_save_keeps_product_counts(self):
+        """Test saving a wishlist loaded earlier keeps the counts."""
+        user = create_user()
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=Decimal("5.50")
+        )
+
+        wishlist.title = "New title"
+        wishlist.add_products(2, Decimal("3.00"))
+        wishlist.save()
+
+        wishlist.refresh_from_db()
+        self.assertEqual(wishlist.title, "New title")
+        self.assertEqual(wishlist.product_count, 3)
+        self.assertEqual(wishlist.total_price, Decimal("8.50"))
+
+    def test_recount_products(self):
+        """Test wishlists can be recounted from their products."""
+        user = create_user()
+        wishlist = models.Wishlist.objects.create(
+            user=user,
+            title="Sample wishlist",
+            occasion_date=datetime.date(year=2020, month=1, day=1),
+        )
+        models.Product.objects.create(
+            wishlist=wishlist, name="Product1", price=Decimal("5.50")
+        )
+        wishlists = models.Wishlist.objects.filter(id=wishlist.id)
+        wishlists.update(product_count=0, total_price=0)
+
+        wishlists.recount_products()
+
+        wishlist.refresh_from_db()
+        self.assertEqual(wishlist.product_count, 1)
+        self.assertEqual(wishlist.total_price, Decimal("5.50"))
@@ -0,0 +1,234 @@
+"""
+Tests for reading from database replicas.
+"""
+import datetime
+import os
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import router
+from django.db.models.signals import post_save
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.middleware import ReplicaMiddleware
+from core.models import Wishlist
+from core.routers import ReplicaRouter
+
+
+TOKEN = '0123456789abcdef0123456789abcdef01234567'
+
+# the first replica of DB_REPLICAS, when set
+HAS_REPLICA = 'replica1' in settings.DATABASES
+
+# pins need a cache shared by the processes
+PIN_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'pins': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'test-replica-pins'),
+    },
+}
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    DB_REPLICA_PIN_CACHE='pins',
+    CACHES=PIN_CACHES,
+)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """Test which database the reads of a request go to."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def tearDown(self):
+        caches['pins'].clear()
+
+    def request(self, method, user_id=1, write=False, credentials=''):
+        """Send a request as the user ``user_id``, recording its reads."""
+        def view(request):
+            self.reads.append(router.db_for_read(Wishlist))
+            if write:
+                router.db_for_write(Wishlist)
+                self.reads.append(router.db_for_read(Wishlist))
+
+        request = self.factory.generic(
+            method, '/', HTTP_AUTHORIZATION=credentials
+        )
+        # as the authentication middleware leaves it
+        request.user = (
+            AnonymousUser() if user_id is None
+            else get_user_model()(id=user_id)
+        )
+        ReplicaMiddleware(view)(request)
+
+    def test_outside_requests_primary(self):
+        """Test commands and other code use the primary."""
+        self.assertEqual(router.db_for_read(Wishlist), 'default')
+        self.assertEqual(router.db_for_write(Wishlist), 'default')
+
+    def test_safe_requests_read_replica(self):
+        """Test GET requests read from a replica."""
+        self.request('GET')
+
+        self.assertEqual(self.reads, ['replica1'])
+
+    def test_writes_pin_client_to_primary(self):
+        """Test a client reads the primary for a while after writing."""
+        self.request('POST')
+        self.request('GET')
+        self.request('GET', user_id=2)
+
+        self.assertEqual(self.reads, ['default', 'default', 'replica1'])
+
+    def test_pin_follows_user(self):
+        """Test the pin holds whatever credentials the user sends next."""
+        self.request('POST', credentials='Token abc')
+        self.request('GET', credentials='Token other')
+
+        self.assertEqual(self.reads, ['default', 'default'])
+
+    def test_write_in_safe_request(self):
+        """Test reads after a write in the same request use the primary."""
+        self.request('GET', write=True)
+        self.request('GET')
+
+        self.assertEqual(self.reads, ['replica1', 'default', 'default'])
+
+    @override_settings(DB_REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        """Test a client reads replicas again after the pin."""
+        self.request('POST')
+        self.request('GET')
+
+        self.assertEqual(self.reads, ['default', 'replica1'])
+
+    def test_anonymous_not_pinned(self):
+        """Test writes without a user pin nobody."""
+        self.request('POST', user_id=None)
+        self.request('GET', user_id=None)
+
+        self.assertEqual(self.reads, ['default', 'replica1'])
+
+    def test_new_token_pins_user(self):
+        """Test the user of a token issued to an anonymous login is pinned."""
+        def login(request):
+            post_save.send(
+                sender=Token,
+                instance=Token(key=TOKEN, user_id=1),
+                created=True,
+            )
+
+        request = self.factory.post('/')
+        request.user = AnonymousUser()
+        ReplicaMiddleware(login)(request)
+        self.request('GET', credentials=f'Token {TOKEN}')
+
+        self.assertEqual(self.reads, ['default'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_middleware_without_replicas(self):
+        """Test the middleware is removed without replicas."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(lambda request: None)
+
+    @override_settings(DB_REPLICA_PIN_CACHE='default')
+    def test_process_local_cache_refused(self):
+        """Test replicas are not used with pins in a locmem cache."""
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaMiddleware(lambda request: None)
+
+    def test_migrations_primary_only(self):
+        """Test only the primary is migrated, replicas replicate it."""
+        self.assertIs(ReplicaRouter().allow_migrate('default', 'core'), True)
+        self.assertIs(
+            ReplicaRouter().allow_migrate('replica1', 'core'), False
+        )
+
+
+@unittest.skipUnless(
+    HAS_REPLICA, 'needs DB_REPLICAS, e.g. DB_REPLICAS=localhost/replica'
+)
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    DB_REPLICA_PIN_CACHE='pins',
+    CACHES=PIN_CACHES,
+)
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Test the API with a second database standing in for a replica."""
+
+    databases = {'default', 'replica1'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        # the same rows on both, but the replica has not seen the title
+        for alias, title in [('default', 'Birthday'), ('replica1', 'Old')]:
+            user = get_user_model().objects.db_manager(alias).create_user(
+                id=1, email='user@example.com', password='testpass123'
+            )
+            Token.objects.using(alias).create(key=TOKEN, user=user)
+            Wishlist.objects.using(alias).create(
+                id=1,
+                user=user,
+                title=title,
+                occasion_date=datetime.date(2030, 1, 1),
+            )
+        # as if the token was issued long ago
+        caches['pins'].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {TOKEN}')
+        self.url = reverse('wishlist:wishlist-detail', args=[1])
+
+    def tearDown(self):
+        caches['pins'].clear()
+        token_cache.clear()
+        # only the primary is flushed, as only it is migrated
+        get_user_model().objects.using('replica1').all().delete()
+
+    def test_login_reads_new_token(self):
+        """Test a token issued on the primary is found on the next read."""
+        # the replica lags behind the login's new token
+        for alias in ['default', 'replica1']:
+            Token.objects.using(alias).all().delete()
+        self.client.credentials()
+
+        res = self.client.post(
+            reverse('user:token'),
+            {'email': 'user@example.com', 'password': 'testpass123'},
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(Token.objects.using('replica1').exists())
+
+    def test_read_your_writes(self):
+        """Test reads go to the replica until the user writes."""
+        res = self.client.get(self.url)
+        self.assertEqual(res.data['title'], 'Old')
+
+        res = self.client.patch(self.url, {'title': 'Wedding'})
+        self.assertEqual(res.data['title'], 'Wedding')
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.data['title'], 'Wedding')
+        self.assertEqual(
+            Wishlist.objects.using('replica1').get(id=1).title, 'Old'
+        )
@@ -0,0 +1,140 @@
+"""
+Timings of the request being served, collected for the Server-Timing
+middleware.
+
+Nothing is measured outside a request the middleware sampled; the hooks
+then only read a context variable.
+"""
+import contextlib
+import contextvars
+import functools
+import time
+
+from django.db import connections
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class Timings:
+    """Durations and query count measured during one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end = None
+        self.view_start = None
+        self.view_end = None
+        # seconds by name, for work measured by ``timed``
+        self.durations = {}
+        self.running = set()
+        self.queries = 0
+
+    def add(self, name, seconds):
+        """Add ``seconds`` to the duration ``name``."""
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def stop(self):
+        """Mark the end of the request."""
+        self.end = time.perf_counter()
+
+    def milliseconds(self):
+        """Return each duration of the finished request in milliseconds."""
+        durations = {
+            "total": self.end - self.start,
+            "db": self.durations.get("db", 0),
+            "serializer": self.durations.get("serializer", 0),
+        }
+        if self.view_start is not None:
+            view_end = self.view_end or self.end
+            durations["view"] = view_end - self.view_start
+            if self.view_end is not None:
+                # the response is rendered after the view returns it
+                durations["render"] = self.end - self.view_end
+        return {
+            name: round(seconds * 1000, 2)
+            for name, seconds in durations.items()
+        }
+
+
+def activate(timings):
+    """Collect timings into ``timings`` until ``deactivate``."""
+    return _current.set(timings)
+
+
+def deactivate(token):
+    """Stop collecting the timings started by ``activate``."""
+    _current.reset(token)
+
+
+def current():
+    """Return the timings being collected, or None."""
+    return _current.get()
+
+
+def timed(name):
+    """
+    Decorate a function to add its duration to the timing ``name``.
+
+    Calls nested in another call timed under the same name are not
+    counted twice.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None or name in timings.running:
+                return function(*args, **kwargs)
+
+            timings.running.add(name)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.running.discard(name)
+                timings.add(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries of a request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    timings.queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def record_queries():
+    """
+    Time the queries run on the current thread in the block.
+
+    The wrapper goes on the connection of every database alias, with
+    any backend, and only for the block.
+    """
+    with contextlib.ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(record_query)
+            )
+        yield
+
+
+class TimedSerializerMixin:
+    """Serializer mixin timing representation and validation."""
+
+    @timed("serializer")
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+    @timed("serializer")
+    def run_validation(self, *args, **kwargs):
+        return super().run_validation(*args, **kwargs)
@@ -0,0 +1,39 @@
+"""
+Views for the core APIs.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import metrics
+from core.authentication import CachedTokenAuthentication
+from core.middleware import profile_cache_key
+
+
+class MetricsView(APIView):
+    """Show in-process metrics to staff users."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """Return the metrics of every registered source."""
+        return Response(metrics.collect())
+
+
+class RequestProfileView(APIView):
+    """Show a request profile taken by RequestProfileMiddleware."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, request_id):
+        """Return the profile of the request with ``request_id``."""
+        profile = caches[settings.REQUEST_PROFILE_CACHE].get(
+            profile_cache_key(request_id)
+        )
+        if profile is None:
+            raise NotFound("No profile for this request, or it expired.")
+        return Response(profile)
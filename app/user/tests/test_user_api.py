@@ -1,8 +1,9 @@
 """
 Tests for the user API.
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -94,6 +95,42 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_token_rehashes_legacy_password(self):
+        """Test a password hashed with an older hasher is upgraded."""
+        user = create_user(email='test@example.com')
+        user.password = make_password(
+            'test-user-password123', hasher='pbkdf2_sha1'
+        )
+        user.save()
+
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test-user-password123',
+        }
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password('test-user-password123'))
+
+    def test_create_token_rehashes_changed_work_factor(self):
+        """Test a password is rehashed when the work factor changes."""
+        user = create_user(
+            email='test@example.com', password='test-user-password123'
+        )
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test-user-password123',
+        }
+
+        with override_settings(ARGON2_TIME_COST=3):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn('t=3', user.password)
+
     def test_create_token_bad_credentials(self):
         """Test returns error if credentials invalid."""
         create_user(email='test@example.com', password='goodpass')
@@ -1,8 +1,10 @@
 """
 URL mappings for the user API.
 """
+from django.conf import settings
 from django.urls import path
 
+from core.asgi import async_urlpatterns
 from user import views
 
 
@@ -15,3 +17,6 @@ urlpatterns = [
 
 
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns(urlpatterns)
@@ -1,7 +1,8 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -9,6 +10,9 @@ from user.serializers import (
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from core.budgets import QueryBudgetMixin
+
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
@@ -21,12 +25,20 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(QueryBudgetMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    # writes read the user again and save it, twice for a new password,
+    # and with the token cache on read the keys of the user's tokens on
+    # each save, to drop them
+    query_budget = {'get': 2, 'put': 5, 'patch': 5}
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # the request's user may come from the token cache, and saving
+        # that copy would write back what changed since it was cached
+        return get_user_model().objects.get(pk=self.request.user.pk)
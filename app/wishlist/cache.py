@@ -0,0 +1,147 @@
+"""
+Per user response cache for wishlist reads
+"""
+
+import functools
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import metrics
+from wishlist.etags import etag_matches
+
+
+# most recently cached query strings and formats kept per key
+MAX_VARIANTS = 20
+
+counters = metrics.Counters("hits", "misses")
+metrics.register("wishlist_response_cache", counters.snapshot)
+
+
+def make_key(kind, user_id, wishlist_id=None, generation=None):
+    """Return the cache key of one kind of response for a user."""
+    if wishlist_id is None:
+        key = "wishlist-cache:%s:%s" % (user_id, kind)
+    else:
+        key = "wishlist-cache:%s:%s:%s" % (user_id, kind, wishlist_id)
+    if generation is None:
+        return key
+    return "%s:%s" % (key, generation)
+
+
+def generation_key(user_id, wishlist_id=None):
+    """
+    Return the key of the generation of a user's responses.
+
+    The list of a user's wishlists has one, and each wishlist another
+    for its detail and product responses.
+    """
+    return make_key("generation", user_id, wishlist_id)
+
+
+def generation(user_id, wishlist_id=None):
+    """Return the current generation of a user's or wishlist's responses."""
+    key = generation_key(user_id, wishlist_id)
+    value = cache.get(key)
+    if value is None:
+        # lost or never set, a new one leaves older responses unused
+        cache.add(key, uuid.uuid4().hex, None)
+        value = cache.get(key)
+    return value
+
+
+def evict(user_id, wishlist_id):
+    """
+    Stop serving the cached responses that show a wishlist.
+
+    Responses are cached under the generation read before the handler
+    ran, and eviction replaces the generations, straight away and again
+    once the transaction commits. A read that ran before the commit
+    caches its response under a generation that is no longer used, and
+    the responses left behind expire with their TTL.
+    """
+    keys = [generation_key(user_id), generation_key(user_id, wishlist_id)]
+
+    def bump():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def view_key(kind, view):
+    """Return the cache key for a view's response, or None."""
+    user_id = view.request.user.id
+    if kind == "list":
+        return make_key(kind, user_id, generation=generation(user_id))
+
+    wishlist_id = view.kwargs.get("wishlist_id", view.kwargs.get("pk"))
+    try:
+        # normalise so the key matches the one evicted by id
+        wishlist_id = int(wishlist_id)
+    except (TypeError, ValueError):
+        return None
+    return make_key(
+        kind,
+        user_id,
+        wishlist_id,
+        generation=generation(user_id, wishlist_id),
+    )
+
+
+def cached(kind):
+    """
+    Cache the responses of a read handler per user.
+
+    Each key holds the responses for the query strings and formats seen
+    recently, along with their ETags, so a hit can also answer
+    ``If-None-Match`` without touching the database. Entries are
+    evicted by signals when the wishlist or its products change, and
+    expire after ``settings.WISHLIST_CACHE_TTL[kind]`` seconds. The
+    key, with its generation, is taken before the handler reads
+    anything, see ``evict``.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            ttl = settings.WISHLIST_CACHE_TTL[kind]
+            key = view_key(kind, view) if ttl else None
+            if key is None:
+                return handler(view, request, *args, **kwargs)
+
+            variant = "%s:%s" % (
+                request.build_absolute_uri(),
+                request.accepted_renderer.format,
+            )
+            variants = cache.get(key) or {}
+            if variant in variants:
+                counters.incr("hits")
+                etag, data = variants[variant]
+                if etag is not None and etag_matches(request, etag):
+                    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                else:
+                    response = Response(data)
+                if etag is not None:
+                    response["ETag"] = etag
+                return response
+
+            counters.incr("misses")
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                variants.pop(variant, None)
+                while len(variants) >= MAX_VARIANTS:
+                    variants.pop(next(iter(variants)))
+                variants[variant] = (response.get("ETag"), response.data)
+                cache.set(key, variants, ttl)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,59 @@
+"""
+ETag support for wishlist APIs
+"""
+
+import functools
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, version):
+    """Return a strong ETag for the response to ``request``."""
+    # the query string and format change the body, not only the version
+    value = "%s:%s:%s" % (
+        version,
+        request.get_full_path(),
+        request.accepted_renderer.format,
+    )
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    """Return True when ``If-None-Match`` lists ``etag``."""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+
+    # If-None-Match uses the weak comparison
+    etags = [tag[2:] if tag.startswith("W/") else tag
+             for tag in parse_etags(header)]
+    return "*" in etags or etag in etags
+
+
+def conditional(handler):
+    """
+    Add an ETag to a read handler and answer ``If-None-Match`` with 304.
+
+    The view's ``get_version`` returns the version stamp of the data
+    behind the response. A 304 is returned without running the handler,
+    so nothing is serialized.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        etag = make_etag(request, view.get_version())
+        if etag_matches(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+        response = handler(view, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    return wrapper
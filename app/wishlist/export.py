@@ -0,0 +1,116 @@
+"""
+Streaming export of a user's wishlists and products
+"""
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils import encoders
+
+from core.models import Product, Wishlist
+from wishlist.serializers import WishlistDetailSerializer, iter_rows
+
+
+# size of the pieces handed to the server
+BUFFER_SIZE = 64 * 1024
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renderer for newline delimited JSON."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render ``data`` as a single line, used for errors."""
+        if data is None:
+            return b""
+        return (dumps(data) + "\n").encode()
+
+
+def dumps(data):
+    """Return compact JSON like the API's JSON renderer writes."""
+    ret = json.dumps(
+        data,
+        cls=encoders.JSONEncoder,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    # escaped for embedding in JavaScript, as the renderer does
+    return ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def export_wishlists(user, ndjson=False, chunk_size=2000):
+    """
+    Yield the wishlists of ``user`` with their products as JSON.
+
+    Wishlists and products are each read with one server side cursor,
+    both ordered by wishlist, and merged as they stream, so memory use
+    does not grow with the size of the account. The output is a JSON
+    array, or one wishlist per line with ``ndjson``.
+    """
+    serializer = WishlistDetailSerializer()
+    wishlist_fields = [
+        field
+        for field in serializer._readable_fields
+        if field.field_name != "products"
+    ]
+    product_fields = serializer.fields["products"].child._readable_fields
+
+    wishlists = iter_rows(
+        wishlist_fields,
+        Wishlist.objects.filter(user=user).order_by("id"),
+        extra_columns=["id"],
+        chunk_size=chunk_size,
+    )
+    products = iter_rows(
+        product_fields,
+        Product.objects.filter(wishlist__user=user).order_by(
+            "wishlist_id", "id"
+        ),
+        extra_columns=["wishlist_id"],
+        chunk_size=chunk_size,
+    )
+
+    if ndjson:
+        start, separator, line_end, end = "", "", "\n", ""
+    else:
+        start, separator, line_end, end = "[", ",", "", "]"
+
+    parts = [start]
+    size = 0
+    product, (product_wishlist_id,) = next(products, (None, (None,)))
+    for index, (wishlist, (wishlist_id,)) in enumerate(wishlists):
+        # the products go last, written one by one
+        head = dumps(wishlist)[:-1]
+        if wishlist:
+            head += ","
+        if index:
+            head = separator + head
+        parts.append(head + '"products":[')
+        size += len(head)
+
+        first = True
+        # products of wishlists created during the export are skipped
+        while product is not None and product_wishlist_id <= wishlist_id:
+            if product_wishlist_id == wishlist_id:
+                item = dumps(product)
+                parts.append(item if first else "," + item)
+                size += len(item)
+                first = False
+            product, (product_wishlist_id,) = next(products, (None, (None,)))
+
+            if size >= BUFFER_SIZE:
+                yield "".join(parts).encode()
+                parts = []
+                size = 0
+
+        parts.append("]}" + line_end)
+        if size >= BUFFER_SIZE:
+            yield "".join(parts).encode()
+            parts = []
+            size = 0
+
+    parts.append(end)
+    yield "".join(parts).encode()
@@ -0,0 +1,110 @@
+"""
+Filters for wishlist APIs
+"""
+
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from core.models import PRIORITY_ORDER, Product, priority_rank
+
+
+# ordering parameter values and the columns they sort on, each backed by
+# an index on Product together with the wishlist
+ORDERINGS = {
+    "price": ["price", "id"],
+    "-price": ["-price", "-id"],
+    "name": ["name", "id"],
+    "-name": ["-name", "-id"],
+    "priority": ["priority_rank", "id"],
+    "-priority": ["-priority_rank", "-id"],
+}
+
+price_field = Product._meta.get_field("price")
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    """Serializer for the product list query parameters."""
+
+    priority = serializers.CharField(
+        required=False,
+        help_text="Comma separated priorities, for example HIGH,MEDIUM.",
+    )
+    min_price = serializers.DecimalField(
+        max_digits=price_field.max_digits,
+        decimal_places=price_field.decimal_places,
+        required=False,
+    )
+    max_price = serializers.DecimalField(
+        max_digits=price_field.max_digits,
+        decimal_places=price_field.decimal_places,
+        required=False,
+    )
+    has_link = serializers.BooleanField(required=False)
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), required=False)
+
+    def validate_priority(self, value):
+        """Split the priorities and check they are known."""
+        priorities = [item.strip().upper() for item in value.split(",")]
+        unknown = [item for item in priorities if item not in PRIORITY_ORDER]
+        if unknown:
+            raise serializers.ValidationError(
+                "Unknown priority: %s. Expected one of: %s."
+                % (", ".join(unknown), ", ".join(PRIORITY_ORDER))
+            )
+        return priorities
+
+    def validate(self, attrs):
+        """Check the price range is not empty."""
+        min_price = attrs.get("min_price")
+        max_price = attrs.get("max_price")
+        if (
+            min_price is not None
+            and max_price is not None
+            and min_price > max_price
+        ):
+            raise serializers.ValidationError(
+                {"min_price": ["Must not be greater than max_price."]}
+            )
+        return attrs
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Filter and order products from query parameters.
+
+    ``priority`` takes a comma separated list, ``min_price`` and
+    ``max_price`` bound the price, ``has_link`` is true or false and
+    ``ordering`` sorts by price, name or priority, descending with a
+    leading ``-``. Priorities sort by importance, not alphabetically.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = ProductFilterSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        ordering = data.get("ordering")
+        if "priority" in data or ordering in ["priority", "-priority"]:
+            # the same expression as the index, so the index is used
+            queryset = queryset.annotate(priority_rank=priority_rank())
+
+        if "priority" in data:
+            queryset = queryset.filter(
+                priority_rank__in=[
+                    PRIORITY_ORDER.index(priority) + 1
+                    for priority in data["priority"]
+                ]
+            )
+        if "min_price" in data:
+            queryset = queryset.filter(price__gte=data["min_price"])
+        if "max_price" in data:
+            queryset = queryset.filter(price__lte=data["max_price"])
+        if data.get("has_link") is True:
+            # matches the condition of the partial index
+            queryset = queryset.filter(link__gt="")
+        elif data.get("has_link") is False:
+            queryset = queryset.exclude(link__gt="")
+
+        if ordering is not None:
+            queryset = queryset.order_by(*ORDERINGS[ordering])
+        return queryset
@@ -0,0 +1,192 @@
+"""
+Pagination for wishlist APIs
+"""
+
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination for clients that ask for pages.
+
+    Each page is fetched with ``WHERE id < <cursor>`` instead of an
+    OFFSET, and no COUNT is run, so deep pages cost the same as the
+    first one. When a filter backend ordered the queryset, the ordering
+    must end with ``id`` and the cursor holds the value of each of its
+    columns, so pages follow ``WHERE (price, id) > (<price>, <id>)`` and
+    runs of equal prices or priorities never fall back to an OFFSET.
+    Requests without a ``cursor`` or ``page_size`` parameter get the
+    full unpaginated list, as before.
+    """
+
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate only when the client opted in."""
+        params = request.query_params
+        if (
+            self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return None
+
+        ordering = self.get_ordering(request, queryset, view)
+        if len(ordering) == 1:
+            # decode_cursor checks positions against it
+            self.position_field = self.ordering_field(queryset, ordering[0])
+            return super().paginate_queryset(queryset, request, view=view)
+
+        return self.paginate_keyset(queryset, request, ordering)
+
+    def paginate_keyset(self, queryset, request, ordering):
+        """
+        Paginate on all the columns of ``ordering``.
+
+        As the last column is unique, so is every position, and the
+        cursors this builds never carry an offset.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or Cursor(0, False, None)
+
+        if reverse:
+            ordering = [
+                order[1:] if order.startswith("-") else "-" + order
+                for order in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            values = self.decode_position(position, queryset)
+            queryset = queryset.filter(self.after_position(ordering, values))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None or offset > 0
+            self.has_previous = following is not None
+            self.next_position = position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None or offset > 0
+            self.next_position = following
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def after_position(self, ordering, values):
+        """Return a filter for the rows after ``values`` in ``ordering``."""
+        after = None
+        for order, value in reversed(list(zip(ordering, values))):
+            column = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            beyond = Q(**{"%s__%s" % (column, lookup): value})
+            if after is not None:
+                beyond |= Q(**{column: value}) & after
+            after = beyond
+        return after
+
+    def decode_cursor(self, request):
+        """Decode the cursor, checking a single column position."""
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        if len(self.ordering) == 1:
+            try:
+                self.position_field.clean(cursor.position, None)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def decode_position(self, position, queryset):
+        """
+        Return the column values held by a cursor position.
+
+        Each value is cleaned by the field of its column, so a tampered
+        cursor gives a 404 rather than a database error.
+        """
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or (
+                len(values) != len(self.ordering)
+            ):
+                raise ValueError("Expected a value per ordering column.")
+            return [
+                self.ordering_field(queryset, order).clean(value, None)
+                for order, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def ordering_field(self, queryset, order):
+        """Return the model field or annotation an ordering column is."""
+        column = order.lstrip("-")
+        if column in queryset.query.annotations:
+            return queryset.query.annotations[column].output_field
+        return queryset.model._meta.get_field(column)
+
+    def get_next_link(self):
+        """Point at the last row of the page, which is unique."""
+        if len(self.ordering) == 1:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+
+        position = self.next_position
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+        return self.encode_cursor(Cursor(0, False, position))
+
+    def get_previous_link(self):
+        """Point at the first row of the page, which is unique."""
+        if len(self.ordering) == 1:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+
+        position = self.previous_position
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[0], self.ordering
+            )
+        return self.encode_cursor(Cursor(0, True, position))
+
+    def get_ordering(self, request, queryset, view):
+        """Keep the ordering a filter backend put on the queryset."""
+        ordering = tuple(queryset.query.order_by)
+        assert len(ordering) < 2 or ordering[-1].lstrip("-") == "id", (
+            "Paginated orderings must end with id, not %s." % ordering[-1]
+        )
+        return ordering or super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Return the values of all the ordering columns of ``instance``."""
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+
+        position = super()._get_position_from_instance
+        return json.dumps([position(instance, [order]) for order in ordering])
@@ -0,0 +1,79 @@
+"""
+Text search over wishlists and products
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, models
+from django.db.models.lookups import PostgresOperatorLookup
+
+
+# text search configuration used by the search vector triggers
+SEARCH_CONFIG = "english"
+
+# whether pg_trgm is installed, per database alias
+_trigram_installed = {}
+
+
+@models.CharField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """Match values containing a word similar to the string."""
+
+    lookup_name = "trigram_word_similar"
+    postgres_operator = "%%>"
+
+
+class TrigramWordSimilarity(models.Func):
+    """Similarity of a string to the most similar word of a value."""
+
+    function = "WORD_SIMILARITY"
+    output_field = models.FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, "resolve_expression"):
+            string = models.Value(string)
+        super().__init__(string, expression, **extra)
+
+
+def trigram_installed(using):
+    """Return True when the pg_trgm extension is installed."""
+    if connections[using].vendor != "postgresql":
+        return False
+    if using not in _trigram_installed:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_installed[using] = cursor.fetchone() is not None
+
+    return _trigram_installed[using]
+
+
+def search(queryset, text, fields, trigram_field):
+    """
+    Return the rows of ``queryset`` matching ``text``, best first.
+
+    On PostgreSQL rows are matched against their ``search_vector``,
+    kept up to date by a trigger, and ranked with ``ts_rank``. Where
+    pg_trgm is installed, ``trigram_field`` also matches words that are
+    misspelled in ``text``. Other databases fall back to
+    ``icontains`` on ``fields``, newest first.
+    """
+    using = queryset.db
+    if connections[using].vendor != "postgresql":
+        match = models.Q()
+        for field in fields:
+            match |= models.Q(**{"%s__icontains" % field: text})
+        return queryset.filter(match).order_by("-id")
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    match = models.Q(search_vector=query)
+    rank = SearchRank(models.F("search_vector"), query)
+    if trigram_installed(using):
+        match |= models.Q(**{"%s__trigram_word_similar" % trigram_field: text})
+        rank = rank + TrigramWordSimilarity(text, trigram_field)
+
+    return (
+        queryset.filter(match)
+        .annotate(rank=rank)
+        .order_by("-rank", "-id")
+    )
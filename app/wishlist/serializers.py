@@ -2,73 +2,427 @@
 Serializers for wishlist APIs
 """
 
+import collections
+
+from django.db import connection, models, transaction
+from django.utils.functional import cached_property
+
 from rest_framework import serializers
 
-from core.models import Wishlist, Product
+from core.models import Wishlist, Product, mute_product_signals
+from core.timing import TimedSerializerMixin, timed
+
+
+# Field representations that return database values unchanged.
+PASSTHROUGH_REPRESENTATIONS = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+}
+
+
+class ProductListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    List serializer that can render products from database rows.
+
+    For long lists most of the time goes into building model instances
+    and running each field through the serializer, so read only views
+    render rows from ``values_list`` with ``represent_rows`` instead.
+    The output is the same as ``to_representation``.
+    """
+
+    def to_representation(self, data):
+        # nested under a wishlist, use rows the view loaded up front
+        rows = self.context.get("product_rows")
+        if rows is not None and isinstance(data, models.Manager):
+            return rows.get(data.instance.pk, [])
+
+        return super().to_representation(data)
+
+    @timed("serializer")
+    def represent_rows(self, queryset, group_by=None):
+        """
+        Render the products in ``queryset`` from database rows.
+
+        Returns a list, or a dict of lists keyed by the ``group_by``
+        column when it is given.
+        """
+        fields = self.child._readable_fields
+        extra_columns = [] if group_by is None else [group_by]
+        rows = iter_rows(fields, queryset, extra_columns)
+        if group_by is None:
+            return [item for item, extra in rows]
+
+        grouped = {}
+        for item, (group,) in rows:
+            grouped.setdefault(group, []).append(item)
+        return grouped
+
+
+def iter_rows(fields, queryset, extra_columns=(), chunk_size=None):
+    """
+    Render rows of ``queryset`` with serializer ``fields`` one at a time.
+
+    Yields the rendered item with a tuple of the ``extra_columns``
+    values of its row. With ``chunk_size`` the rows are read with
+    ``iterator`` so they are never all held in memory.
+    """
+    fields = list(fields)
+    names = [field.field_name for field in fields]
+    converters = [
+        None
+        if type(field).to_representation in PASSTHROUGH_REPRESENTATIONS
+        else field.to_representation
+        for field in fields
+    ]
+    columns = [field.source for field in fields]
+    rows = queryset.values_list(*columns, *extra_columns)
+    if chunk_size is not None:
+        rows = rows.iterator(chunk_size=chunk_size)
+
+    width = len(fields)
+    for row in rows:
+        item = {}
+        for name, convert, value in zip(names, converters, row):
+            if value is not None and convert is not None:
+                value = convert(value)
+            item[name] = value
+
+        yield item, row[width:]
+
+
+def save_products(wishlist, product_data, existing, replace=False):
+    """
+    Write products of a wishlist with a fixed number of queries.
+
+    Items with an id update the fields they sent on the matching product
+    in ``existing``, which the caller loads with ``select_for_update``.
+    Items without one are created. When ``replace`` is set, products
+    missing from ``product_data`` are deleted. The products are counted
+    into the wishlist with ``add_products``, for the caller to save.
+    Returns the created and the updated products.
+    """
+    new_products = []
+    changed_products = []
+    # products by the fields sent for them, so that fields nobody sent
+    # are not written back
+    changed_by_fields = {}
+    count = total = 0
+
+    for item in product_data:
+        product_id = item.pop("id", None)
+        if product_id is None:
+            new_products.append(Product(wishlist=wishlist, **item))
+            continue
 
+        product = existing.get(product_id)
+        if product is None:
+            raise serializers.ValidationError(
+                {"products": ["Invalid product id %s." % product_id]}
+            )
+        if "price" in item:
+            total += item["price"] - product.price
+        for attr, value in item.items():
+            setattr(product, attr, value)
+        changed_by_fields.setdefault(tuple(sorted(item)), []).append(product)
+        changed_products.append(product)
+
+    count += len(new_products)
+    total += sum(product.price for product in new_products)
+    if replace:
+        kept_ids = {product.id for product in changed_products}
+        for product_id, product in existing.items():
+            if product_id not in kept_ids:
+                count -= 1
+                total -= product.price
+        # the wishlist is saved by the caller, no need to touch it
+        # for each deleted product
+        with mute_product_signals():
+            wishlist.products.exclude(id__in=kept_ids).delete()
+    if new_products and connection.features.can_return_rows_from_bulk_insert:
+        Product.objects.bulk_create(new_products)
+    elif new_products:
+        # bulk inserts return no ids here, which the response needs
+        with mute_product_signals():
+            for product in new_products:
+                product.save()
+    for fields, products in changed_by_fields.items():
+        if fields:
+            Product.objects.bulk_update(products, fields)
+    wishlist.add_products(count, total)
+
+    return new_products, changed_products
+
+
+def parse_fieldset(value):
+    """
+    Parse a comma separated list of field paths into a tree.
+
+    ``"id,products.name"`` gives ``{"id": {}, "products": {"name": {}}}``.
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    Render only the fields asked for with ``?fields=`` or ``?exclude=``.
+
+    Both take comma separated field names, and dotted paths such as
+    ``products.name`` for nested serializers. Only the output is
+    pruned, writes accept every field. Views read ``_readable_fields``
+    to load just the columns that are rendered.
+    """
+
+    @cached_property
+    def sparse_fieldset(self):
+        """Return the include and exclude trees for this serializer."""
+        parent = self.parent
+        name = self.field_name
+        if isinstance(parent, serializers.ListSerializer):
+            name = parent.field_name
+            parent = parent.parent
 
-class ProductSerializer(serializers.ModelSerializer):
+        if parent is None:
+            request = self.context.get("request")
+            if request is None:
+                return None, None
+            params = request.query_params
+            include, exclude = [
+                parse_fieldset(params[param]) if param in params else None
+                for param in ["fields", "exclude"]
+            ]
+        elif isinstance(parent, SparseFieldsMixin):
+            include, exclude = [
+                tree.get(name) if tree else None
+                for tree in parent.sparse_fieldset
+            ]
+        else:
+            return None, None
+
+        for param, tree in [("fields", include), ("exclude", exclude)]:
+            unknown = sorted(set(tree or ()) - set(self.fields))
+            if unknown:
+                raise serializers.ValidationError(
+                    {param: ["Unknown field: %s." % ", ".join(unknown)]}
+                )
+
+        # a nested serializer named without a path renders every field
+        return include or None, exclude or None
+
+    @property
+    def _readable_fields(self):
+        include, exclude = self.sparse_fieldset
+        for field in super()._readable_fields:
+            name = field.field_name
+            if include is not None and name not in include:
+                continue
+            if exclude is not None and exclude.get(name) == {}:
+                continue
+            yield field
+
+
+class ProductSerializer(
+    TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """Serializer for products."""
 
     class Meta:
         model = Product
         fields = ["id", "name", "link", "priority", "price", "notes"]
         read_only_fields = ["id"]
+        list_serializer_class = ProductListSerializer
+
+
+class NestedProductSerializer(ProductSerializer):
+    """Serializer for products written through a wishlist."""
+
+    # writable so that existing products can be matched by id
+    id = serializers.IntegerField(required=False)
+
 
+class ProductUpdateSerializer(ProductSerializer):
+    """Serializer for products changed by id in a bulk request."""
 
-class WishlistSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(ProductSerializer.Meta):
+        extra_kwargs = {
+            name: {"required": False}
+            for name in ProductSerializer.Meta.fields
+        }
+
+
+class ProductBulkSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Serializer for creating, changing and deleting products at once.
+
+    Every item is validated before anything is written, errors are
+    reported per item. The results hold the created and updated
+    products and the deleted ids, in the order they were sent.
+    """
+
+    max_items = 1000
+
+    def get_fields(self):
+        # declared as class attributes these would replace the
+        # create and update methods
+        return {
+            "create": ProductSerializer(many=True, required=False),
+            "update": ProductUpdateSerializer(many=True, required=False),
+            "delete": serializers.ListField(
+                child=serializers.IntegerField(), required=False
+            ),
+        }
+
+    def validate(self, attrs):
+        """Check the ids belong to the wishlist and are used once."""
+        create = attrs.setdefault("create", [])
+        update = attrs.setdefault("update", [])
+        delete = attrs.setdefault("delete", [])
+        if len(create) + len(update) + len(delete) > self.max_items:
+            raise serializers.ValidationError(
+                "At most %s products can be written at once." % self.max_items
+            )
+
+        ids = [item["id"] for item in update] + delete
+        repeated = sorted(
+            product_id
+            for product_id, count in collections.Counter(ids).items()
+            if count > 1
+        )
+        if repeated:
+            raise serializers.ValidationError(
+                "Products can only be changed once per request: %s."
+                % ", ".join(map(str, repeated))
+            )
+
+        return attrs
+
+    def check_ids(self, existing, update, delete):
+        """Raise a validation error for ids not in ``existing``."""
+        errors = {}
+        update_errors = [
+            {} if item["id"] in existing
+            else {"id": ["Invalid product id %s." % item["id"]]}
+            for item in update
+        ]
+        if any(update_errors):
+            errors["update"] = update_errors
+        delete_errors = {
+            index: ["Invalid product id %s." % product_id]
+            for index, product_id in enumerate(delete)
+            if product_id not in existing
+        }
+        if delete_errors:
+            errors["delete"] = delete_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Apply the changes and return the results."""
+        wishlist = self.context["wishlist"]
+        update = validated_data["update"]
+        delete = validated_data["delete"]
+        # locked, so the changes apply to the current rows and nothing
+        # changes them before the transaction ends
+        existing = wishlist.products.select_for_update().in_bulk(
+            [item["id"] for item in update] + delete
+        )
+        self.check_ids(existing, update, delete)
+
+        if delete:
+            # the wishlist is saved below, no need to touch it for each
+            # deleted product
+            with mute_product_signals():
+                wishlist.products.filter(id__in=delete).delete()
+            wishlist.add_products(
+                -len(delete),
+                -sum(existing[product_id].price for product_id in delete),
+            )
+
+        created, updated = save_products(
+            wishlist, validated_data["create"] + update, existing=existing
+        )
+        wishlist.save(update_fields=["version"])
+
+        return {"create": created, "update": updated, "delete": delete}
+
+
+class WishlistSerializer(
+    TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """Serializer for wishlists."""
 
-    products = ProductSerializer(many=True, required=False)
+    products = NestedProductSerializer(many=True, required=False)
 
     class Meta:
         model = Wishlist
-        fields = ["id", "title", "occasion_date", "products"]
-        read_only_fields = ["id"]
+        fields = [
+            "id",
+            "title",
+            "occasion_date",
+            "product_count",
+            "total_price",
+            "products",
+        ]
+        read_only_fields = ["id", "product_count", "total_price"]
+
+    def validate_products(self, value):
+        """Require all product fields for products that are new."""
+        product_fields = self.fields["products"].child.fields
+        required = [
+            name for name, field in product_fields.items() if field.required
+        ]
+        for item in value:
+            if "id" in item:
+                continue
+            missing = [name for name in required if name not in item]
+            if missing:
+                raise serializers.ValidationError(
+                    "New products must include: %s." % ", ".join(missing)
+                )
+
+        return value
 
     # customize method so that we can override the
     # frameworks create/write method to create products via wishlist
     # rather than just read
+    @transaction.atomic
     def create(self, validated_data):
         """Create a wishlist and its products."""
         products = validated_data.pop("products", [])
         wishlist = Wishlist.objects.create(**validated_data)
-        # request authenticated user data
-        # auth_user = self.context['request'].user
-        for product in products:
-
-            product_obj, created = Product.objects.get_or_create(
-                wishlist=wishlist,
-                # user=auth_user,
-                **product,
-            )
-            wishlist.products.add(product_obj)
+        save_products(wishlist, products, existing={})
+        if products:
+            wishlist.save(update_fields=["version"])
 
         return wishlist
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a wishlist and its products"""
-
-        # Update or create nested Product objects
         product_data = validated_data.pop("products", None)
 
         if product_data is not None:
-
-            # this detaches the relationship between product
-            # and wishlist (set id to null)
-            # instance.products.clear()
-            for product_item in product_data:
-                product_instance, created = Product.objects.get_or_create(
-                    **product_item, wishlist=instance
-                )
-
-                # below commented out works the same as instance.products.add
-                # (product_instance) need to understand the difference
-                # ProductSerializer().update(product_instance, product_item)
-
-                instance.products.add(product_instance)
-            if len(product_data) == 0:
-                instance.products.all().delete()
+            # a full update replaces the wishlist's products, a partial
+            # update only adds and changes them unless it sends an empty
+            # list to clear them
+            replace = not self.partial or len(product_data) == 0
+            # locked, like in the bulk endpoint
+            existing = {
+                product.id: product
+                for product in instance.products.select_for_update()
+            }
+            save_products(
+                instance, product_data, existing=existing, replace=replace
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -77,6 +431,32 @@ class WishlistSerializer(serializers.ModelSerializer):
         return instance
 
 
+class ProductSearchSerializer(ProductSerializer):
+    """Serializer for products found by a search."""
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ["wishlist"]
+        read_only_fields = fields
+
+
+class WishlistSearchSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    """Serializer for wishlists found by a search."""
+
+    class Meta:
+        model = Wishlist
+        fields = ["id", "title", "occasion_date", "description"]
+        read_only_fields = fields
+
+
+class SearchParamsSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for the search query parameters."""
+
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
 class WishlistDetailSerializer(WishlistSerializer):
     """Serializer for wishlist detail view."""
 
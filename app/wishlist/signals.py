@@ -0,0 +1,31 @@
+"""
+Signal handlers for the wishlist app.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Product, Wishlist, product_signals_muted
+from wishlist import cache
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def evict_wishlist(sender, instance, **kwargs):
+    """Drop cached responses showing a changed wishlist."""
+    cache.evict(instance.user_id, instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def evict_product_wishlist(sender, instance, **kwargs):
+    """Drop cached responses showing the wishlist of a changed product."""
+    # bulk writers save or delete the wishlist itself afterwards
+    if product_signals_muted():
+        return
+
+    try:
+        wishlist = instance.wishlist
+    except Wishlist.DoesNotExist:
+        return
+    cache.evict(wishlist.user_id, wishlist.pk)
@@ -0,0 +1,204 @@
+"""
+Tests for the wishlist response cache.
+"""
+
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Wishlist
+from wishlist.cache import counters
+from wishlist.views import WishlistViewSet
+
+
+WISHLIST_URL = reverse("wishlist:wishlist-list")
+
+
+def wishlist_detail_url(wishlist_id):
+    """Create and return a wishlist detail URL."""
+    return reverse("wishlist:wishlist-detail", args=[wishlist_id])
+
+
+def wishlist_product_url(wishlist_id):
+    """Create and return a product URL."""
+    return reverse("wishlist:products", kwargs={"wishlist_id": wishlist_id})
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_wishlist(user, **params):
+    """Create and return a sample wishlist."""
+    defaults = {
+        "title": "Sample wishlist title",
+        "occasion_date": datetime.date(year=2020, month=1, day=1),
+    }
+    defaults.update(params)
+
+    return Wishlist.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of wishlist reads."""
+
+    def setUp(self):
+        cache.clear()
+        counters.reset()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.wishlist = create_wishlist(user=self.user)
+        self.product = Product.objects.create(
+            wishlist=self.wishlist, name="Pink Top", price=10.99
+        )
+
+    def test_repeated_reads_cached(self):
+        """Test repeated reads are served without database queries."""
+        for url in [WISHLIST_URL, wishlist_detail_url(self.wishlist.id)]:
+            first = self.client.get(url)
+
+            with self.assertNumQueries(0):
+                res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, first.content)
+        self.assertEqual(counters.snapshot(), {"hits": 2, "misses": 2})
+
+    def test_product_list_cached(self):
+        """Test a cached product list is served without queries."""
+        url = wishlist_product_url(self.wishlist.id)
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(res["ETag"], first["ETag"])
+
+    def test_cached_not_modified(self):
+        """Test a cached ETag answers If-None-Match without queries."""
+        url = wishlist_detail_url(self.wishlist.id)
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_query_strings_cached_separately(self):
+        """Test differently paginated lists are cached separately."""
+        create_wishlist(user=self.user)
+        self.client.get(WISHLIST_URL)
+
+        res = self.client.get(WISHLIST_URL, {"page_size": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_product_change_evicts(self):
+        """Test changing a product evicts every response showing it."""
+        urls = [
+            WISHLIST_URL,
+            wishlist_detail_url(self.wishlist.id),
+            wishlist_product_url(self.wishlist.id),
+        ]
+        for url in urls:
+            self.client.get(url)
+
+        self.product.name = "Blue Top"
+        self.product.save()
+
+        self.assertEqual(
+            self.client.get(urls[0]).data[0]["products"][0]["name"],
+            "Blue Top",
+        )
+        self.assertEqual(
+            self.client.get(urls[1]).data["products"][0]["name"], "Blue Top"
+        )
+        self.assertEqual(self.client.get(urls[2]).data[0]["name"], "Blue Top")
+
+    def test_wishlist_change_evicts(self):
+        """Test updating a wishlist through the API evicts its responses."""
+        url = wishlist_detail_url(self.wishlist.id)
+        self.client.get(WISHLIST_URL)
+        self.client.get(url)
+
+        self.client.patch(
+            url,
+            {"products": [{"id": self.product.id, "name": "Blue Top"}]},
+            format="json",
+        )
+
+        res = self.client.get(WISHLIST_URL)
+        self.assertEqual(res.data[0]["products"][0]["name"], "Blue Top")
+        res = self.client.get(url)
+        self.assertEqual(res.data["products"][0]["name"], "Blue Top")
+
+    def test_wishlist_delete_evicts(self):
+        """Test a deleted wishlist is no longer served from the cache."""
+        url = wishlist_detail_url(self.wishlist.id)
+        self.client.get(WISHLIST_URL)
+        self.client.get(url)
+
+        self.client.delete(url)
+
+        self.assertEqual(self.client.get(WISHLIST_URL).data, [])
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_per_user(self):
+        """Test cached responses are never served to another user."""
+        url = wishlist_detail_url(self.wishlist.id)
+        self.client.get(WISHLIST_URL)
+        self.client.get(url)
+
+        self.client.force_authenticate(create_user(email="other@example.com"))
+
+        self.assertEqual(self.client.get(WISHLIST_URL).data, [])
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    # the concurrent write runs inside the read
+    @override_settings(QUERY_BUDGETS="off")
+    def test_read_overlapping_commit_not_cached(self):
+        """Test a read that saw data from before a commit is not reused."""
+        url = wishlist_detail_url(self.wishlist.id)
+        render_products = WishlistViewSet.render_products
+
+        def render_then_commit(view, *args):
+            render_products(view, *args)
+            # a concurrent write commits before the response is cached
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.create(
+                    wishlist=self.wishlist, name="Hat", price=5
+                )
+
+        with patch.object(
+            WishlistViewSet, "render_products", render_then_commit
+        ):
+            stale = self.client.get(url)
+        res = self.client.get(url)
+
+        self.assertEqual(len(stale.data["products"]), 1)
+        self.assertEqual(len(res.data["products"]), 2)
+        self.assertEqual(counters.snapshot(), {"hits": 0, "misses": 2})
+
+    @override_settings(
+        WISHLIST_CACHE_TTL={"list": 0, "wishlist": 0, "products": 0}
+    )
+    def test_cache_disabled(self):
+        """Test a TTL of 0 disables the cache."""
+        self.client.get(WISHLIST_URL)
+
+        with self.assertNumQueries(2):
+            self.client.get(WISHLIST_URL)
+
+        self.assertEqual(counters.snapshot(), {"hits": 0, "misses": 0})
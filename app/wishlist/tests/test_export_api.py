@@ -0,0 +1,132 @@
+"""
+Tests for the wishlist export API.
+"""
+
+import datetime
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Wishlist
+from wishlist import export
+from wishlist.views import WishlistExportView
+
+
+EXPORT_URL = reverse("wishlist:export")
+
+
+def wishlist_detail_url(wishlist_id):
+    """Create and return a wishlist detail URL."""
+    return reverse("wishlist:wishlist-detail", args=[wishlist_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_wishlist(user, products=0, **params):
+    """Create and return a sample wishlist with products."""
+    defaults = {
+        "title": "Sample wishlist title",
+        "description": "Sample description",
+        "occasion_date": datetime.date(year=2020, month=1, day=1),
+    }
+    defaults.update(params)
+
+    wishlist = Wishlist.objects.create(user=user, **defaults)
+    for i in range(products):
+        Product.objects.create(
+            wishlist=wishlist,
+            name="Product   %s" % i,
+            price=i,
+            link="https://example.com/%s" % i if i % 2 else None,
+        )
+    return wishlist
+
+
+def read(response):
+    """Return the body of a streaming response."""
+    return b"".join(response.streaming_content)
+
+
+class PublicExportApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to export."""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expected(self):
+        """Return the user's wishlists as the detail API renders them."""
+        results = []
+        for wishlist in Wishlist.objects.filter(user=self.user).order_by("id"):
+            data = self.client.get(wishlist_detail_url(wishlist.id)).json()
+            # the export writes products last
+            data["products"] = data.pop("products")
+            results.append(data)
+        return results
+
+    def test_export_json(self):
+        """Test the export streams every wishlist with its products."""
+        create_wishlist(self.user, products=3)
+        create_wishlist(self.user)
+        create_wishlist(self.user, products=2, title="Birthday")
+        create_wishlist(create_user(email="other@example.com"), products=2)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/json")
+        self.assertIn("wishlists.json", res["Content-Disposition"])
+        self.assertEqual(json.loads(read(res)), self.expected())
+
+    def test_export_ndjson(self):
+        """Test the export writes one wishlist per line as NDJSON."""
+        create_wishlist(self.user, products=3)
+        create_wishlist(self.user)
+
+        res = self.client.get(EXPORT_URL, {"format": "ndjson"})
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = read(res).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected())
+
+    def test_export_empty(self):
+        """Test exporting a user without wishlists."""
+        self.assertEqual(json.loads(read(self.client.get(EXPORT_URL))), [])
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(read(res), b"")
+
+    @patch.object(export, "BUFFER_SIZE", 100)
+    @patch.object(WishlistExportView, "chunk_size", 2)
+    def test_export_streams_in_chunks(self):
+        """Test rows are fetched and written out in chunks."""
+        for i in range(3):
+            create_wishlist(self.user, products=5)
+        expected = self.expected()
+
+        with self.assertNumQueries(2):
+            res = self.client.get(EXPORT_URL)
+            chunks = list(res.streaming_content)
+
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(json.loads(b"".join(chunks)), expected)
@@ -0,0 +1,193 @@
+"""
+Tests for the product import API.
+"""
+
+import datetime
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Wishlist
+from wishlist import imports
+
+
+def wishlist_product_import_url(wishlist_id):
+    """Create and return a product import URL."""
+    return reverse(
+        "wishlist:products_import", kwargs={"wishlist_id": wishlist_id}
+    )
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_wishlist(user, **params):
+    """Create and return a sample wishlist."""
+    defaults = {
+        "title": "Sample wishlist title",
+        "occasion_date": datetime.date(year=2020, month=1, day=1),
+    }
+    defaults.update(params)
+
+    return Wishlist.objects.create(user=user, **defaults)
+
+
+class ImportProductsApiTests(TestCase):
+    """Test importing products from files."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.wishlist = create_wishlist(user=self.user)
+        self.url = wishlist_product_import_url(self.wishlist.id)
+
+    def post(self, body, content_type):
+        """Post a raw request body to the import."""
+        return self.client.generic(
+            "POST", self.url, body, content_type=content_type
+        )
+
+    def test_import_csv(self):
+        """Test importing products from a CSV body."""
+        body = (
+            "name,price,priority,link,notes\n"
+            'Hat,5.00,HIGH,https://example.com,"Red, \\ or\n\tblue"\n'
+            "Scarf,7.5,,,\n"
+        )
+
+        res = self.post(body, "text/csv")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"imported": 2, "failed": 0, "errors": []})
+        hat, scarf = self.wishlist.products.order_by("id")
+        self.assertEqual(hat.name, "Hat")
+        self.assertEqual(hat.priority, "HIGH")
+        self.assertEqual(hat.link, "https://example.com")
+        self.assertEqual(hat.notes, "Red, \\ or\n\tblue")
+        self.assertEqual(scarf.price, Decimal("7.50"))
+        self.assertEqual(scarf.priority, Product().priority)
+        self.assertIsNone(scarf.link)
+        self.assertEqual(scarf.notes, "")
+
+    def test_import_ndjson(self):
+        """Test importing products from an NDJSON upload."""
+        lines = [
+            {"name": "Hat", "price": 10.99},
+            {"name": "Scarf", "price": "2"},
+        ]
+        upload = SimpleUploadedFile(
+            "products.ndjson",
+            "\n".join(json.dumps(line) for line in lines).encode(),
+        )
+
+        res = self.client.post(self.url, {"file": upload})
+
+        self.assertEqual(res.data["imported"], 2)
+        self.assertEqual(
+            list(self.wishlist.products.order_by("id").values_list("price")),
+            [(Decimal("10.99"),), (Decimal("2.00"),)],
+        )
+
+    def test_import_reports_row_errors(self):
+        """Test invalid rows are reported and the others imported."""
+        body = "\n".join([
+            '{"name": "Hat", "price": 5}',
+            '{"name": "Scarf", "price": 12345}',
+            "not json",
+            "",
+            '{"price": 5, "link": "nope", "priority": "URGENT"}',
+            '["Hat", 5]',
+            '{"name": "Top", "price": 5}',
+        ])
+
+        res = self.post(body, "application/x-ndjson")
+
+        self.assertEqual(res.data["imported"], 2)
+        self.assertEqual(res.data["failed"], 4)
+        errors = {
+            error["line"]: error["errors"] for error in res.data["errors"]
+        }
+        self.assertEqual(list(errors), [2, 3, 5, 6])
+        self.assertIn("price", errors[2])
+        self.assertIn("non_field_errors", errors[3])
+        self.assertEqual(sorted(errors[5]), ["link", "name", "priority"])
+        self.assertEqual(self.wishlist.products.count(), 2)
+
+    @patch.object(imports, "MAX_REPORTED_ERRORS", 2)
+    @patch.object(imports, "BATCH_SIZE", 3)
+    def test_import_in_batches(self):
+        """Test large files are written in batches with capped errors."""
+        body = "name,price\n" + "Hat,5\n" * 10 + ",5\n" * 5
+
+        res = self.post(body, "text/csv")
+
+        self.assertEqual(res.data["imported"], 10)
+        self.assertEqual(res.data["failed"], 5)
+        self.assertEqual(len(res.data["errors"]), 2)
+        self.assertEqual(self.wishlist.products.count(), 10)
+
+    def test_import_updates_wishlist_version(self):
+        """Test the wishlist gets a new version after an import."""
+        version = self.wishlist.version
+
+        self.post("name,price\nHat,5\n", "text/csv")
+
+        self.wishlist.refresh_from_db()
+        self.assertNotEqual(self.wishlist.version, version)
+
+    def test_import_counted(self):
+        """Test imported products are counted into the wishlist."""
+        self.post("name,price\nHat,5\nTop,6.5\n,1\n", "text/csv")
+
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.product_count, 2)
+        self.assertEqual(self.wishlist.total_price, Decimal("11.50"))
+
+    def test_import_bulk_create_fallback(self):
+        """Test products are written without COPY on other backends."""
+        with patch.object(imports, "copy_products", imports.create_products):
+            res = self.post("name,price\nHat,5\nTop,6\n", "text/csv")
+
+        self.assertEqual(res.data["imported"], 2)
+        self.assertEqual(self.wishlist.products.count(), 2)
+
+    def test_import_without_file(self):
+        """Test an import without a file gives error."""
+        res = self.client.post(self.url, {}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", res.data)
+
+    def test_import_unknown_format(self):
+        """Test an upload of an unknown format gives error."""
+        upload = SimpleUploadedFile("products.txt", b"name,price\nHat,5\n")
+
+        res = self.client.post(self.url, {"file": upload})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("format", res.data)
+
+    def test_import_other_users_wishlist(self):
+        """Test importing into another user's wishlist gives error."""
+        wishlist = create_wishlist(user=create_user(email="other@example.com"))
+
+        res = self.client.generic(
+            "POST",
+            wishlist_product_import_url(wishlist.id),
+            "name,price\nHat,5\n",
+            content_type="text/csv",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(wishlist.products.exists())
@@ -3,13 +3,20 @@ Tests for the products API.
 """
 
 import datetime
+from base64 import b64encode
 from decimal import Decimal
+from unittest.mock import patch
+from urllib.parse import urlencode
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from core.models import Product, Wishlist
@@ -24,6 +31,18 @@ def wishlist_product_url(wishlist_id):
     return reverse("wishlist:products", kwargs={"wishlist_id": wishlist_id})
 
 
+def wishlist_product_bulk_url(wishlist_id):
+    """Create and return a bulk product URL."""
+    return reverse(
+        "wishlist:products_bulk", kwargs={"wishlist_id": wishlist_id}
+    )
+
+
+def encode_cursor(position):
+    """Return a cursor parameter holding ``position``."""
+    return b64encode(urlencode({"p": position}).encode()).decode()
+
+
 def wishlist_product_detail_url(wishlist_id, product_id):
     """Create and return a product detail URL."""
     return reverse("wishlist:product_detail", args=[wishlist_id, product_id])
@@ -66,6 +85,7 @@ class PrivateProductsApiTests(TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
+        cache.clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -87,6 +107,26 @@ class PrivateProductsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_products_renders_same_output(self):
+        """Test the row based product list matches the serializer."""
+        wishlist = create_wishlist(user=self.user)
+        Product.objects.create(wishlist=wishlist, name="Pink Top", price=10.9)
+        Product.objects.create(
+            wishlist=wishlist,
+            name="Sneakers",
+            price=Decimal("45"),
+            priority="HIGH",
+            link="https://example.com/sneakers",
+            notes="size 9",
+        )
+
+        url = wishlist_product_url(wishlist.id)
+        res = self.client.get(url)
+
+        products = Product.objects.filter(wishlist=wishlist).order_by("-id")
+        serializer = ProductSerializer(products, many=True)
+        self.assertEqual(res.content, JSONRenderer().render(serializer.data))
+
     def test_products_limited_to_user(self):
         """Test list of products is limited to authenticated user."""
         user2 = create_user(email="user2@example.com")
@@ -105,6 +145,240 @@ class PrivateProductsApiTests(TestCase):
         self.assertEqual(res.data[0]["name"], product.name)
         self.assertEqual(res.data[0]["id"], product.id)
 
+    def test_retrieve_products_paginated(self):
+        """Test products can be paged through with cursors."""
+        wishlist = create_wishlist(user=self.user)
+        products = [
+            Product.objects.create(wishlist=wishlist, name=i, price=1)
+            for i in range(3)
+        ]
+
+        url = wishlist_product_url(wishlist.id)
+        res = self.client.get(url, {"page_size": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [product["id"] for product in res.data["results"]]
+        self.assertEqual(ids, [products[2].id, products[1].id])
+
+        res = self.client.get(res.data["next"])
+
+        ids = [product["id"] for product in res.data["results"]]
+        self.assertEqual(ids, [products[0].id])
+        self.assertIsNone(res.data["next"])
+        self.assertIsNotNone(res.data["previous"])
+
+    def test_retrieve_products_paginated_invalid_cursor(self):
+        """Test tampered id cursors are not found."""
+        wishlist = create_wishlist(user=self.user)
+        url = wishlist_product_url(wishlist.id)
+
+        for position in ["abc", "1.5", '["1"]', ""]:
+            res = self.client.get(url, {"cursor": encode_cursor(position)})
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+    def test_retrieve_products_sparse_fields(self):
+        """Test product reads render only the requested fields."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99, notes="Red"
+        )
+        expected = {"id": product.id, "name": "Pink Top"}
+
+        url = wishlist_product_url(wishlist.id)
+        for params in [
+            {"fields": "id,name"},
+            {"fields": "id,name", "page_size": 10},
+            {"exclude": "link,priority,price,notes"},
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url, params)
+
+            items = res.data["results"] if "page_size" in params else res.data
+            self.assertEqual(items, [expected])
+            self.assertNotIn("notes", queries[-1]["sql"])
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                wishlist_product_detail_url(wishlist.id, product.id),
+                {"fields": "id,name"},
+            )
+
+        self.assertEqual(res.data, expected)
+        self.assertNotIn("notes", queries[-1]["sql"])
+
+    def create_filter_products(self):
+        """Create products to filter and return their wishlist."""
+        wishlist = create_wishlist(user=self.user)
+        for name, price, priority, link in [
+            ("Hat", "5.00", "MEDIUM", None),
+            ("Scarf", "12.50", "HIGH", "https://example.com/scarf"),
+            ("Top", "9.99", "LOW", ""),
+            ("Bag", "30.00", "HIGH", "https://example.com/bag"),
+        ]:
+            Product.objects.create(
+                wishlist=wishlist,
+                name=name,
+                price=Decimal(price),
+                priority=priority,
+                link=link,
+            )
+        return wishlist
+
+    def test_filter_products(self):
+        """Test filtering products by priority, price and link."""
+        wishlist = self.create_filter_products()
+        url = wishlist_product_url(wishlist.id)
+
+        for params, names in [
+            ({"priority": "HIGH"}, ["Bag", "Scarf"]),
+            ({"priority": "low,medium"}, ["Top", "Hat"]),
+            ({"min_price": "9.99"}, ["Bag", "Top", "Scarf"]),
+            ({"min_price": "6", "max_price": "20"}, ["Top", "Scarf"]),
+            ({"has_link": "true"}, ["Bag", "Scarf"]),
+            ({"has_link": "false"}, ["Top", "Hat"]),
+            ({"priority": "HIGH", "max_price": "20"}, ["Scarf"]),
+        ]:
+            res = self.client.get(url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual([item["name"] for item in res.data], names)
+
+    def test_order_products(self):
+        """Test ordering products, with priorities by importance."""
+        wishlist = self.create_filter_products()
+        url = wishlist_product_url(wishlist.id)
+
+        for ordering, names in [
+            ("price", ["Hat", "Top", "Scarf", "Bag"]),
+            ("-price", ["Bag", "Scarf", "Top", "Hat"]),
+            ("name", ["Bag", "Hat", "Scarf", "Top"]),
+            ("-priority", ["Bag", "Scarf", "Hat", "Top"]),
+            ("priority", ["Top", "Hat", "Scarf", "Bag"]),
+        ]:
+            res = self.client.get(url, {"ordering": ordering})
+
+            self.assertEqual([item["name"] for item in res.data], names)
+
+    def test_order_products_paginated(self):
+        """Test cursors follow the requested ordering."""
+        wishlist = self.create_filter_products()
+        url = wishlist_product_url(wishlist.id)
+
+        names = []
+        params = {"ordering": "-priority", "page_size": 1}
+        while url:
+            res = self.client.get(url, params)
+            names += [item["name"] for item in res.data["results"]]
+            url, params = res.data["next"], None
+
+        self.assertEqual(names, ["Bag", "Scarf", "Hat", "Top"])
+
+    def test_order_products_paginated_invalid_cursor(self):
+        """Test tampered ordering cursors are not found."""
+        wishlist = self.create_filter_products()
+        url = wishlist_product_url(wishlist.id)
+
+        for ordering, position in [
+            ("price", '["abc", 1]'),
+            ("price", '[1, "x"]'),
+            ("price", '["NaN", 1]'),
+            ("price", '[null, 1]'),
+            ("price", '[[1], 1]'),
+            ("price", '["1.00"]'),
+            ("price", '{"price": 1}'),
+            ("price", "1.00"),
+            ("-priority", '["HIGH", 1]'),
+            ("name", '["Hat", "1.5"]'),
+        ]:
+            res = self.client.get(url, {
+                "ordering": ordering, "cursor": encode_cursor(position)
+            })
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+        res = self.client.get(url, {
+            "ordering": "price", "cursor": encode_cursor('["5.00", 0]')
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["name"] for item in res.data["results"]],
+            ["Hat", "Top", "Scarf", "Bag"],
+        )
+
+    def test_order_products_paginated_equal_values(self):
+        """Test cursors page through runs of equal values once each."""
+        wishlist = create_wishlist(user=self.user)
+        Product.objects.bulk_create(
+            Product(
+                wishlist=wishlist,
+                name="Product %s" % i,
+                price=i % 2,
+                priority="HIGH" if i % 3 else "LOW",
+            )
+            for i in range(30)
+        )
+        url = wishlist_product_url(wishlist.id)
+
+        for ordering in ["price", "-price", "priority", "-priority"]:
+            expected = [
+                item["id"]
+                for item in self.client.get(url, {"ordering": ordering}).data
+            ]
+            ids = []
+            next_url = url
+            params = {"ordering": ordering, "page_size": 4}
+            with CaptureQueriesContext(connection) as queries:
+                while next_url:
+                    res = self.client.get(next_url, params)
+                    ids += [item["id"] for item in res.data["results"]]
+                    last, next_url, params = res.data, res.data["next"], None
+
+            self.assertEqual(ids, expected)
+            self.assertFalse(
+                [query for query in queries if "OFFSET" in query["sql"]]
+            )
+
+            ids = []
+            previous_url = last["previous"]
+            while previous_url:
+                res = self.client.get(previous_url)
+                ids = [item["id"] for item in res.data["results"]] + ids
+                previous_url = res.data["previous"]
+
+            self.assertEqual(ids, expected[:-len(last["results"])])
+
+    def test_filter_products_invalid(self):
+        """Test invalid filter values give errors."""
+        wishlist = self.create_filter_products()
+        url = wishlist_product_url(wishlist.id)
+
+        for params in [
+            {"priority": "URGENT"},
+            {"min_price": "cheap"},
+            {"min_price": "20", "max_price": "10"},
+            {"has_link": "maybe"},
+            {"ordering": "notes"},
+        ]:
+            res = self.client.get(url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_default_priority(self):
+        """Test products without a priority default to LOW."""
+        wishlist = create_wishlist(user=self.user)
+
+        res = self.client.post(
+            wishlist_product_url(wishlist.id), {"name": "Hat", "price": 5}
+        )
+
+        self.assertEqual(res.data["priority"], Product.LOW)
+
     def test_create_product(self):
         """Test creating a product."""
         wishlist = create_wishlist(user=self.user)
@@ -126,6 +400,110 @@ class PrivateProductsApiTests(TestCase):
             self.assertEqual(getattr(product, k), v)
         self.assertEqual(product.wishlist.user, self.user)
 
+    def test_product_endpoints_query_count(self):
+        """Test the wishlist owner check is not repeated per lookup."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99
+        )
+        list_url = wishlist_product_url(wishlist.id)
+        detail_url = wishlist_product_detail_url(wishlist.id, product.id)
+
+        # the list reads the wishlist's version with the products
+        with self.assertNumQueries(1):
+            res = self.client.get(list_url)
+        self.assertEqual(len(res.data), 1)
+        # the permission reads the wishlist for the owner, then the
+        # product is inserted and counted into it, with a new version
+        with self.assertNumQueries(3):
+            res = self.client.post(list_url, {"name": "Hat", "price": 5})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            res = self.client.get(detail_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["id"], product.id)
+
+    def test_list_products_of_empty_wishlist(self):
+        """Test an empty wishlist is told apart from another user's."""
+        wishlist = create_wishlist(user=self.user)
+        other = create_wishlist(
+            user=create_user(email="user2@example.com", password="test123")
+        )
+        Product.objects.create(wishlist=other, name="Watch", price=100)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(wishlist_product_url(wishlist.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+        self.assertIn("ETag", res)
+
+        res = self.client.get(wishlist_product_url(other.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_products_not_modified(self):
+        """Test product reads answer If-None-Match with a 304."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99
+        )
+        # the list is answered from the response cache
+        for url, queries in [
+            (wishlist_product_url(wishlist.id), 0),
+            (wishlist_product_detail_url(wishlist.id, product.id), 1),
+        ]:
+            etag = self.client.get(url)["ETag"]
+
+            with self.assertNumQueries(queries):
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_products_etag_changes(self):
+        """Test product ETags change when a product changes."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99
+        )
+        list_url = wishlist_product_url(wishlist.id)
+        detail_url = wishlist_product_detail_url(wishlist.id, product.id)
+        list_etag = self.client.get(list_url)["ETag"]
+        detail_etag = self.client.get(detail_url)["ETag"]
+
+        self.client.patch(detail_url, {"name": "Blue Top"})
+
+        res = self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], list_etag)
+        res = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["name"], "Blue Top")
+
+    def test_products_etag_depends_on_query(self):
+        """Test differently paginated lists do not share an ETag."""
+        wishlist = create_wishlist(user=self.user)
+        url = wishlist_product_url(wishlist.id)
+
+        etag = self.client.get(url)["ETag"]
+        res = self.client.get(
+            url, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_product_in_other_wishlist_not_found(self):
+        """Test a product is only found under its own wishlist."""
+        wishlist = create_wishlist(user=self.user)
+        other_wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=other_wishlist, name="Pink Top", price=10.99
+        )
+
+        url = wishlist_product_detail_url(wishlist.id, product.id)
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_full_update(self):
         """Test full update of product."""
 
@@ -306,3 +684,204 @@ class PrivateProductsApiTests(TestCase):
         self.assertFalse(
             Product.objects.filter(name=payload["products"]["name"]).exists()
         )
+
+
+class BulkProductsApiTests(TestCase):
+    """Test writing many products in one request."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.wishlist = create_wishlist(user=self.user)
+        self.url = wishlist_product_bulk_url(self.wishlist.id)
+
+    def create_products(self, count):
+        """Create and return products in the wishlist."""
+        return [
+            Product.objects.create(
+                wishlist=self.wishlist, name="Product %s" % i, price=i
+            )
+            for i in range(count)
+        ]
+
+    def test_bulk_write(self):
+        """Test creating, updating and deleting products at once."""
+        kept, deleted = self.create_products(2)
+        version = self.wishlist.version
+        payload = {
+            "create": [
+                {"name": "Hat", "price": "5.00", "priority": "HIGH"},
+                {"name": "Scarf", "price": "7.50"},
+            ],
+            "update": [{"id": kept.id, "name": "Blue Top"}],
+            "delete": [deleted.id],
+        }
+
+        res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["name"] for item in res.data["create"]], ["Hat", "Scarf"]
+        )
+        self.assertEqual(res.data["update"][0]["id"], kept.id)
+        self.assertEqual(res.data["update"][0]["name"], "Blue Top")
+        self.assertEqual(res.data["update"][0]["price"], "0.00")
+        self.assertEqual(res.data["delete"], [deleted.id])
+        products = self.wishlist.products.order_by("id")
+        self.assertEqual(
+            [product.name for product in products],
+            ["Blue Top", "Hat", "Scarf"],
+        )
+        self.assertEqual(
+            [item["id"] for item in res.data["create"]],
+            [product.id for product in products[1:]],
+        )
+        self.wishlist.refresh_from_db()
+        self.assertNotEqual(self.wishlist.version, version)
+
+    def test_bulk_write_counted(self):
+        """Test bulk writes keep the wishlist's count and total."""
+        kept, deleted = self.create_products(3)[1:]
+        payload = {
+            "create": [{"name": "Hat", "price": "5.00"}],
+            "update": [{"id": kept.id, "price": "4.50"}],
+            "delete": [deleted.id],
+        }
+
+        self.client.post(self.url, payload, format="json")
+
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.product_count, 3)
+        self.assertEqual(self.wishlist.total_price, Decimal("9.50"))
+
+    def test_bulk_write_query_count(self):
+        """Test the number of queries does not grow with the items."""
+        products = self.create_products(20)
+        payload = {
+            "create": [{"name": "Hat", "price": 5}] * 20,
+            "update": [
+                {"id": product.id, "price": 1} for product in products[:10]
+            ],
+            "delete": [product.id for product in products[10:]],
+        }
+
+        # ownership check, locked id lookup, select and delete, insert,
+        # update and the wishlist version, plus the savepoint and its release
+        with self.assertNumQueries(9):
+            res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.wishlist.products.count(), 30)
+
+    def test_bulk_write_only_sent_fields(self):
+        """Test updates only write the fields each item sent."""
+        named, priced = self.create_products(2)
+        payload = {
+            "update": [
+                {"id": named.id, "name": "Blue Top"},
+                {"id": priced.id, "price": "4.50"},
+            ],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [
+            query["sql"] for query in queries
+            if query["sql"].startswith('UPDATE "core_product"')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            sorted('"name"' in sql for sql in updates), [False, True]
+        )
+        self.assertEqual(
+            sorted('"price"' in sql for sql in updates), [False, True]
+        )
+
+    def test_bulk_write_ids_without_returning(self):
+        """Test created ids are returned without bulk insert RETURNING."""
+        payload = {"create": [{"name": "Hat", "price": 5}] * 2}
+
+        with patch.object(
+            connection.features, "can_return_rows_from_bulk_insert", False
+        ):
+            res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in res.data["create"]],
+            list(
+                self.wishlist.products.order_by("id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.product_count, 2)
+
+    def test_bulk_write_invalid_item(self):
+        """Test an invalid item is reported and nothing is written."""
+        product = self.create_products(1)[0]
+        payload = {
+            "create": [{"name": "Hat", "price": 5}, {"name": "Scarf"}],
+            "delete": [product.id],
+        }
+
+        res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["create"][0], {})
+        self.assertIn("price", res.data["create"][1])
+        self.assertEqual(self.wishlist.products.count(), 1)
+
+    def test_bulk_write_unknown_ids(self):
+        """Test ids of products in other wishlists are rejected."""
+        product = self.create_products(1)[0]
+        other = Product.objects.create(
+            wishlist=create_wishlist(user=self.user), name="Hat", price=5
+        )
+        payload = {
+            "update": [
+                {"id": product.id, "name": "Blue Top"},
+                {"id": other.id, "name": "Blue Hat"},
+            ],
+            "delete": [other.id + 1],
+        }
+
+        res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["update"][0], {})
+        self.assertIn("id", res.data["update"][1])
+        self.assertIn(0, res.data["delete"])
+        product.refresh_from_db()
+        self.assertEqual(product.name, "Product 0")
+
+    def test_bulk_write_repeated_id(self):
+        """Test a product cannot be updated and deleted at once."""
+        product = self.create_products(1)[0]
+        payload = {
+            "update": [{"id": product.id, "name": "Blue Top"}],
+            "delete": [product.id],
+        }
+
+        res = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Product.objects.filter(id=product.id).exists())
+
+    def test_bulk_write_other_users_wishlist(self):
+        """Test writing to another user's wishlist gives error."""
+        wishlist = create_wishlist(user=create_user(email="user2@example.com"))
+
+        res = self.client.post(
+            wishlist_product_bulk_url(wishlist.id),
+            {"create": [{"name": "Hat", "price": 5}]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(wishlist.products.exists())
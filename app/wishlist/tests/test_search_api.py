@@ -0,0 +1,159 @@
+"""
+Tests for the search API.
+"""
+
+import datetime
+import unittest
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Wishlist
+from wishlist.search import trigram_installed
+
+
+SEARCH_URL = reverse("wishlist:search")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_wishlist(user, **params):
+    """Create and return a sample wishlist."""
+    defaults = {
+        "title": "Sample wishlist title",
+        "occasion_date": datetime.date(year=2020, month=1, day=1),
+    }
+    defaults.update(params)
+
+    return Wishlist.objects.create(user=user, **defaults)
+
+
+# full text search, the other databases fall back to icontains
+postgresql_only = unittest.skipUnless(
+    connection.vendor == "postgresql", "needs PostgreSQL"
+)
+
+
+def names(results):
+    """Return the names or titles of search results."""
+    return [item.get("name", item.get("title")) for item in results]
+
+
+class PublicSearchApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to search."""
+        res = APIClient().get(SEARCH_URL, {"q": "shoes"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSearchApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.wishlist = create_wishlist(
+            user=self.user,
+            title="Birthday",
+            description="Running gear for the marathon",
+        )
+        for name, notes in [
+            ("Running shoes", "Size 9"),
+            ("Rain jacket", "Light enough for running"),
+            ("Coffee grinder", ""),
+        ]:
+            Product.objects.create(
+                wishlist=self.wishlist, name=name, notes=notes, price=10
+            )
+
+    @postgresql_only
+    def test_search(self):
+        """Test products and wishlists are found and ranked."""
+        res = self.client.get(SEARCH_URL, {"q": "run"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # matches in the name rank above matches in the notes
+        self.assertEqual(
+            names(res.data["products"]), ["Running shoes", "Rain jacket"]
+        )
+        self.assertEqual(res.data["products"][0]["wishlist"], self.wishlist.id)
+        self.assertEqual(names(res.data["wishlists"]), ["Birthday"])
+
+    def test_search_limited_to_user(self):
+        """Test other users' wishlists and products are not found."""
+        other = create_wishlist(
+            user=create_user(email="other@example.com"), title="Running"
+        )
+        Product.objects.create(wishlist=other, name="Running socks", price=1)
+
+        res = self.client.get(SEARCH_URL, {"q": "running"})
+
+        self.assertNotIn("Running socks", names(res.data["products"]))
+        self.assertEqual(names(res.data["wishlists"]), ["Birthday"])
+
+    @postgresql_only
+    def test_search_limit(self):
+        """Test the number of results can be limited."""
+        res = self.client.get(SEARCH_URL, {"q": "running", "limit": 1})
+
+        self.assertEqual(names(res.data["products"]), ["Running shoes"])
+
+    @postgresql_only
+    def test_search_vector_maintained(self):
+        """Test bulk writes and updates are searchable straight away."""
+        Product.objects.bulk_create(
+            [Product(wishlist=self.wishlist, name="Tea kettle", price=5)]
+        )
+        Product.objects.filter(name="Coffee grinder").update(
+            name="Pepper grinder"
+        )
+
+        res = self.client.get(SEARCH_URL, {"q": "kettle OR pepper"})
+
+        self.assertEqual(
+            sorted(names(res.data["products"])),
+            ["Pepper grinder", "Tea kettle"],
+        )
+
+    def test_search_misspelled(self):
+        """Test misspelled words still find products."""
+        if not trigram_installed(connection.alias):
+            self.skipTest("needs the pg_trgm extension")
+
+        res = self.client.get(SEARCH_URL, {"q": "grnder"})
+
+        self.assertEqual(names(res.data["products"]), ["Coffee grinder"])
+
+    def test_search_fallback(self):
+        """
+        Test other databases search with icontains.
+
+        Run with DB_SQLITE set, it searches a real SQLite database.
+        """
+        with patch.object(connections["default"], "vendor", "sqlite"):
+            res = self.client.get(SEARCH_URL, {"q": "runn"})
+
+        self.assertEqual(
+            names(res.data["products"]), ["Rain jacket", "Running shoes"]
+        )
+        self.assertEqual(names(res.data["wishlists"]), ["Birthday"])
+
+    def test_search_invalid_params(self):
+        """Test a query is required and the limit is bounded."""
+        for params in [{}, {"q": " "}, {"q": "run", "limit": 1000}]:
+            res = self.client.get(SEARCH_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
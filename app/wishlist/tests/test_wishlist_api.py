@@ -5,15 +5,20 @@ Tests for wishlist APIs.
 import datetime
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from core.models import Wishlist, Product
 
 
+from wishlist.pagination import IdCursorPagination
 from wishlist.serializers import (
     WishlistSerializer,
     WishlistDetailSerializer,
@@ -63,6 +68,7 @@ class PrivateWishlistApiTests(TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = create_user(email="user@example.com", password="test123")
         self.client.force_authenticate(self.user)
@@ -93,6 +99,201 @@ class PrivateWishlistApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_wishlist_renders_same_output(self):
+        """Test wishlists with row based products match the serializer."""
+        wishlists = [create_wishlist(user=self.user) for i in range(2)]
+        create_wishlist(user=self.user)
+        for wishlist in wishlists:
+            Product.objects.create(wishlist=wishlist, name="Top", price=9.9)
+            Product.objects.create(
+                wishlist=wishlist,
+                name="Hat",
+                price=5,
+                priority="HIGH",
+                link="https://example.com/hat",
+            )
+
+        res = self.client.get(WISHLIST_URL)
+
+        serializer = WishlistSerializer(
+            Wishlist.objects.filter(user=self.user).order_by("-id"), many=True
+        )
+        self.assertEqual(res.content, JSONRenderer().render(serializer.data))
+
+        res = self.client.get(wishlist_detail_url(wishlists[0].id))
+
+        serializer = WishlistDetailSerializer(
+            Wishlist.objects.get(id=wishlists[0].id)
+        )
+        self.assertEqual(res.content, JSONRenderer().render(serializer.data))
+
+    def test_list_wishlists_query_count(self):
+        """Test listing wishlists does not query products per wishlist."""
+        for i in range(5):
+            wishlist = create_wishlist(user=self.user, title=f"List {i}")
+            Product.objects.create(wishlist=wishlist, name="Top", price=9.99)
+            Product.objects.create(wishlist=wishlist, name="Hat", price=5.00)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(WISHLIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+        for wishlist in res.data:
+            self.assertEqual(len(wishlist["products"]), 2)
+
+    def test_get_wishlist_detail_query_count(self):
+        """Test retrieving a wishlist loads products in one query."""
+        wishlist = create_wishlist(user=self.user)
+        for i in range(5):
+            Product.objects.create(wishlist=wishlist, name=f"P{i}", price=1)
+
+        url = wishlist_detail_url(wishlist.id)
+        with self.assertNumQueries(2):
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["products"]), 5)
+
+    def test_list_wishlists_sparse_fields(self):
+        """Test ?fields= prunes the output and skips the products."""
+        wishlist = create_wishlist(user=self.user)
+        Product.objects.create(wishlist=wishlist, name="Top", price=9.99)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(WISHLIST_URL, {"fields": "id,title"})
+
+        self.assertEqual(
+            res.data, [{"id": wishlist.id, "title": wishlist.title}]
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("occasion_date", queries[0]["sql"])
+
+    def test_get_wishlist_detail_sparse_nested_fields(self):
+        """Test nested paths prune product fields and their columns."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Top", price=9.99, notes="Red"
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                wishlist_detail_url(wishlist.id),
+                {"fields": "title,products.id,products.name"},
+            )
+
+        self.assertEqual(
+            res.data,
+            {
+                "title": wishlist.title,
+                "products": [{"id": product.id, "name": "Top"}],
+            },
+        )
+        sql = " ".join(query["sql"] for query in queries)
+        for column in ["description", "address", "notes", "price"]:
+            self.assertNotIn(column, sql)
+
+    def test_get_wishlist_detail_exclude_fields(self):
+        """Test ?exclude= drops fields, including nested ones."""
+        wishlist = create_wishlist(user=self.user)
+        Product.objects.create(wishlist=wishlist, name="Top", price=9.99)
+
+        res = self.client.get(
+            wishlist_detail_url(wishlist.id),
+            {"exclude": "description,address,products.notes"},
+        )
+
+        self.assertNotIn("description", res.data)
+        self.assertNotIn("address", res.data)
+        self.assertEqual(res.data["title"], wishlist.title)
+        self.assertNotIn("notes", res.data["products"][0])
+        self.assertEqual(res.data["products"][0]["name"], "Top")
+
+        res = self.client.get(
+            wishlist_detail_url(wishlist.id), {"exclude": "products"}
+        )
+        self.assertNotIn("products", res.data)
+
+    def test_sparse_fields_unknown_field_error(self):
+        """Test unknown field names give an error."""
+        wishlist = create_wishlist(user=self.user)
+
+        res = self.client.get(WISHLIST_URL, {"fields": "id,colour"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.data)
+
+        res = self.client.get(
+            wishlist_detail_url(wishlist.id), {"exclude": "products.colour"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("exclude", res.data)
+
+    def test_update_with_sparse_fields(self):
+        """Test ?fields= only prunes the response of a write."""
+        wishlist = create_wishlist(user=self.user)
+        url = "%s?fields=id" % wishlist_detail_url(wishlist.id)
+
+        res = self.client.patch(url, {"title": "New title"})
+
+        self.assertEqual(res.data, {"id": wishlist.id})
+        wishlist.refresh_from_db()
+        self.assertEqual(wishlist.title, "New title")
+
+    def test_list_wishlists_paginated(self):
+        """Test clients can page through wishlists with cursors."""
+        wishlists = [
+            create_wishlist(user=self.user, title=f"List {i}")
+            for i in range(5)
+        ]
+
+        res = self.client.get(WISHLIST_URL, {"page_size": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        self.assertIsNone(res.data["previous"])
+        ids = [wishlist["id"] for wishlist in res.data["results"]]
+        self.assertEqual(ids, [wishlists[4].id, wishlists[3].id])
+
+        seen = ids
+        next_url = res.data["next"]
+        while next_url:
+            res = self.client.get(next_url)
+            seen += [wishlist["id"] for wishlist in res.data["results"]]
+            next_url = res.data["next"]
+        self.assertEqual(seen, [wishlist.id for wishlist in wishlists[::-1]])
+
+    def test_list_wishlists_paginated_uses_keyset(self):
+        """Test later pages are fetched without OFFSET or COUNT."""
+        for i in range(4):
+            create_wishlist(user=self.user, title=f"List {i}")
+        res = self.client.get(WISHLIST_URL, {"page_size": 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(len(res.data["results"]), 2)
+        for query in queries:
+            self.assertNotIn("OFFSET", query["sql"])
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_list_wishlists_page_size_capped(self):
+        """Test the requested page size cannot exceed the maximum."""
+        Wishlist.objects.bulk_create(
+            Wishlist(
+                user=self.user,
+                title=f"List {i}",
+                occasion_date=datetime.date(year=2020, month=1, day=1),
+            )
+            for i in range(IdCursorPagination.max_page_size + 5)
+        )
+
+        res = self.client.get(WISHLIST_URL, {"page_size": 10000})
+
+        self.assertEqual(
+            len(res.data["results"]), IdCursorPagination.max_page_size
+        )
+        self.assertIsNotNone(res.data["next"])
+
     def test_get_wishlist_detail(self):
         """Test get wishlist detail."""
         wishlist = create_wishlist(user=self.user)
@@ -103,6 +304,43 @@ class PrivateWishlistApiTests(TestCase):
         serializer = WishlistDetailSerializer(wishlist)
         self.assertEqual(res.data, serializer.data)
 
+    @override_settings(
+        WISHLIST_CACHE_TTL={"list": 0, "wishlist": 0, "products": 0}
+    )
+    def test_get_wishlist_detail_not_modified(self):
+        """Test a matching If-None-Match gets a 304 in one query."""
+        wishlist = create_wishlist(user=self.user)
+        Product.objects.create(wishlist=wishlist, name="Top", price=9.99)
+        url = wishlist_detail_url(wishlist.id)
+        res = self.client.get(url)
+        etag = res["ETag"]
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+        self.assertEqual(res.content, b"")
+
+    def test_wishlist_etag_changes(self):
+        """Test the ETag changes with the wishlist and its products."""
+        wishlist = create_wishlist(user=self.user)
+        url = wishlist_detail_url(wishlist.id)
+        etags = [self.client.get(url)["ETag"]]
+
+        product = Product.objects.create(
+            wishlist=wishlist, name="Top", price=9.99
+        )
+        etags.append(self.client.get(url)["ETag"])
+        self.client.patch(url, {"title": "New title"})
+        etags.append(self.client.get(url)["ETag"])
+        product.delete()
+        etags.append(self.client.get(url)["ETag"])
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etags[0])
+
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_clear_wishlist_products(self):
         """Test clearing a wishlists products."""
 
@@ -175,6 +413,145 @@ class PrivateWishlistApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_update_products_by_id(self):
+        """Test products sent with an id update the existing product."""
+        wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99
+        )
+        other = Product.objects.create(
+            wishlist=wishlist, name="Sneakers", price=45.00
+        )
+
+        payload = {"products": [{"id": product.id, "name": "Blue Top"}]}
+        url = wishlist_detail_url(wishlist.id)
+        res = self.client.patch(url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        product.refresh_from_db()
+        self.assertEqual(product.name, "Blue Top")
+        self.assertEqual(wishlist.products.count(), 2)
+        self.assertTrue(Product.objects.filter(id=other.id).exists())
+
+    def test_full_update_replaces_products(self):
+        """Test a full update removes products missing from the payload."""
+        wishlist = create_wishlist(user=self.user)
+        kept = Product.objects.create(
+            wishlist=wishlist, name="Pink Top", price=10.99
+        )
+        removed = Product.objects.create(
+            wishlist=wishlist, name="Sneakers", price=45.00
+        )
+
+        payload = {
+            "title": "New wishlist title",
+            "occasion_date": datetime.date(year=2023, month=9, day=10),
+            "products": [
+                {"id": kept.id, "name": "Pink Top", "price": 12.50},
+                {"name": "Purse", "price": 20.00},
+            ],
+        }
+        url = wishlist_detail_url(wishlist.id)
+        res = self.client.put(url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = set(wishlist.products.values_list("name", flat=True))
+        self.assertEqual(names, {"Pink Top", "Purse"})
+        self.assertFalse(Product.objects.filter(id=removed.id).exists())
+        kept.refresh_from_db()
+        self.assertEqual(str(kept.price), "12.50")
+
+    def test_product_writes_counted(self):
+        """Test the product count and total follow nested writes."""
+        payload = {
+            "title": "Sample wishlist",
+            "occasion_date": datetime.date(year=2020, month=1, day=1),
+            "products": [
+                {"name": "Pink Top", "price": 10.99},
+                {"name": "Sneakers", "price": 45.00},
+            ],
+        }
+        res = self.client.post(WISHLIST_URL, payload, format="json")
+
+        self.assertEqual(res.data["product_count"], 2)
+        self.assertEqual(res.data["total_price"], "55.99")
+        top, sneakers = res.data["products"]
+        url = wishlist_detail_url(res.data["id"])
+
+        products = [
+            {"id": top["id"], "price": 12.50},
+            {"name": "Purse", "price": 20.00},
+        ]
+        res = self.client.patch(url, {"products": products}, format="json")
+        self.assertEqual(res.data["product_count"], 3)
+        self.assertEqual(res.data["total_price"], "77.50")
+
+        payload["products"] = [sneakers]
+        res = self.client.put(url, payload, format="json")
+        self.assertEqual(res.data["product_count"], 1)
+        self.assertEqual(res.data["total_price"], "45.00")
+
+        res = self.client.get(WISHLIST_URL)
+        self.assertEqual(res.data[0]["product_count"], 1)
+        self.assertEqual(res.data[0]["total_price"], "45.00")
+
+    def test_update_product_from_other_wishlist_error(self):
+        """Test product ids must belong to the wishlist being updated."""
+        wishlist = create_wishlist(user=self.user)
+        other_wishlist = create_wishlist(user=self.user)
+        product = Product.objects.create(
+            wishlist=other_wishlist, name="Pink Top", price=10.99
+        )
+
+        payload = {"products": [{"id": product.id, "name": "Stolen"}]}
+        url = wishlist_detail_url(wishlist.id)
+        res = self.client.patch(url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        product.refresh_from_db()
+        self.assertEqual(product.name, "Pink Top")
+        self.assertEqual(product.wishlist, other_wishlist)
+
+    def test_new_product_missing_fields_error(self):
+        """Test new products on a partial update need all fields."""
+        wishlist = create_wishlist(user=self.user)
+
+        payload = {"products": [{"name": "No price"}]}
+        url = wishlist_detail_url(wishlist.id)
+        res = self.client.patch(url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(wishlist.products.exists())
+
+    def test_full_update_query_count_independent_of_products(self):
+        """Test a full update costs the same queries for any list size."""
+
+        def put_products(count):
+            wishlist = create_wishlist(user=self.user)
+            existing = [
+                Product.objects.create(wishlist=wishlist, name=i, price=1)
+                for i in range(count)
+            ]
+            products = [
+                {"id": product.id, "name": "Updated", "price": 2}
+                for product in existing[: count // 2]
+            ] + [{"name": "New", "price": 3} for i in range(count)]
+            payload = {
+                "title": "Sample wishlist",
+                "occasion_date": datetime.date(year=2020, month=1, day=1),
+                "products": products,
+            }
+            url = wishlist_detail_url(wishlist.id)
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.put(url, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                wishlist.products.count(), count // 2 + count
+            )
+            return len(queries)
+
+        self.assertEqual(put_products(4), put_products(200))
+
     def test_create_product_on_update_on_other_user_error(self):
         """
         Test create product when updating a wishlist
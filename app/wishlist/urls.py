@@ -2,6 +2,7 @@
 URL mappings for the wishlist app.
 """
 
+from django.conf import settings
 from django.urls import (
     path,
     include,
@@ -12,6 +13,7 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
+from core.asgi import async_urlpatterns
 from wishlist import views
 
 
@@ -22,14 +24,29 @@ app_name = "wishlist"
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("export/", views.WishlistExportView.as_view(), name="export"),
+    path("search/", views.SearchView.as_view(), name="search"),
     path(
         "wishlists/<int:wishlist_id>/products/",
         views.ProductViewSet.as_view(),
         name="products",
     ),
+    path(
+        "wishlists/<int:wishlist_id>/products/bulk/",
+        views.ProductBulkViewSet.as_view(),
+        name="products_bulk",
+    ),
+    path(
+        "wishlists/<int:wishlist_id>/products/import/",
+        views.ProductImportViewSet.as_view(),
+        name="products_import",
+    ),
     path(
         "wishlists/<int:wishlist_id>/products/<int:product_id>/",
         views.ProductDetailViewSet.as_view(),
         name="product_detail",
     ),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns(urlpatterns)
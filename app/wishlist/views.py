@@ -2,6 +2,9 @@
 Views for the wishlist APIs
 """
 
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
 # from drf_spectacular.utils import (
 #     extend_schema_view,
 #     extend_schema,
@@ -13,16 +16,30 @@ from rest_framework import (
     # mixins
 )
 from rest_framework import generics
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated, BasePermission
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    BasePermission,
+    IsAuthenticated,
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# from rest_framework.views import APIView
 # from drf_spectacular.types import OpenApiTypes
 
 
+from core.authentication import CachedTokenAuthentication
+from core.budgets import QueryBudgetMixin
 from core.models import Wishlist, Product
-from wishlist import serializers
+from wishlist import imports, serializers
+from wishlist.cache import cached
+from wishlist.etags import conditional
+from wishlist.export import NDJSONRenderer, export_wishlists
+from wishlist.filters import ProductFilterBackend
+from wishlist.search import search
 
 
 # @extend_schema_view(
@@ -38,14 +55,38 @@ from wishlist import serializers
 # )
 
 
+def rendered_columns(serializer, skip=()):
+    """
+    Return the columns behind the fields ``serializer`` renders.
+
+    Fields named in ``skip``, such as nested serializers, are left out.
+    The primary key is always included.
+    """
+    return ["id"] + [
+        field.source
+        for field in serializer._readable_fields
+        if field.field_name not in skip
+    ]
+
+
 class UserOwnsWishlist(BasePermission):
+    """
+    Allow access to the owner of the wishlist in the URL.
+
+    The wishlist is stored on ``request.wishlist`` so views can use it
+    without querying it again. Views whose object lookup already filters
+    on the owner set ``owner_checked_in_lookup`` to skip the extra query.
+    """
 
     def has_permission(self, request, view):
         wishlist_id = view.kwargs.get("wishlist_id")
         if wishlist_id is None:
             return False
 
-        get_object_or_404(
+        if getattr(view, "owner_checked_in_lookup", False):
+            return True
+
+        request.wishlist = get_object_or_404(
             Wishlist,
             id=wishlist_id,
             user_id=request.user.id,
@@ -53,17 +94,42 @@ class UserOwnsWishlist(BasePermission):
         return True
 
 
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     """View for manage wishlist APIs."""
 
     serializer_class = serializers.WishlistDetailSerializer
     queryset = Wishlist.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # products are read and written in bulk, whatever their number, as
+    # core.tests.test_budgets checks with many results; one query of each
+    # budget is for a token missing from the cache, and writes add two
+    # for a savepoint when already in a transaction
+    query_budget = {
+        "list": 3,
+        "retrieve": 3,
+        "create": 6,
+        "update": 11,
+        "partial_update": 11,
+        "destroy": 5,
+    }
 
     def get_queryset(self):
         """Retrieve wishlists for authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by("-id")
+        queryset = self.queryset.filter(user=self.request.user).order_by(
+            "-id"
+        )
+
+        # reads load only the columns they render, nested products are
+        # loaded separately by render_products
+        if self.action in ["list", "retrieve"]:
+            columns = rendered_columns(self.get_serializer(), ["products"])
+            if self.action == "retrieve":
+                # read for the ETag
+                columns.append("version")
+            return queryset.only(*columns)
+
+        return queryset
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
@@ -72,17 +138,149 @@ class WishlistViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    @cached("list")
+    def list(self, request, *args, **kwargs):
+        """List wishlists with their products."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        wishlists = list(queryset) if page is None else page
+
+        serializer = self.get_serializer(wishlists, many=True)
+        self.render_products(serializer, serializer.child, wishlists)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @cached("wishlist")
+    @conditional
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a wishlist with its products."""
+        instance = self.get_object()
+
+        serializer = self.get_serializer(instance)
+        self.render_products(serializer, serializer, [instance])
+
+        return Response(serializer.data)
+
+    def render_products(self, serializer, child, wishlists):
+        """
+        Render the products of ``wishlists`` from rows in one query.
+
+        The nested product serializer picks them up from the context
+        instead of loading a model instance per product. Nothing is
+        loaded when ``child``, the wishlist serializer, leaves the
+        products out.
+        """
+        products = next(
+            (
+                field
+                for field in child._readable_fields
+                if field.field_name == "products"
+            ),
+            None,
+        )
+        if products is None:
+            return
+
+        serializer.context["product_rows"] = products.represent_rows(
+            Product.objects.filter(wishlist__in=wishlists).order_by("id"),
+            group_by="wishlist_id",
+        )
+
+    def get_object(self):
+        """Return the requested wishlist, loading it once per request."""
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
+
+    def get_version(self):
+        """Return the version stamp of the requested wishlist."""
+        return self.get_object().version
+
     def perform_create(self, serializer):
         """Create a new wishlist."""
         serializer.save(user=self.request.user)
 
 
+class WishlistExportView(APIView):
+    """Stream every wishlist of the user with its products."""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+    # rows fetched per round trip to the database
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        """Return the export as JSON, or NDJSON when asked for."""
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            export_wishlists(
+                request.user,
+                ndjson=renderer.format == "ndjson",
+                chunk_size=self.chunk_size,
+            ),
+            content_type=renderer.media_type,
+        )
+        response["Content-Disposition"] = (
+            'attachment; filename="wishlists.%s"' % renderer.format
+        )
+        return response
+
+
+class SearchView(APIView):
+    """Search the user's wishlists and products by text."""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """Return the best matching wishlists and products."""
+        params = serializers.SearchParamsSerializer(
+            data=request.query_params.dict()
+        )
+        params.is_valid(raise_exception=True)
+        text = params.validated_data["q"]
+        limit = params.validated_data["limit"]
+
+        wishlist_serializer = serializers.WishlistSearchSerializer()
+        wishlists = search(
+            Wishlist.objects.filter(user=request.user).only(
+                *rendered_columns(wishlist_serializer)
+            ),
+            text,
+            fields=["title", "description"],
+            trigram_field="title",
+        )[:limit]
+        product_serializer = serializers.ProductSearchSerializer()
+        products = search(
+            Product.objects.filter(wishlist__user=request.user).only(
+                *rendered_columns(product_serializer)
+            ),
+            text,
+            fields=["name", "notes"],
+            trigram_field="name",
+        )[:limit]
+
+        return Response(
+            {
+                "wishlists": serializers.WishlistSearchSerializer(
+                    wishlists, many=True
+                ).data,
+                "products": serializers.ProductSearchSerializer(
+                    products, many=True
+                ).data,
+            }
+        )
+
+
 # class ProductViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 #     """Manage products in the database."""
 
 #     serializer_class = serializers.ProductSerializer(many=True)
 #     queryset = Product.objects.all()
-#     authentication_classes = [TokenAuthentication]
+#     authentication_classes = [CachedTokenAuthentication]
 #     permission_classes = [IsAuthenticated]
 
 #     def get_queryset(self):
@@ -90,42 +288,192 @@ class WishlistViewSet(viewsets.ModelViewSet):
 #         return self.queryset.filter(user=self.request.user).order_by('-id')
 
 
-class ProductViewSet(generics.ListCreateAPIView):
+class ProductViewSet(QueryBudgetMixin, generics.ListCreateAPIView):
     """Manage products in the database."""
 
     serializer_class = serializers.ProductSerializer
     queryset = Product.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, UserOwnsWishlist]
+    filter_backends = [ProductFilterBackend]
     lookup_url_kwarg = "product_id"
+    # the list is one query whatever the number of products, one more
+    # for the version of a wishlist without products; creates read the
+    # wishlist for the owner, insert and count the product in; each one
+    # more for a token missing from the cache
+    query_budget = {"get": 3, "post": 4}
 
     def get_queryset(self):
-        """Filter queryset to specific wishlist key user."""
-        if self.kwargs.get("wishlist_id"):
-            return self.queryset.filter(
-                wishlist_id=self.kwargs.get("wishlist_id")
-            ).order_by("-id")
-        # should return an error?
-        return self.queryset.all()
+        """Filter queryset to the wishlist, if the user owns it."""
+        queryset = self.queryset.filter(
+            wishlist_id=self.kwargs["wishlist_id"],
+            wishlist__user=self.request.user,
+        ).order_by("-id")
+
+        if self.request.method == "GET":
+            return queryset.only(*rendered_columns(self.get_serializer()))
+        return queryset
+
+    @cached("products")
+    @conditional
+    def list(self, request, *args, **kwargs):
+        """List products, rendered from rows when not paginated."""
+        page, items = self.load_products()
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return Response(items)
+
+    def load_products(self):
+        """
+        Return the page of products, or the rendered list, in one query.
+
+        The query reads the wishlist's version along, for the ETag. Only
+        when there are no products is the wishlist read on its own, for
+        its version and to tell an empty wishlist from one that is not
+        the user's.
+        """
+        if hasattr(self, "_products"):
+            return self._products
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # pages are small and need instances for their cursors
+        page = self.paginate_queryset(
+            queryset.annotate(wishlist_version=F("wishlist__version"))
+        )
+        if page is not None:
+            items = page
+            versions = {product.wishlist_version for product in page}
+        else:
+            serializer = self.get_serializer(many=True)
+            grouped = serializer.represent_rows(
+                queryset, group_by="wishlist__version"
+            )
+            versions = set(grouped)
+            items = next(iter(grouped.values()), [])
+
+        if versions:
+            (self._version,) = versions
+        else:
+            self._version = get_object_or_404(
+                Wishlist.objects.values_list("version", flat=True),
+                id=self.kwargs["wishlist_id"],
+                user=self.request.user,
+            )
+        self._products = page, items
+        return self._products
+
+    def get_version(self):
+        """Return the version stamp of the wishlist."""
+        self.load_products()
+        return self._version
+
+    @property
+    def owner_checked_in_lookup(self):
+        """Let the list query check the owner, creates need the wishlist."""
+        return self.request.method in SAFE_METHODS
 
     def perform_create(self, serializer):
-        serializer.save(wishlist_id=self.kwargs.get("wishlist_id"))
+        """Create the product in the wishlist checked by the permission."""
+        serializer.save(wishlist=self.request.wishlist)
 
 
-class ProductDetailViewSet(generics.RetrieveUpdateDestroyAPIView):
+class ProductBulkViewSet(generics.GenericAPIView):
+    """Create, change and delete products of a wishlist in one request."""
+
+    serializer_class = serializers.ProductBulkSerializer
+    queryset = Product.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, UserOwnsWishlist]
+
+    def get_serializer_context(self):
+        """Add the wishlist checked by the permission."""
+        context = super().get_serializer_context()
+        context["wishlist"] = getattr(self.request, "wishlist", None)
+        return context
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class ProductImportViewSet(APIView):
+    """Import products into a wishlist from a CSV or NDJSON file."""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, UserOwnsWishlist]
+    # request bodies are streamed into the import, uploaded files are
+    # spooled to disk by Django once they are large
+    parser_classes = [
+        imports.CSVParser,
+        imports.NDJSONParser,
+        MultiPartParser,
+    ]
+
+    def post(self, request, *args, **kwargs):
+        """Import the file and report the rows that failed."""
+        upload = request.data.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["No file was submitted."]})
+
+        fmt = request.data.get("format") or imports.guess_format(
+            getattr(upload, "name", None)
+        )
+        if fmt not in imports.FORMATS:
+            formats = ", ".join(imports.FORMATS)
+            raise ValidationError(
+                {"format": ["Expected one of: %s." % formats]}
+            )
+
+        report = imports.import_products(request.wishlist, upload, fmt)
+        return Response(report)
+
+
+class ProductDetailViewSet(
+    QueryBudgetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """Manage products detail in the database."""
 
     serializer_class = serializers.ProductSerializer
     queryset = Product.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, UserOwnsWishlist]
+    owner_checked_in_lookup = True
+    # one query more each for a token missing from the cache, and writes
+    # lock the row before updating or deleting it
+    query_budget = {"get": 2, "put": 5, "patch": 5, "delete": 5}
+
+    def get_queryset(self):
+        """Filter queryset to products in a wishlist of the user."""
+        queryset = self.queryset.filter(
+            wishlist_id=self.kwargs.get("wishlist_id"),
+            wishlist__user=self.request.user,
+        ).select_related("wishlist")
+
+        if self.request.method == "GET":
+            # the wishlist's version is read for the ETag
+            return queryset.only(
+                *rendered_columns(self.get_serializer()),
+                "wishlist",
+                "wishlist__version",
+            )
+        return queryset
 
     def get_object(self):
-        if self.kwargs.get("wishlist_id"):
-            return get_object_or_404(
+        if not hasattr(self, "_object"):
+            self._object = get_object_or_404(
                 self.get_queryset(),
-                wishlist_id=self.kwargs.get("wishlist_id"),
                 id=self.kwargs.get("product_id"),
             )
-        return get_object_or_404(self.get_queryset(),
-                                 id=self.kwargs.get("product_id"))
+        return self._object
+
+    def get_version(self):
+        """Return the version stamp of the product's wishlist."""
+        return self.get_object().wishlist.version
+
+    @conditional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)